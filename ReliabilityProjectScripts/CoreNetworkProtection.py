@@ -14,187 +14,239 @@ import sys
 sys.path.insert(0, r"C:\Python27\ArcGIS10.3\Lib\site-packages")
 import arcpy
 from optimize_ilp import *
-import pickle
+from core_pipeline import read_network, read_demand, graph_properties, run_core
+from gis_backends import GisBackend
+from contextlib import contextmanager
+import inspect
 import os
+import time
 
 arcpy.env.overwriteOutput = True
 
 
-# Read network
-def read_network(name, path='#'):
-    if path == '#':
-        topo = name + '.graphml'
-    else:
-        name_full = name + '.graphml'
-        topo = os.path.join(path, name_full)
+####################################################################################################################
+# Geoprocessing calls of the map output, {stage: {tool or cursor: number of the calls}}
+GP_CALLS = {}
 
-    g = nx.read_graphml(topo)
-    return g
+# Called with the stage, its counts {tool or cursor: number of the calls} and its time in seconds at the end of every
+# stage of ArcpyBackend, e.g., to collect the counts of the batch runs; None reports them with AddMessage
+ON_GP_CALLS = None
 
+# Stage of the map output, which the calls through gp are counted for, see counting
+GP_STAGE = None
 
-# Read demands
-def read_demand(name, path = '#'):
-    if path == '#':
-        filename = name + '.txt'
-    else:
-        filename = os.path.join(path, name + '.txt')
 
-    fp = open(filename)
-    lines = fp.readlines()
-    # Read demands from file in the format
-    # "source" "destination" "capacity"
-    R = {}
-    for line in lines:
-        src, dst, cap = line.split()
-        R[(src, dst)] = int(cap)
+def count_call(stage, tool, n=1):
+    """
+    :param stage: string, e.g., 'topology'
+    :param tool: string name of the geoprocessing tool or cursor, e.g., 'InsertCursor'
+    :param n: number of the calls
+    """
+    calls = GP_CALLS.setdefault(stage, {})
+    calls[tool] = calls.get(tool, 0) + n
+    return
+
 
-    fp.close()
-    return R
+class GeoprocessingCalls(object):
+    """
+    Counting proxy of arcpy: every tool, cursor or function called through it (also through gp.da) is counted for
+    GP_STAGE under the name of the tool without the toolbox, e.g., 'CreateFeatureclass'. The geometry objects
+    (Array, Point, Polyline, ...) are created with arcpy directly, they are not geoprocessing calls.
+    """
 
+    def __init__(self, module):
+        self._module = module
 
-def graph_properties(G):
-    graph_properties_dic = {'#nodes': nx.number_of_nodes(G), '#edges': nx.number_of_edges(G), 'diameter': nx.diameter(G)}
+    def __getattr__(self, name):
+        attribute = getattr(self._module, name)
+        if inspect.ismodule(attribute):
+            return GeoprocessingCalls(attribute)
+        if not callable(attribute):
+            return attribute
 
-    node_degree_all = nx.degree(G)
-    graph_properties_dic['average_node_degree'] = float(sum(node_degree_all.values())) / float(len(node_degree_all))
+        def call(*args, **kwargs):
+            if GP_STAGE is not None:
+                count_call(GP_STAGE, name.split('_')[0])
+            return attribute(*args, **kwargs)
+        return call
 
-    edge_lengths_all = nx.get_edge_attributes(G, "weight")
-    graph_properties_dic['average_edge_length'] = float(sum(edge_lengths_all.values())) / float(len(edge_lengths_all))
-    graph_properties_dic['maximum_edge_length'] = max(edge_lengths_all.values())
 
-    return graph_properties_dic
+gp = GeoprocessingCalls(arcpy)
+
+
+@contextmanager
+def counting(stage):
+    """
+    Counts the calls through gp for the stage and reports them at its end, see report_calls.
+
+    :param stage: string, e.g., 'topology'
+    """
+    global GP_STAGE
+    start = time.time()
+    previous, GP_STAGE = GP_STAGE, stage
+    try:
+        yield
+    finally:
+        GP_STAGE = previous
+    report_calls(stage, time.time() - start)
+    return
+
+
+def report_calls(stage, seconds):
+    calls = GP_CALLS.get(stage, {})
+    if ON_GP_CALLS is not None:
+        ON_GP_CALLS(stage, calls, seconds)
+    else:
+        add_message('Map output {0}: {1} geoprocessing calls ({2}), {3:.2f} s.'.format(
+            stage, sum(calls.values()), ', '.join('{0} {1}'.format(k, v) for k, v in sorted(calls.items())), seconds))
+    return
+
+
+####################################################################################################################
+def node_coordinates(g):
+    """
+    :return: python dictionary with the coordinates of the nodes by name, {name: (longitude, latitude)}
+    """
+    longitude, latitude = nx.get_node_attributes(g, 'Longitude'), nx.get_node_attributes(g, 'Latitude')
+    return dict((n, (longitude[n], latitude[n])) for n in g.nodes())
 
 
 ####################################################################################################################
 def topology_from_graph(g, spatial_reference, fd_path, name):
-    # Input topology nodes
-    node_values = []
-    for n in g.nodes(data=True):
-        node_values.append((n[0], (n[1]['Longitude'], n[1]['Latitude'])))
+    """
+    Writes the nodes and the links of the topology with one insert cursor each. The lines are built from the node
+    coordinates of the graph and get the OriginID, DestinationID and LENGTH_GEO (the geodesic length of the line in
+    meters measured by ArcGIS, rounded to centimeters) fields at creation.
+
+    :return: paths of the nodes and of the lines feature classes, python dictionary with the lengths of the arcs in
+             both directions {(i, j): length}
+    """
+    # Coordinates of the nodes by name
+    coordinates = node_coordinates(g)
 
+    # Input topology nodes
     nodes_name = 'nodes_{0}'.format(name)
     nodes_path = os.path.join(fd_path, nodes_name)
     check_exists(nodes_path)
-    arcpy.CreateFeatureclass_management(fd_path, nodes_name, 'POINT', spatial_reference=spatial_reference)
-    arcpy.AddField_management(nodes_path, 'NAME', 'string')
+    gp.CreateFeatureclass_management(fd_path, nodes_name, 'POINT', spatial_reference=spatial_reference)
+    gp.AddField_management(nodes_path, 'NAME', 'string')
 
-    with arcpy.da.InsertCursor(nodes_path, ['NAME', 'SHAPE@XY']) as n_cursor:
-        for node in node_values:
-            n_cursor.insertRow(node)
+    with gp.da.InsertCursor(nodes_path, ['NAME', 'SHAPE@XY']) as n_cursor:
+        for n in g.nodes():
+            n_cursor.insertRow((n, coordinates[n]))
 
-    arcpy.AddGeometryAttributes_management(nodes_path, 'POINT_X_Y_Z_M')
-    # Create a point layer
-    nodes_layer_name = os.path.join('in_memory', nodes_name)
-    nodes_layer = arcpy.MakeFeatureLayer_management(nodes_path, nodes_layer_name)
-    features_lines = []
+    gp.AddGeometryAttributes_management(nodes_path, 'POINT_X_Y_Z_M')
 
     # Input topology links
-    for e in g.edges(data=True):
-        clause = "NAME='{0}' OR NAME='{1}'".format(str(e[0]), str(e[1]))
-        arcpy.SelectLayerByAttribute_management(nodes_layer, 'NEW_SELECTION', clause)
-
-        # Create an array of points
-        array_tmp = arcpy.Array()
-        node = arcpy.Point()
-        with arcpy.da.SearchCursor(nodes_layer, ['SHAPE@X', 'SHAPE@Y']) as cursor:
-            for row in cursor:
-                # list_tmp.append(arcpy.Point(row[0], row[1]))
-                node.X = row[0]
-                node.Y = row[1]
-                array_tmp.append(node)
-        tmp = arcpy.Polyline(array_tmp, spatial_reference)
-        features_lines.append(tmp)
-
     lines_name = 'lines_{0}'.format(name)
     lines_path = os.path.join(fd_path, lines_name)
     check_exists(lines_path)
-    arcpy.CopyFeatures_management(features_lines, lines_path)
-
-    return nodes_path, lines_path
+    gp.CreateFeatureclass_management(fd_path, lines_name, 'POLYLINE', spatial_reference=spatial_reference)
+    gp.AddField_management(lines_path, 'OriginID', 'TEXT')
+    gp.AddField_management(lines_path, 'DestinationID', 'TEXT')
+    gp.AddField_management(lines_path, 'LENGTH_GEO', 'DOUBLE')
 
-
-####################################################################################################################
-def edges_distance(g, nodes_path, lines_path, fds_path):
     distance_dict = {}
+    with gp.da.InsertCursor(lines_path, ['OriginID', 'DestinationID', 'LENGTH_GEO', 'SHAPE@']) as l_cursor:
+        for i, j in g.edges():
+            array_tmp = arcpy.Array([arcpy.Point(*coordinates[i]), arcpy.Point(*coordinates[j])])
+            line = arcpy.Polyline(array_tmp, spatial_reference)
+            length = round(line.getLength('GEODESIC', 'METERS'), 2)
+            distance_dict[(i, j)] = length
+            distance_dict[(j, i)] = length
+            l_cursor.insertRow((i, j, length, line))
 
-    import PrepareLines as pl
-
-    pl.add_fields(nodes_path, lines_path, fds_path)
-
-    with arcpy.da.SearchCursor(lines_path, ["OriginID", 'DestinationID', 'LENGTH_GEO']) as rows:
-        for row in rows:
-            g[row[0]][row[1]]["weight"] = round(row[2], 2)
-            distance_dict[(row[0], row[1])] = round(row[2], 2)
-            distance_dict[(row[1], row[0])] = round(row[2], 2)
-    return distance_dict
+    return nodes_path, lines_path, distance_dict
 
 
 ####################################################################################################################
-def edges_capacity_uniform(g, link_path, distance_dict_in, capacity_in):
+def edges_capacity_uniform(link_path, capacity_in):
 
-    lines_layer = arcpy.MakeFeatureLayer_management(link_path, 'lines_layer')
-    arcpy.AddField_management(lines_layer, 'Capacity', 'FLOAT')
+    lines_layer = gp.MakeFeatureLayer_management(link_path, 'lines_layer')
+    gp.AddField_management(lines_layer, 'Capacity', 'FLOAT')
 
-    with arcpy.da.UpdateCursor(link_path, 'Capacity') as cursor:
+    with gp.da.UpdateCursor(link_path, 'Capacity') as cursor:
         for row in cursor:
             row[0] = capacity_in
             cursor.updateRow(row)
 
-    for key in distance_dict_in:
-        g[key[0]][key[1]]["capacity"] = capacity_in
-
     return
 
 
 ####################################################################################################################
-def add_demands_to_map(demands, node_path, demands_name, network_name, fd_path):
-    nodes_layer_name = os.path.join('in_memory', 'nodes')
-    nodes_layer = arcpy.MakeFeatureLayer_management(node_path, nodes_layer_name)
+def add_demands_to_map(demands, coordinates, demands_name, network_name, fd_path, spatial_reference):
+    """
+    Writes all the demands into one feature class {demands_name}_{network_name} of two points per demand with the
+    source, destination and volume fields, row by row with one insert cursor.
 
-    for d in demands:
-        clause = "NAME='{0}' OR NAME='{1}'".format(str(d[0]), str(d[1]))
-        arcpy.SelectLayerByAttribute_management(nodes_layer, 'NEW_SELECTION', clause)
+    :param demands: python dictionary with the demands, {(source, destination): volume}, or any iterable of
+                    ((source, destination), volume), e.g., a generator of the full mesh, which is not kept in memory
+    :param coordinates: python dictionary with the coordinates of the nodes, see node_coordinates
+    :return: path of the demands feature class
+    """
+    if isinstance(demands, dict):
+        demands = demands.items()
 
-        demand_out_name = '{0}_{1}_{2}{3}'.format(demands_name, network_name, str(d[0]), str(d[1]))
-        demand_out_path = os.path.join(fd_path, demand_out_name)
-        check_exists(demand_out_path)
-        arcpy.CopyFeatures_management(nodes_layer, demand_out_path)
+    demands_out_name = '{0}_{1}'.format(demands_name, network_name)
+    demands_out_path = os.path.join(fd_path, demands_out_name)
+    check_exists(demands_out_path)
+    gp.CreateFeatureclass_management(fd_path, demands_out_name, 'MULTIPOINT', spatial_reference=spatial_reference)
+    gp.AddField_management(demands_out_path, 'source', 'TEXT')
+    gp.AddField_management(demands_out_path, 'destination', 'TEXT')
+    gp.AddField_management(demands_out_path, 'volume', 'DOUBLE')
 
-    arcpy.Delete_management('in_memory')
+    with gp.da.InsertCursor(demands_out_path, ['source', 'destination', 'volume', 'SHAPE@']) as d_cursor:
+        for (src, dst), volume in demands:
+            array_tmp = arcpy.Array([arcpy.Point(*coordinates[src]), arcpy.Point(*coordinates[dst])])
+            d_cursor.insertRow((src, dst, volume, arcpy.Multipoint(array_tmp, spatial_reference)))
 
-    return
+    return demands_out_path
 
 
 ####################################################################################################################
-def add_paths_to_map(link_path, name, path, path_out):
+def link_oids(link_path):
+    """
+    :return: python dictionary with the object IDs of the lines in both directions, {(OriginID, DestinationID): OID}
+    """
+    oids = {}
+    with gp.da.SearchCursor(link_path, ['OID@', 'OriginID', 'DestinationID']) as rows:
+        for row in rows:
+            oids[(row[1], row[2])] = row[0]
+            oids[(row[2], row[1])] = row[0]
+
+    return oids
+
+
+####################################################################################################################
+def add_paths_to_map(link_path, name, path, path_out, oids=None):
+    """
+    Copies the lines of every path into a feature class {name}_{source}{destination} with one selection of their
+    object IDs.
+
+    :param oids: python dictionary {(OriginID, DestinationID): OID} of link_oids, None reads it from link_path
+    """
+    if oids is None:
+        oids = link_oids(link_path)
 
     lines_layer_name = os.path.join('in_memory', 'lines')
     check_exists(lines_layer_name)
-    lines_layer = arcpy.MakeFeatureLayer_management(link_path, lines_layer_name)
+    lines_layer = gp.MakeFeatureLayer_management(link_path, lines_layer_name)
+    oid_field = gp.AddFieldDelimiters(link_path, gp.Describe(link_path).OIDFieldName)
 
     for p in path:
+        # An empty selection would copy all the lines
+        if not path[p]:
+            continue
+
         path_out_name = '{0}_{1}{2}'.format(name, str(p[0]), str(p[1]))
-        arcpy.AddMessage(path_out_name)
         path_out_path = os.path.join(path_out, path_out_name)
         check_exists(path_out_path)
 
-        arcpy.SelectLayerByAttribute_management(lines_layer, 'CLEAR_SELECTION')
-        k = 0
-        for l in path[p]:
-
-            clause = "OriginID ='{0}' AND DestinationID ='{1}'".format(str(l[0]), str(l[1]))
-            arcpy.AddMessage(clause)
-            arcpy.SelectLayerByAttribute_management(lines_layer, 'ADD_TO_SELECTION', clause)
-            select_count = int(arcpy.GetCount_management(lines_layer).getOutput(0))
-
-            if select_count == k:
-                clause = "OriginID ='{0}' AND DestinationID ='{1}'".format(str(l[1]), str(l[0]))
-                arcpy.SelectLayerByAttribute_management(lines_layer, 'ADD_TO_SELECTION', clause)
-
-            k += 1
+        clause = '{0} IN ({1})'.format(oid_field, ','.join(str(oids[l]) for l in path[p]))
+        gp.SelectLayerByAttribute_management(lines_layer, 'NEW_SELECTION', clause)
+        gp.CopyFeatures_management(lines_layer, path_out_path)
 
-        arcpy.CopyFeatures_management(lines_layer, path_out_path)
-        arcpy.Delete_management('in_memory')
+    gp.Delete_management('in_memory')
     return
 
 
@@ -207,14 +259,71 @@ def check_exists(name):
     :param name: check if this file already exists
     :return: 
     """
-    if arcpy.Exists(name):
-        arcpy.Delete_management(name)
+    if gp.Exists(name):
+        gp.Delete_management(name)
     return
 
 
+####################################################################################################################
+class ArcpyBackend(GisBackend):
+    """
+    Draws the topology, the demands and the paths into a feature dataset of the topology in the geodatabase, the
+    lengths of the links are the geodesic lengths measured by ArcGIS.
+    """
+
+    def __init__(self, database_path):
+        """
+        :param database_path: a string with the full input database path
+        """
+        self.database_path = database_path
+        self.spatial_reference = arcpy.SpatialReference(4326)
+        self.g, self.name = None, None
+        self.fd_path, self.node_path, self.link_path = None, None, None
+        self.oids = None
+        self.distance_dict = None
+
+    def add_topology(self, g, name):
+        self.g, self.name = g, name
+        self.oids = None
+
+        with counting('topology'):
+            # name = arcpy.ValidateFieldName(core_network_name)
+            self.fd_path = os.path.join(self.database_path, name)
+            check_exists(self.fd_path)
+            gp.CreateFeatureDataset_management(self.database_path, name, self.spatial_reference)
+
+            self.node_path, self.link_path, self.distance_dict = topology_from_graph(g, self.spatial_reference,
+                                                                                     self.fd_path, name)
+        return
+
+    def edge_lengths(self, g):
+        return self.distance_dict
+
+    def set_capacity(self, capacity):
+        with counting('capacity'):
+            edges_capacity_uniform(self.link_path, capacity)
+        return
+
+    def add_demands(self, demands, demands_name):
+        with counting(demands_name):
+            add_demands_to_map(demands, node_coordinates(self.g), demands_name, self.name, self.fd_path,
+                               self.spatial_reference)
+        return
+
+    def add_paths(self, name, paths):
+        with counting(name):
+            if self.oids is None:
+                self.oids = link_oids(self.link_path)
+
+            add_paths_to_map(self.link_path, name, paths, self.fd_path, self.oids)
+        return
+
+
 ####################################################################################################################
 def main(problems, database_path, path_demands, path_results, core_network_name, demands_name, capacity_uniform,
-         srg_links, srg_nodes):
+         srg_links, srg_nodes, solver='gurobi', link_disjoint_engine='ilp',
+         workers=1, capacity_engine='ilp', capacity_search=False, limits=None, backend=None, length_method='gis',
+         cache=None, store=None, capacity_mode=None):
     """
     
     :param problems: python dictionary, keys are the ype of problem and the boolean saying if the problem has to be 
@@ -230,248 +339,42 @@ def main(problems, database_path, path_demands, path_results, core_network_name,
     :param capacity_uniform: int, with the uniform capacity for each arc of the graph
     :param srg_links: string, name of the file where the .pkl is stored
     :param srg_nodes: string, name of the file where the .pkl is stored
+    :param solver: string, MILP solver: 'gurobi', 'highs' (scipy.optimize.milp) or 'cbc' (PuLP)
+    :param link_disjoint_engine: string, 'ilp' solves the Link_Disjoint problem with the MILP solver, 'suurballe' with
+                                 the Suurballe/Bhandari algorithm demand by demand
+    :param workers: int, number of the worker processes solving the problems without constraints coupling the demands
+                    (Unprotected, Link_Disjoint) in chunks of demands; 1 solves every problem as a single model, None
+                    uses all the cores
+    :param capacity_engine: string, 'ilp' solves the Capacity, Node_Disjoint, SRG_Links and SRG_Nodes problems with the
+                            arc based MILP formulations, 'column_generation' with the path based column generation
+    :param capacity_search: boolean, if True the minimum uniform capacity, at which the selected capacitated problems
+                            are feasible, is searched instead of solving the problems with capacity_uniform
+    :param limits: milp_solvers.SolveLimits with the time limit, the relative MIP gap and the node limit of every
+                   solve, or a python dictionary {problem: SolveLimits} with the keys of problems; a problem stopped
+                   by its limits returns the best incumbent with the status 'feasible' in the .pkl file
+    :param backend: gis_backends.GisBackend of the map output, None draws into the feature dataset of the topology in
+                    database_path with ArcpyBackend; gis_backends.GisBackend() skips the map output
+    :param length_method: string, 'gis' (default) for the geodesic lengths of the links measured by ArcGIS, as
+                          LENGTH_GEODESIC; 'vincenty' or 'karney' for the geodesic lengths on the WGS84 ellipsoid
+                          computed from the node coordinates, 'haversine' for the great circle lengths
+    :param cache: result_cache.ResultCache, which returns the stored solution of a problem solved before with the same
+                  topology, demands, capacity, SRGs and options; None uses the folder result_cache in path_results,
+                  False solves every problem again. The result files are named with the hash of their inputs, e.g.,
+                  graph_properties_nobel_ger_demand_ger_small_Unprotected_1a2b3c4d5e.pkl, and are not overwritten
+    :param store: results_store.ResultsStore, into which the runs, demands, paths and hops are written in one
+                  transaction per problem; None uses results.sqlite in path_results, False writes the .pkl files only
+    :param capacity_mode: string, 'arc' gives each direction of a link the full capacity_uniform, 'link' shares it
+                          between both directions; None uses optimize_ilp.CAPACITY_MODE ('arc')
     
     :return: graph properties; working and protection paths in .pkl files
     """
 
-    # TODO Stop overwriting the files
-    # TODO Change the capacity constraint: now its on one arc
-    # TODO Add contraint for both arcs for link disjointness
-
-    arcpy.AddMessage('Importing underlying core network topology: {0}.'.format(core_network_name))
-
-    ####################################################################################################################
-    # Import topology
-    ####################################################################################################################
-    spatial_reference = arcpy.SpatialReference(4326)
-    g = read_network(core_network_name, path_demands)
-
-    # name = arcpy.ValidateFieldName(core_network_name)
-    fd_path = os.path.join(database_path, core_network_name)
-    check_exists(fd_path)
-    arcpy.CreateFeatureDataset_management(database_path, core_network_name, spatial_reference)
-
-    node_path, link_path = topology_from_graph(g, spatial_reference, fd_path, core_network_name)
-
-    distance_dict = edges_distance(g, node_path, link_path, fd_path)
-    # arcpy.AddMessage(distance_dict)
-
-    edges_capacity_uniform(g, link_path, distance_dict, capacity_uniform)
-
-    output_file_dist = os.path.join(path_results, 'graph_distances_{0}.pkl'.format(core_network_name))
-
-    with open(output_file_dist, 'wb') as f_d:
-        pickle.dump(distance_dict, f_d)
-
-    # with open(output_file_dist, 'rb') as f_d:
-    #     test = pickle.load(f_d)
-    #     arcpy.AddMessage(test)
-
-    # Input demands
-    demands = read_demand(demands_name, path_demands)
-    add_demands_to_map(demands, node_path, demands_name, core_network_name, fd_path)
-
-    arcpy.AddMessage('Importing demands: {0}.'.format(demands_name))
-    arcpy.AddMessage(demands)
-
-    ####################################################################################################################
-    # Core network analysis
-    ####################################################################################################################
-
-    ####################################################################################################################
-    # Graph analysis
-    graph_properties_out = graph_properties(g)
-
-    output_file_graph = os.path.join(path_results, 'graph_properties_{0}.pkl'.format(core_network_name))
-
-    with open(output_file_graph, 'wb') as f_g:
-        pickle.dump(graph_properties_out, f_g)
-
-    ####################################################################################################################
-    # Optimization
-
-    if problems['Unprotected']:
-        arcpy.AddMessage('~~~~ Unprotected paths ~~~~')
-        distance, path = optimize_unprotected_path(g, distance_dict, demands)
-
-        if distance != 0:
-            path_name = 'Path_{0}_{1}_{2}'.format(demands_name, core_network_name, 'unprotected')
-            add_paths_to_map(link_path, path_name, path, fd_path)
-
-            result_unprotected = {'working_paths': path, 'working_distance': distance, 'demands': demands}
-
-            arcpy.AddMessage('Working paths:')
-            arcpy.AddMessage(path)
-            arcpy.AddMessage('Working path lengths:')
-            arcpy.AddMessage(distance)
-
-            output_file = os.path.join(path_results, 'graph_properties_{0}_{1}_Unprotected.pkl'.format(core_network_name, demands_name))
-            with open(output_file, 'wb') as f_u:
-                pickle.dump(result_unprotected, f_u)
-
-    if problems['Link_Disjoint']:
-        arcpy.AddMessage('~~~~ Link disjoint paths ~~~~')
-        distance1, distance2, path1, path2 = optimize_link_disjoint(g, distance_dict, demands)
-        arcpy.AddMessage(distance1)
-        arcpy.AddMessage(distance2)
-        if distance1 != 0:
-            working_path_name = 'WorkingPath_{0}_{1}_{2}'.format(demands_name, core_network_name, 'LinkDisjoint')
-            add_paths_to_map(link_path, working_path_name, path1, fd_path)
-            protection_path_name = 'ProtectionPath_{0}_{1}_{2}'.format(demands_name, core_network_name, 'LinkDisjoint')
-            add_paths_to_map(link_path, protection_path_name, path2, fd_path)
-
-            result_link_disjoint = {'working_paths': path1, 'working_distance': distance1, 'protection_path': path2,
-                                    'protection_distance': distance2, 'demands': demands}
-
-            arcpy.AddMessage('Working paths:')
-            arcpy.AddMessage(path1)
-            arcpy.AddMessage('Working path lengths:')
-            arcpy.AddMessage(distance1)
-            arcpy.AddMessage('Protection paths:')
-            arcpy.AddMessage(path2)
-            arcpy.AddMessage('Protection path lengths:')
-            arcpy.AddMessage(distance2)
-
-            output_file = os.path.join(path_results,
-                                             'graph_properties_{0}_{1}_Link_Disjoint.pkl'.format(core_network_name,
-                                                                                                 demands_name))
-            with open(output_file, 'wb') as f_ld:
-                pickle.dump(result_link_disjoint, f_ld)
-
-    if problems['Capacity']:
-        # Capacity constraint
-        arcpy.AddMessage('~~~~ Link disjoint paths with capacity constraint ~~~~')
-        distance1, distance2, path1, path2 = optimize_link_disjoint_cap(g, distance_dict, demands)
-
-        if distance1 != 0:
-            working_path_name = 'WorkingPath_{0}_{1}_{2}_cap'.format(demands_name, core_network_name, 'LinkDisjoint')
-            add_paths_to_map(link_path, working_path_name, path1, fd_path)
-            protection_path_name = 'ProtectionPath_{0}_{1}_{2}_cap'.format(demands_name, core_network_name, 'LinkDisjoint')
-            add_paths_to_map(link_path, protection_path_name, path2, fd_path)
-
-            result_link_capacity = {'working_paths': path1, 'working_distance': distance1, 'protection_path': path2,
-                                    'protection_distance': distance2}
-
-            arcpy.AddMessage('Working paths:')
-            arcpy.AddMessage(path1)
-            arcpy.AddMessage('Working path lengths:')
-            arcpy.AddMessage(distance1)
-            arcpy.AddMessage('Protection paths:')
-            arcpy.AddMessage(path2)
-            arcpy.AddMessage('Protection path lengths:')
-            arcpy.AddMessage(distance2)
-
-            output_file = os.path.join(path_results,
-                                             'graph_properties_{0}_{1}_Link_Disjoint_Capacity.pkl'.format(core_network_name,
-                                                                                                          demands_name))
-            with open(output_file, 'wb') as f_cap:
-                pickle.dump(result_link_capacity, f_cap)
-
-    if problems['Node_Disjoint']:
-        # Node disjoint
-        arcpy.AddMessage('~~~~ Node disjoint paths with capacity constraint ~~~~')
-        distance1, distance2, path1, path2 = optimize_node_disjoint_cap(g, distance_dict, demands)
-
-        if distance1 != 0:
-            working_path_name = 'WorkingPath_{0}_{1}_{2}_cap'.format(demands_name, core_network_name, 'NodeDisjoint')
-            add_paths_to_map(link_path, working_path_name, path1, fd_path)
-            protection_path_name = 'ProtectionPath_{0}_{1}_{2}_cap'.format(demands_name, core_network_name, 'NodeDisjoint')
-            add_paths_to_map(link_path, protection_path_name, path2, fd_path)
-
-            result_node_disjoint = {'working_paths': path1, 'working_distance': distance1, 'protection_path': path2,
-                                    'protection_distance': distance2}
-
-            arcpy.AddMessage('Working paths:')
-            arcpy.AddMessage(path1)
-            arcpy.AddMessage('Working path lengths:')
-            arcpy.AddMessage(distance1)
-            arcpy.AddMessage('Protection paths:')
-            arcpy.AddMessage(path2)
-            arcpy.AddMessage('Protection path lengths:')
-            arcpy.AddMessage(distance2)
-
-            output_file = os.path.join(path_results,
-                                             'graph_properties_{0}_{1}_Node_Disjoint.pkl'.format(core_network_name,
-                                                                                                 demands_name))
-            with open(output_file, 'wb') as f_nd:
-                pickle.dump(result_node_disjoint, f_nd)
-
-    if problems['SRG_Links']:
-        # SRGs links
-        arcpy.AddMessage('~~~~ Link disjoint paths with capacity constraint and link SRGs~~~~')
-        srg_links_path = os.path.join(path_demands, srg_links)
-
-        if os.path.isfile(srg_links_path):
-            with open(srg_links_path, 'rb') as f_srgs:
-                srg_links = pickle.load(f_srgs)
-
-            distance1, distance2, path1, path2 = optimize_link_disjoint_cap_srg_links(g, distance_dict, demands, srg_links)
-
-            if distance1 != 0:
-                working_path_name = 'WorkingPath_{0}_{1}_{2}_cap'.format(demands_name, core_network_name, 'SRG_links')
-                add_paths_to_map(link_path, working_path_name, path1, fd_path)
-                protection_path_name = 'ProtectionPath_{0}_{1}_{2}_cap'.format(demands_name, core_network_name, 'SRG_links')
-                add_paths_to_map(link_path, protection_path_name, path2, fd_path)
-
-                result_link_srg = {'working_paths': path1, 'working_distance': distance1, 'protection_path': path2,
-                                   'protection_distance': distance2}
-
-                arcpy.AddMessage('Working paths:')
-                arcpy.AddMessage(path1)
-                arcpy.AddMessage('Working path lengths:')
-                arcpy.AddMessage(distance1)
-                arcpy.AddMessage('Protection paths:')
-                arcpy.AddMessage(path2)
-                arcpy.AddMessage('Protection path lengths:')
-                arcpy.AddMessage(distance2)
-
-                output_file = os.path.join(path_results,
-                                                 'graph_properties_{0}_{1}_SRG_Links.pkl'.format(core_network_name,
-                                                                                                     demands_name))
-                with open(output_file, 'wb') as f_lsrg:
-                    pickle.dump(result_link_srg, f_lsrg)
-        else:
-            arcpy.AddMessage('The SRG links problem cannot be solved as there are no SRGs defined for this topology.')
-
-    if problems['SRG_Nodes']:
-        # SRGs nodes
-        arcpy.AddMessage('~~~~ Node disjoint paths with capacity constraint and node SRGs~~~~')
-
-        srg_nodes_path = os.path.join(path_demands, srg_nodes)
-
-        if os.path.isfile(srg_nodes_path):
-            with open(srg_nodes_path, 'rb') as f_srgs:
-                srg_nodes = pickle.load(f_srgs)
-
-            distance1, distance2, path1, path2 = optimize_node_disjoint_cap_srg_nodes(g, distance_dict, demands, srg_nodes)
-
-            if distance1 != 0:
-                working_path_name = 'WorkingPath_{0}_{1}_{2}_cap'.format(demands_name, core_network_name, 'SRG_nodes')
-                add_paths_to_map(link_path, working_path_name, path1, fd_path)
-                protection_path_name = 'ProtectionPath_{0}_{1}_{2}_cap'.format(demands_name, core_network_name, 'SRG_nodes')
-                add_paths_to_map(link_path, protection_path_name, path2, fd_path)
-
-                result_node_srg = {'working_paths': path1, 'working_distance': distance1, 'protection_path': path2,
-                                   'protection_distance': distance2}
-
-                arcpy.AddMessage('Working paths:')
-                arcpy.AddMessage(path1)
-                arcpy.AddMessage('Working path lengths:')
-                arcpy.AddMessage(distance1)
-                arcpy.AddMessage('Protection paths:')
-                arcpy.AddMessage(path2)
-                arcpy.AddMessage('Protection path lengths:')
-                arcpy.AddMessage(distance2)
-
-                output_file = os.path.join(path_results,
-                                                 'graph_properties_{0}_{1}_SRG_Nodes.pkl'.format(core_network_name,
-                                                                                                 demands_name))
-                with open(output_file, 'wb') as f_nsrg:
-                    pickle.dump(result_node_srg, f_nsrg)
-
-        else:
-            arcpy.AddMessage('The SRG links problem cannot be solved as there are no SRGs defined for this topology.')
+    if backend is None:
+        backend = ArcpyBackend(database_path)
 
+    run_core(problems, path_demands, path_results, core_network_name, demands_name, capacity_uniform, srg_links,
+             srg_nodes, solver, link_disjoint_engine, workers, capacity_engine, capacity_search, limits, backend,
+             length_method, cache, store, capacity_mode)
     return
 
 
@@ -0,0 +1,575 @@
+# -------------------------------------------------------------
+# Name:             benchmark_core.py
+# Purpose:          Benchmarks of the core network optimization on the bundled topologies
+# Created:          12/10/2018
+# Copyright:        (c) Chair of Communication Networks, Department of Electrical and Computer Engineering,
+#                   Technical University of Munich
+# ArcGIS Version:   10.3.1
+# Python Version:   2.7
+# -------------------------------------------------------------
+
+import os
+import time
+import pickle
+import itertools
+
+import optimize_ilp
+from optimize_ilp import *
+from milp_solvers import available_solvers
+from column_generation import optimize_path_pairs
+from graph_presolve import kept_nodes, contract_chains
+import geodesic
+from core_pipeline import read_network
+
+TOPOLOGIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'CoreNetworkTopologies')
+
+# (problem set, topology, demands prefix, SRG links file, SRG nodes file)
+TOPOLOGIES = [('ProblemSetEU', 'nobel_eu', 'demand_eu', 'srg_links.pkl', 'srg_nodes.pkl'),
+              ('ProblemSetEU', 'cost266', 'demand_eu', 'srg_links.pkl', 'srg_nodes.pkl'),
+              ('ProblemSetGER', 'nobel_ger', 'demand_ger', 'srg_links_nobel.pkl', 'srg_nodes_nobel.pkl'),
+              ('ProblemSetGER', 'germany50', 'demand_ger', 'srg_links.pkl', 'srg_nodes.pkl'),
+              ('ProblemSetUS', 'nobel_us', 'demand_us', 'srg_links_nobel.pkl', 'srg_nodes_nobel.pkl'),
+              ('ProblemSetUS', 'janos_us', 'demand_us', 'srg_links.pkl', 'srg_nodes.pkl')]
+
+
+def load_topology(problem_set, name, capacity=None):
+    """
+    Reads the bundled topology, the link lengths are the geodesic distances between the nodes in meters.
+
+    :return: networkx graph and the dictionary of the arc lengths
+    """
+    g = read_network(name, os.path.join(TOPOLOGIES_PATH, problem_set))
+    distance_dict = geodesic.edge_lengths(g, name=name)
+
+    for i, j in g.edges():
+        g[i][j]['weight'] = distance_dict[(i, j)]
+        if capacity is not None:
+            g[i][j]['capacity'] = capacity
+    return g, distance_dict
+
+
+def load_demands(problem_set, prefix, demands):
+    R = {}
+    with open(os.path.join(TOPOLOGIES_PATH, problem_set, '{0}_{1}.txt'.format(prefix, demands))) as f:
+        for line in f:
+            src, dst, cap = line.split()
+            R[(src, dst)] = int(cap)
+    return R
+
+
+def load_srgs(problem_set, srg_file):
+    with open(os.path.join(TOPOLOGIES_PATH, problem_set, srg_file), 'rb') as f:
+        return pickle.load(f)
+
+
+def full_mesh_demands(g, volume=1):
+    """
+    :return: demands between all the ordered pairs of nodes, {(source, destination): volume}
+    """
+    return dict(((s, t), volume) for s, t in itertools.permutations(g.nodes(), 2))
+
+
+def build_problems(g, distance_dict, demands, srg_links, srg_nodes, base=None):
+    """
+    :param base: ModelBase shared by the problems, None builds the base for every problem
+    :return: list of (problem, Formulation) for the six problems
+    """
+    return [('Unprotected', build_unprotected_path(g, distance_dict, demands, base=base)),
+            ('Link_Disjoint', build_link_disjoint(g, distance_dict, demands, base=base)),
+            ('Capacity', build_link_disjoint_cap(g, distance_dict, demands, base=base)),
+            ('Node_Disjoint', build_node_disjoint_cap(g, distance_dict, demands, base=base)),
+            ('SRG_Links', build_link_disjoint_cap_srg_links(g, distance_dict, demands, srg_links, base=base)),
+            ('SRG_Nodes', build_node_disjoint_cap_srg_nodes(g, distance_dict, demands, srg_nodes, base=base))]
+
+
+####################################################################################################################
+# Model build time: arc scan vs. arc index
+####################################################################################################################
+def legacy_flow_conservation(model, x, RL, G, arcs, t):
+    # The flow conservation as it was built before the arc index, scanning all the arcs for every (demand, node)
+    for r in RL:
+        for m in G.nodes():
+            model.add_constr([(x[r[0], i, j], 1) for i, j in arcs if j == m] +
+                             [(x[r[0], i, j], -1) for i, j in arcs if i == m], "=", t[r[0], m])
+    return
+
+
+def time_link_disjoint_build(G, D, R, indexed):
+    start = time.time()
+
+    f = Formulation("Link disjoint paths", G, D, R)
+    f.u = add_arc_variables(f.model, f.RL, f.arcs, "u")
+    f.v = add_arc_variables(f.model, f.RL, f.arcs, "v")
+
+    if indexed:
+        add_flow_conservation(f.model, f.u, f.RL, f.t, f.in_arcs, f.out_arcs, "Flow conservation u")
+        add_flow_conservation(f.model, f.v, f.RL, f.t, f.in_arcs, f.out_arcs, "Flow conservation v")
+    else:
+        legacy_flow_conservation(f.model, f.u, f.RL, G, f.arcs, f.t)
+        legacy_flow_conservation(f.model, f.v, f.RL, G, f.arcs, f.t)
+
+    return time.time() - start
+
+
+def benchmark_model_build(topologies=TOPOLOGIES):
+    """
+    Compares the build time of the link disjoint model with a full mesh demand set, once with the flow conservation
+    scanning the arc list and once with the arc index.
+    """
+    print('{0:<12} {1:>6} {2:>6} {3:>8} {4:>10} {5:>10} {6:>8}'.format('topology', 'nodes', 'arcs', 'demands',
+                                                                     'scan [s]', 'index [s]', 'speedup'))
+    for problem_set, name, _, _, _ in topologies:
+        g, distance_dict = load_topology(problem_set, name)
+        demands = full_mesh_demands(g)
+
+        time_scan = time_link_disjoint_build(g, distance_dict, demands, False)
+        time_index = time_link_disjoint_build(g, distance_dict, demands, True)
+
+        print('{0:<12} {1:>6} {2:>6} {3:>8} {4:>10.2f} {5:>10.2f} {6:>8.1f}'.format(
+            name, g.number_of_nodes(), 2 * g.number_of_edges(), len(demands), time_scan, time_index,
+            time_scan / time_index))
+    return
+
+
+####################################################################################################################
+# Model build time: row by row vs. sparse matrix blocks
+####################################################################################################################
+def benchmark_matrix_builder(topologies=TOPOLOGIES, capacity=50):
+    """
+    Compares the build time of the capacitated link and node disjoint models with a full mesh demand set, once row
+    by row and once from the sparse incidence matrix blocks, and checks that both give the same rows.
+    """
+    matrix_builder = optimize_ilp.MATRIX_BUILDER
+    if optimize_ilp.sp is None:
+        print('scipy is not available, the models are built row by row.')
+        return
+
+    print('{0:<12} {1:<14} {2:>8} {3:>10} {4:>10} {5:>10} {6:>8} {7:>6}'.format(
+        'topology', 'problem', 'demands', 'rows', 'rows [s]', 'matrix [s]', 'speedup', 'same'))
+    try:
+        for problem_set, name, _, _, _ in topologies:
+            g, distance_dict = load_topology(problem_set, name, capacity)
+            demands = full_mesh_demands(g)
+
+            for problem, build in (('Capacity', build_link_disjoint_cap), ('Node_Disjoint', build_node_disjoint_cap)):
+                times, models = [], []
+                for mode in (False, True):
+                    optimize_ilp.MATRIX_BUILDER = mode
+                    start = time.time()
+                    models.append(build(g, distance_dict, demands).model)
+                    times.append(time.time() - start)
+
+                same = [sorted(zip(m.row_family, (tuple(sorted(m.row(k))) for k in range(m.num_constrs)), m.sense,
+                                   m.rhs)) for m in models]
+                print('{0:<12} {1:<14} {2:>8} {3:>10} {4:>10.2f} {5:>10.2f} {6:>8.1f} {7:>6}'.format(
+                    name, problem, len(demands), models[1].num_constrs, times[0], times[1], times[0] / times[1],
+                    str(same[0] == same[1] and models[0].obj == models[1].obj)))
+    finally:
+        optimize_ilp.MATRIX_BUILDER = matrix_builder
+    return
+
+
+####################################################################################################################
+# Model build time: base model per problem vs. shared base model
+####################################################################################################################
+def benchmark_shared_base(topologies=TOPOLOGIES, capacity=50):
+    """
+    Compares the build time of all the six problems with a full mesh demand set, once with the base model built for
+    every problem and once with one base model shared by the problems, and checks that the models are the same. Both
+    start from the topology presolved for the family, as optimize_problem does.
+    """
+    print('{0:<12} {1:>8} {2:>10} {3:>12} {4:>10} {5:>8} {6:>6}'.format(
+        'topology', 'demands', 'columns', 'separate [s]', 'shared [s]', 'speedup', 'same'))
+    for problem_set, name, _, srg_links_file, srg_nodes_file in topologies:
+        g, distance_dict = load_topology(problem_set, name, capacity)
+        demands = full_mesh_demands(g)
+        srg_links = load_srgs(problem_set, srg_links_file)
+        srg_nodes = load_srgs(problem_set, srg_nodes_file)
+
+        family = ProblemFamily(g, distance_dict, demands, (srg_links, srg_nodes))
+        h, distance_h, _ = family.presolve(set())
+
+        start = time.time()
+        separate = build_problems(h, distance_h, demands, srg_links, srg_nodes)
+        separate_time = time.time() - start
+
+        start = time.time()
+        shared = build_problems(h, distance_h, demands, srg_links, srg_nodes, family.base(h, distance_h))
+        shared_time = time.time() - start
+
+        same = all(f.model.obj == p.model.obj and f.model.row_index == p.model.row_index and
+                   f.model.row_coef == p.model.row_coef and f.model.rhs == p.model.rhs
+                   for (_, f), (_, p) in zip(separate, shared))
+        print('{0:<12} {1:>8} {2:>10} {3:>12.2f} {4:>10.2f} {5:>8.1f} {6:>6}'.format(
+            name, len(demands), sum(f.model.num_vars for _, f in shared), separate_time, shared_time,
+            separate_time / shared_time, str(same)))
+    return
+
+
+####################################################################################################################
+# Solver comparison on the same instance
+####################################################################################################################
+def benchmark_solvers(topologies=TOPOLOGIES, demands_name='medium', capacity=50, solvers=None):
+    """
+    Builds every problem once and solves the same MilpModel with every available solver.
+    """
+    if solvers is None:
+        solvers = available_solvers()
+
+    print('{0:<12} {1:<14} {2:<8} {3:<12} {4:>16} {5:>10}'.format('topology', 'problem', 'solver', 'status',
+                                                                  'objective', 'time [s]'))
+    for problem_set, name, prefix, srg_links_file, srg_nodes_file in topologies:
+        g, distance_dict = load_topology(problem_set, name, capacity)
+        demands = load_demands(problem_set, prefix, demands_name)
+        srg_links = load_srgs(problem_set, srg_links_file)
+        srg_nodes = load_srgs(problem_set, srg_nodes_file)
+
+        for problem, f in build_problems(g, distance_dict, demands, srg_links, srg_nodes):
+            for solver in solvers:
+                solution = solve(f.model, solver)
+                objective = '-' if solution.objective is None else '{0:.2f}'.format(solution.objective)
+                print('{0:<12} {1:<14} {2:<8} {3:<12} {4:>16} {5:>10.2f}'.format(
+                    name, problem, solver, solution.status, objective, solution.runtime))
+    return
+
+
+####################################################################################################################
+# Link disjoint problem: Suurballe/Bhandari vs. MILP
+####################################################################################################################
+def benchmark_link_disjoint_engines(topologies=TOPOLOGIES, solver=None):
+    """
+    Solves the link disjoint problem with a full mesh demand set with the Suurballe/Bhandari algorithm and the MILP
+    and compares the total lengths.
+    """
+    if solver is None:
+        solver = available_solvers()[0]
+
+    print('{0:<12} {1:>8} {2:>14} {3:>10} {4:>10}'.format('topology', 'demands', 'suurballe [s]',
+                                                          '{0} [s]'.format(solver), 'equal'))
+    for problem_set, name, _, _, _ in topologies:
+        g, distance_dict = load_topology(problem_set, name)
+        demands = full_mesh_demands(g)
+
+        start = time.time()
+        distance1, distance2, _, _ = optimize_link_disjoint_suurballe(g, distance_dict, demands)
+        time_suurballe = time.time() - start
+
+        start = time.time()
+        ilp_distance1, ilp_distance2, _, _ = optimize_link_disjoint(g, distance_dict, demands, solver=solver)
+        time_ilp = time.time() - start
+
+        equal = abs(sum(distance1.values()) + sum(distance2.values()) -
+                    sum(ilp_distance1.values()) - sum(ilp_distance2.values())) < 1e-3 * len(demands)
+        print('{0:<12} {1:>8} {2:>14.3f} {3:>10.2f} {4:>10}'.format(name, len(demands), time_suurballe, time_ilp,
+                                                                    str(equal)))
+    return
+
+
+####################################################################################################################
+# Decomposition of the uncoupled problems into chunks of demands
+####################################################################################################################
+def benchmark_decomposition(topologies=TOPOLOGIES, solver=None, workers_options=(1, 2, 4, None)):
+    """
+    Solves the unprotected and link disjoint problems with a full mesh demand set as a single model and decomposed in
+    a process pool with different numbers of workers.
+    """
+    if solver is None:
+        solver = available_solvers()[0]
+
+    print('{0:<12} {1:<14} {2:>8} {3:>8} {4:>10}'.format('topology', 'problem', 'demands', 'workers', 'time [s]'))
+    for problem_set, name, _, _, _ in topologies:
+        g, distance_dict = load_topology(problem_set, name)
+        demands = full_mesh_demands(g)
+
+        for problem, optimize in (('Unprotected', optimize_unprotected_path),
+                                  ('Link_Disjoint', optimize_link_disjoint)):
+            for workers in workers_options:
+                start = time.time()
+                optimize(g, distance_dict, demands, solver=solver, workers=workers)
+                print('{0:<12} {1:<14} {2:>8} {3:>8} {4:>10.2f}'.format(name, problem, len(demands), str(workers),
+                                                                        time.time() - start))
+    return
+
+
+####################################################################################################################
+# Capacitated problems: column generation vs. MILP
+####################################################################################################################
+def total_length(results):
+    if results[0] == 0:
+        return None
+    return sum(results[0].values()) + sum(results[1].values())
+
+
+def benchmark_column_generation(topologies=TOPOLOGIES, solver=None, capacity=60):
+    """
+    Solves the capacitated problems with a full mesh demand set with the arc based MILP and the path based column
+    generation and compares the total lengths.
+    """
+    if solver is None:
+        solver = available_solvers()[0]
+
+    print('{0:<12} {1:<14} {2:>16} {3:>10} {4:>16} {5:>10}'.format('topology', 'problem', 'milp', 'time [s]',
+                                                                   'column gen.', 'time [s]'))
+    for problem_set, name, _, srg_links_file, srg_nodes_file in topologies:
+        g, distance_dict = load_topology(problem_set, name, capacity)
+        demands = full_mesh_demands(g)
+        srg_links = load_srgs(problem_set, srg_links_file)
+        srg_nodes = load_srgs(problem_set, srg_nodes_file)
+
+        engines = [('Capacity', (optimize_link_disjoint_cap, ()), {}),
+                   ('Node_Disjoint', (optimize_node_disjoint_cap, ()), {'node_disjoint': True}),
+                   ('SRG_Links', (optimize_link_disjoint_cap_srg_links, (srg_links,)), {'srg_links': srg_links}),
+                   ('SRG_Nodes', (optimize_node_disjoint_cap_srg_nodes, (srg_nodes,)),
+                    {'node_disjoint': True, 'srg_nodes': srg_nodes})]
+
+        for problem, (optimize, extra), options in engines:
+            start = time.time()
+            milp_length = total_length(optimize(g, distance_dict, demands, *extra, solver=solver))
+            time_milp = time.time() - start
+
+            start = time.time()
+            cg_length = total_length(optimize_path_pairs(g, distance_dict, demands, solver=solver, **options))
+            time_cg = time.time() - start
+
+            print('{0:<12} {1:<14} {2:>16} {3:>10.2f} {4:>16} {5:>10.2f}'.format(
+                name, problem, '-' if milp_length is None else '{0:.2f}'.format(milp_length), time_milp,
+                '-' if cg_length is None else '{0:.2f}'.format(cg_length), time_cg))
+    return
+
+
+####################################################################################################################
+# MIP start from the heuristic solution
+####################################################################################################################
+def benchmark_warm_start(topologies=TOPOLOGIES, demands_name='medium', capacity=50, solvers=None):
+    """
+    Solves every problem cold and from the heuristic MIP start and compares the time to the first incumbent (where
+    the solver reports it) and the total solve time. HiGHS through scipy.optimize.milp does not take a MIP start.
+    """
+    if solvers is None:
+        solvers = [solver for solver in available_solvers() if solver != 'highs']
+
+    def incumbent(solution):
+        return '-' if solution.first_incumbent is None else '{0:.2f}'.format(solution.first_incumbent)
+
+    print('{0:<12} {1:<14} {2:<8} {3:>10} {4:>10} {5:>10} {6:>10} {7:>10}'.format(
+        'topology', 'problem', 'solver', 'start [s]', 'cold inc.', 'cold [s]', 'warm inc.', 'warm [s]'))
+    for problem_set, name, prefix, srg_links_file, srg_nodes_file in topologies:
+        g, distance_dict = load_topology(problem_set, name, capacity)
+        demands = load_demands(problem_set, prefix, demands_name)
+        srg_links = load_srgs(problem_set, srg_links_file)
+        srg_nodes = load_srgs(problem_set, srg_nodes_file)
+
+        for problem, f in build_problems(g, distance_dict, demands, srg_links, srg_nodes):
+            start = time.time()
+            set_warm_start(f)
+            time_start = time.time() - start
+            warm_start = f.model.start
+
+            for solver in solvers:
+                f.model.start = {}
+                cold = solve(f.model, solver)
+                f.model.start = warm_start
+                warm = solve(f.model, solver)
+                print('{0:<12} {1:<14} {2:<8} {3:>10.2f} {4:>10} {5:>10.2f} {6:>10} {7:>10.2f}'.format(
+                    name, problem, solver, time_start, incumbent(cold), cold.runtime, incumbent(warm), warm.runtime))
+    return
+
+
+####################################################################################################################
+# Symmetry breaking between the working and the protection variables
+####################################################################################################################
+def benchmark_symmetry_breaking(topologies=None, demands_name='medium', capacity=50, solver=None,
+                                modes=(None, 'length', 'source')):
+    """
+    Solves the protected problems with every symmetry breaking mode and compares the number of the branch-and-bound
+    nodes (where the solver reports it), the solve time and the total length.
+    """
+    if topologies is None:
+        topologies = [topology for topology in TOPOLOGIES if topology[1] in ('germany50', 'cost266')]
+    if solver is None:
+        solver = available_solvers()[0]
+
+    symmetry_breaking = optimize_ilp.SYMMETRY_BREAKING
+
+    print('{0:<12} {1:<14} {2:<8} {3:>10} {4:>10} {5:>16}'.format('topology', 'problem', 'mode', 'nodes',
+                                                                   'time [s]', 'objective'))
+    try:
+        for problem_set, name, prefix, srg_links_file, srg_nodes_file in topologies:
+            g, distance_dict = load_topology(problem_set, name, capacity)
+            demands = load_demands(problem_set, prefix, demands_name)
+            srg_links = load_srgs(problem_set, srg_links_file)
+            srg_nodes = load_srgs(problem_set, srg_nodes_file)
+
+            for mode in modes:
+                optimize_ilp.SYMMETRY_BREAKING = mode
+                for problem, f in build_problems(g, distance_dict, demands, srg_links, srg_nodes):
+                    if problem == 'Unprotected':
+                        continue
+                    solution = solve(f.model, solver)
+                    objective = '-' if solution.objective is None else '{0:.2f}'.format(solution.objective)
+                    print('{0:<12} {1:<14} {2:<8} {3:>10} {4:>10.2f} {5:>16}'.format(
+                        name, problem, str(mode), '-' if solution.nodes is None else solution.nodes, solution.runtime,
+                        objective))
+    finally:
+        optimize_ilp.SYMMETRY_BREAKING = symmetry_breaking
+    return
+
+
+####################################################################################################################
+# Lazy node disjointness and SRG constraints
+####################################################################################################################
+def benchmark_lazy_constraints(topologies=TOPOLOGIES, demands_name='medium', capacity=50, solvers=None):
+    """
+    Solves the node disjoint and the SRG problems with all the rows up front and with the lazy constraints, and
+    compares the number of the rows of the lazy families and the solve time.
+    """
+    if solvers is None:
+        solvers = available_solvers()
+    lazy_constraints = optimize_ilp.LAZY_CONSTRAINTS
+
+    print('{0:<12} {1:<14} {2:<8} {3:>10} {4:>10} {5:>10} {6:>10} {7:>6}'.format(
+        'topology', 'problem', 'solver', 'all rows', 'all [s]', 'lazy rows', 'lazy [s]', 'same'))
+    try:
+        for problem_set, name, prefix, srg_links_file, srg_nodes_file in topologies:
+            g, distance_dict = load_topology(problem_set, name, capacity)
+            demands = load_demands(problem_set, prefix, demands_name)
+            srg_links = load_srgs(problem_set, srg_links_file)
+            srg_nodes = load_srgs(problem_set, srg_nodes_file)
+
+            for problem, build, extra in (('Node_Disjoint', build_node_disjoint_cap, ()),
+                                          ('SRG_Links', build_link_disjoint_cap_srg_links, (srg_links,)),
+                                          ('SRG_Nodes', build_node_disjoint_cap_srg_nodes, (srg_nodes,))):
+                for solver in solvers:
+                    optimize_ilp.LAZY_CONSTRAINTS = False
+                    f = build(g, distance_dict, demands, *extra)
+                    full = solve(f.model, solver)
+
+                    optimize_ilp.LAZY_CONSTRAINTS = True
+                    f = build(g, distance_dict, demands, *extra)
+                    rows = f.model.num_constrs
+                    lazy = solve(f.model, solver, lazy_separator(f))
+
+                    same = full.status == lazy.status and (full.status != OPTIMAL or
+                                                           abs(full.objective - lazy.objective) < 1e-6 * full.objective)
+                    print('{0:<12} {1:<14} {2:<8} {3:>10} {4:>10.2f} {5:>10} {6:>10.2f} {7:>6}'.format(
+                        name, problem, solver, enumerated_rows(f), full.runtime, f.model.num_constrs - rows,
+                        lazy.runtime, str(same)))
+    finally:
+        optimize_ilp.LAZY_CONSTRAINTS = lazy_constraints
+    return
+
+
+####################################################################################################################
+# Capacity per link vs. per arc
+####################################################################################################################
+def benchmark_capacity_mode(topologies=TOPOLOGIES, demands_name='medium', solver=None):
+    """
+    Compares the capacity rows and the minimum feasible uniform capacity of the Capacity problem with the capacity
+    shared by both directions of a link and with the full capacity per arc.
+    """
+    if solver is None:
+        solver = available_solvers()[0]
+
+    print('{0:<12} {1:<6} {2:>10} {3:>10} {4:>14}'.format('topology', 'mode', 'cap. rows', 'min. cap.', 'length'))
+    for problem_set, name, prefix, _, _ in topologies:
+        g, distance_dict = load_topology(problem_set, name, 1)
+        demands = load_demands(problem_set, prefix, demands_name)
+
+        for mode in ('arc', 'link'):
+            f = build_link_disjoint_cap(g, distance_dict, demands, capacity_mode=mode)
+            capacity, probes = minimum_capacity(build_link_disjoint_cap, g, distance_dict, demands, (), solver, mode)
+            length = [objective for probed, _, objective in probes if probed == capacity]
+            print('{0:<12} {1:<6} {2:>10} {3:>10} {4:>14}'.format(
+                name, mode, len(set(f.capacity_rows.values())), str(capacity),
+                '{0:.2f}'.format(length[0]) if length else '-'))
+    return
+
+
+####################################################################################################################
+# Presolve: contracted degree-2 chains and pruned arcs per demand
+####################################################################################################################
+def benchmark_presolve(topologies=TOPOLOGIES, demands_name='medium', capacity=50):
+    """
+    Compares the size of the models built on the original topology with all the arcs for every demand and on the
+    presolved topology.
+    """
+    presolve = optimize_ilp.PRESOLVE
+
+    print('{0:<12} {1:<14} {2:>8} {3:>10} {4:>10} {5:>10} {6:>10}'.format(
+        'topology', 'problem', 'nodes', 'columns', 'rows', 'columns p', 'rows p'))
+    try:
+        for problem_set, name, prefix, srg_links_file, srg_nodes_file in topologies:
+            g, distance_dict = load_topology(problem_set, name, capacity)
+            demands = load_demands(problem_set, prefix, demands_name)
+            srg_links = load_srgs(problem_set, srg_links_file)
+            srg_nodes = load_srgs(problem_set, srg_nodes_file)
+
+            optimize_ilp.PRESOLVE = False
+            original = build_problems(g, distance_dict, demands, srg_links, srg_nodes)
+
+            optimize_ilp.PRESOLVE = True
+            h, distance_h, _ = contract_chains(g, distance_dict, kept_nodes(demands, (srg_links, srg_nodes)), demands)
+            presolved = build_problems(h, distance_h, demands, srg_links, srg_nodes)
+
+            for (problem, f), (_, p) in zip(original, presolved):
+                print('{0:<12} {1:<14} {2:>8} {3:>10} {4:>10} {5:>10} {6:>10}'.format(
+                    name, problem, '{0}/{1}'.format(h.number_of_nodes(), g.number_of_nodes()), f.model.num_vars,
+                    f.model.num_constrs, p.model.num_vars, p.model.num_constrs))
+    finally:
+        optimize_ilp.PRESOLVE = presolve
+    return
+
+
+####################################################################################################################
+# Link lengths: pair by pair vs. all the links at once
+####################################################################################################################
+def benchmark_edge_lengths(topologies=TOPOLOGIES, repeat=100):
+    """
+    Compares the time of the link lengths computed link by link and for all the links at once with every method, and
+    the largest difference of the lengths to Karney's algorithm in meters, when geographiclib is installed.
+    """
+    def timed(function):
+        start = time.time()
+        for _ in range(repeat):
+            lengths = function()
+        return lengths, (time.time() - start) / repeat * 1000
+
+    print('{0:<12} {1:>6} {2:<10} {3:>12} {4:>12} {5:>12}'.format(
+        'topology', 'links', 'method', 'link [ms]', 'all [ms]', 'max diff [m]'))
+    for problem_set, name, _, _, _ in topologies:
+        g = read_network(name, os.path.join(TOPOLOGIES_PATH, problem_set))
+        longitude, latitude = nx.get_node_attributes(g, 'Longitude'), nx.get_node_attributes(g, 'Latitude')
+        edges = list(g.edges())
+        coordinates = [[longitude[i] for i, _ in edges], [latitude[i] for i, _ in edges],
+                       [longitude[j] for _, j in edges], [latitude[j] for _, j in edges]]
+
+        reference = None
+        if geodesic.Geodesic is not None:
+            reference = geodesic.distances(*coordinates, method='karney')
+
+        for method in geodesic.METHODS:
+            if method == 'karney' and reference is None:
+                continue
+            _, link_time = timed(lambda: [geodesic.distances([lon1], [lat1], [lon2], [lat2], method)
+                                          for lon1, lat1, lon2, lat2 in zip(*coordinates)])
+            lengths, all_time = timed(lambda: geodesic.distances(*coordinates, method=method))
+            difference = '-' if reference is None else '{0:.4f}'.format(max(abs(lengths - reference)))
+            print('{0:<12} {1:>6} {2:<10} {3:>12.3f} {4:>12.3f} {5:>12}'.format(
+                name, len(edges), method, link_time, all_time, difference))
+    return
+
+
+if __name__ == '__main__':
+    benchmark_model_build()
+    benchmark_matrix_builder()
+    benchmark_shared_base()
+    benchmark_solvers()
+    benchmark_link_disjoint_engines()
+    benchmark_decomposition()
+    benchmark_column_generation()
+    benchmark_warm_start()
+    benchmark_symmetry_breaking()
+    benchmark_lazy_constraints()
+    benchmark_capacity_mode()
+    benchmark_presolve()
+    benchmark_edge_lengths()
@@ -0,0 +1,400 @@
+# -------------------------------------------------------------
+# Name:             column_generation.py
+# Purpose:          Path based column generation for the capacitated protection problems
+# Created:          12/10/2018
+# Copyright:        (c) Chair of Communication Networks, Department of Electrical and Computer Engineering,
+#                   Technical University of Munich
+# ArcGIS Version:   10.3.1
+# Python Version:   2.7
+# -------------------------------------------------------------
+
+import itertools
+import networkx as nx
+
+from milp_model import MilpModel
+from milp_solvers import solve, OPTIMAL, FEASIBLE, INFEASIBLE, NOT_SOLVED
+from disjoint_paths import disjoint_path, link_disjoint_pair, split_nodes, node_disjoint_pair, arc_adjacency
+from optimize_ilp import add_message, directed_arcs, solution_paths, build_link_disjoint, build_node_disjoint, \
+    add_link_disjointness, add_srg_links, add_srg_nodes, srg_conflict, report_infeasible_demands, lazy_separator, \
+    capacity_groups, SolveResults, build_link_disjoint_cap, build_node_disjoint_cap, \
+    build_link_disjoint_cap_srg_links, build_node_disjoint_cap_srg_nodes, solve_formulation
+from graph_presolve import infeasible_demands
+
+# Reduced cost, below which a path pair is added to the master problem
+REDUCED_COST_TOLERANCE = 1e-6
+
+
+class PathPairProblem(object):
+    """
+    The data of one of the capacitated problems: the arcs with their lengths and capacities, the demands and the
+    disjointness and SRG rules, which every column (pair of a working and a protection path) has to satisfy.
+    """
+
+    def __init__(self, G, D, R, node_disjoint=False, srg_links=None, srg_nodes=None, capacity_mode=None):
+        self.G = G
+        self.R = R
+        self.RL = list(enumerate(R))
+        self.arcs, self.d, self.c = directed_arcs(G, D)
+        self.capacity_mode = capacity_mode
+        self.groups = capacity_groups(self.arcs, capacity_mode)
+        self.node_disjoint = node_disjoint
+        self.srg_links = srg_links
+        self.srg_nodes = srg_nodes
+
+        # Penalty of a unit of the capacity overload, larger than the length of any path pair
+        self.big_m = 2 * sum(self.d.values()) + 1
+
+        # Status of the column generation: OPTIMAL if the integer solution reaches the LP bound, otherwise FEASIBLE;
+        # the status of the arc formulation, if it is solved instead, see solve_arc_formulation
+        self.status = None
+
+    def length(self, path):
+        return sum(self.d[i, j] for i, j in path)
+
+    def conflict(self, dem, p, q):
+        """
+        :return: True if the pair of the paths p and q of the demand dem violates one of the SRGs
+        """
+        return srg_conflict(dem, p, q, self.srg_links, self.srg_nodes)
+
+
+####################################################################################################################
+# Initial columns
+####################################################################################################################
+def initial_columns(problem, k):
+    """
+    Per demand the pair of Suurballe/Bhandari and the k shortest working paths, each with the shortest disjoint
+    protection path. The pairs violating the SRGs are dropped.
+
+    :return: dictionary {r: [(working path, protection path)]}
+    """
+    adjacency = arc_adjacency(problem.G, problem.d)
+    split = split_nodes(adjacency) if problem.node_disjoint else None
+
+    directed = nx.DiGraph()
+    for i, j in problem.arcs:
+        directed.add_edge(i, j, weight=problem.d[i, j])
+
+    columns = {}
+    for r, (src, dst) in problem.RL:
+        candidates = []
+        if problem.node_disjoint:
+            pair = node_disjoint_pair(split, src, dst)
+        else:
+            pair = link_disjoint_pair(adjacency, src, dst)
+        if pair is not None:
+            candidates.append(pair)
+
+        for nodes in itertools.islice(nx.shortest_simple_paths(directed, src, dst, weight='weight'), k):
+            working = list(zip(nodes[:-1], nodes[1:]))
+            protection = disjoint_path(adjacency, src, dst, working, problem.node_disjoint)
+            if protection is not None:
+                candidates.append((working, protection))
+
+        columns[r] = []
+        for p, q in candidates:
+            add_column(problem, columns[r], (src, dst), p, q)
+
+    return columns
+
+
+def add_column(problem, columns, dem, p, q):
+    """
+    Appends the pair to the columns of the demand, if it is new and does not violate the SRGs.
+
+    :return: True if the pair is added
+    """
+    if problem.conflict(dem, p, q):
+        return False
+    for p_old, q_old in columns:
+        if (p_old, q_old) == (p, q) or (p_old, q_old) == (q, p):
+            return False
+    columns.append((p, q))
+    return True
+
+
+####################################################################################################################
+# Master problem
+####################################################################################################################
+def build_master(problem, columns, vtype):
+    """
+    Every demand chooses one of its path pairs (lambda), the path pairs of all the demands share the capacity of the
+    arcs (or links, see optimize_ilp.capacity_groups). The capacity can be exceeded at the cost big_m per unit (slack),
+    so that the master problem is always feasible and its duals can be used for the pricing.
+
+    :param vtype: 'C' for the LP relaxation, 'B' for the final integer solve
+    :return: MilpModel, variables lambda {(r, n): index}, slack {group: index}, convexity rows {r: index} and
+             capacity rows {arc: index}, the arcs of a link share the row
+    """
+    model = MilpModel("Path pair master")
+
+    group_of = dict((arc, g) for g, group in enumerate(problem.groups) for arc in group)
+
+    lam = {}
+    usage = [[] for _ in problem.groups]
+    for r, dem in problem.RL:
+        for n, (p, q) in enumerate(columns[r]):
+            lam[r, n] = model.add_var(problem.length(p) + problem.length(q), 0.0, 1.0, vtype, "lambda", (r, n))
+            for arc in p + q:
+                usage[group_of[arc]].append((lam[r, n], problem.R[dem]))
+
+    slack = model.add_vars(range(len(problem.groups)), "slack", problem.big_m, 0.0, float('inf'), 'C')
+
+    # Each demand chooses one pair of paths
+    convexity = {}
+    for r, _ in problem.RL:
+        convexity[r] = model.add_constr([(lam[r, n], 1) for n in range(len(columns[r]))], "=", 1, "Convexity")
+
+    # Capacity constraint
+    capacity = {}
+    for g, group in enumerate(problem.groups):
+        row = model.add_constr(usage[g] + [(slack[g], -1)], "<", problem.c[group[0]], "Capacity")
+        for arc in group:
+            capacity[arc] = row
+
+    return model, lam, slack, convexity, capacity
+
+
+####################################################################################################################
+# Pricing
+####################################################################################################################
+def price_with_milp(problem, dem, weights, solver):
+    """
+    Minimum weight pair of disjoint paths satisfying the SRGs of the demand, solved with the MILP formulation of the
+    single demand.
+    """
+    if problem.node_disjoint:
+        f = build_node_disjoint(problem.G, weights, {dem: problem.R[dem]}, "Pricing")
+        # The pair must not share the arc between adjacent source and destination either
+        add_link_disjointness(f.model, f.u, f.v, f.RL, f.arcs)
+    else:
+        f = build_link_disjoint(problem.G, weights, {dem: problem.R[dem]}, "Pricing")
+
+    if problem.srg_links is not None:
+        add_srg_links(f, problem.srg_links)
+    if problem.srg_nodes is not None:
+        add_srg_nodes(f, problem.srg_nodes)
+
+    solution = solve(f.model, solver, lazy_separator(f))
+    if solution.status != OPTIMAL:
+        return None
+
+    working, protection = solution_paths(f, solution)
+    return working[0], protection[0]
+
+
+def price_demand(problem, dem, weights, solver):
+    """
+    The pricing subproblem of the demand: minimum weight pair of disjoint paths on the dual weighted arcs. The pair
+    of Suurballe/Bhandari is optimal if it satisfies the SRGs, otherwise the MILP of the single demand is solved.
+
+    :return: (working path, protection path) or None
+    """
+    src, dst = dem
+    adjacency = dict((n, []) for n in problem.G.nodes())
+    for i, j in problem.arcs:
+        adjacency[i].append((j, weights[i, j]))
+
+    if problem.node_disjoint:
+        pair = node_disjoint_pair(split_nodes(adjacency), src, dst)
+    else:
+        pair = link_disjoint_pair(adjacency, src, dst)
+
+    if pair is None or not problem.conflict(dem, pair[0], pair[1]):
+        return pair
+    return price_with_milp(problem, dem, weights, solver)
+
+
+####################################################################################################################
+# Column generation
+####################################################################################################################
+def column_generation(problem, solver='gurobi', k=3, max_iterations=100, limits=None):
+    """
+    Solves the LP relaxation of the master problem with column generation and the integer master problem on the
+    generated columns. The problem is infeasible, if the LP master still overloads the capacity when the pricing
+    converges. If the integer master has no solution within the capacity, the arc formulation is solved instead,
+    starting from the columns, see solve_arc_formulation.
+
+    :param k: number of the shortest working paths of the initial columns per demand
+    :param max_iterations: maximum number of the pricing rounds
+    :param limits: milp_solvers.SolveLimits of the integer master problem and of the arc formulation or None
+    :return: dictionary {dem: (working path, protection path)} or None, if no feasible solution is found
+    """
+    problem.status = NOT_SOLVED
+    columns = initial_columns(problem, k)
+
+    # The demands without an initial column get the pair of the pricing on the arc lengths
+    for r, dem in problem.RL:
+        if not columns[r]:
+            pair = price_demand(problem, dem, problem.d, solver)
+            if pair is None:
+                add_message('Optimal solution is not found! There are no two disjoint paths satisfying the SRGs '
+                            'for the demand {0}-{1}.'.format(dem[0], dem[1]))
+                problem.status = INFEASIBLE
+                return None
+            add_column(problem, columns[r], dem, pair[0], pair[1])
+
+    # The last LP master, None if no pricing round is run
+    solution, lam = None, {}
+    lower_bound = None
+    converged = False
+    for iteration in range(max_iterations):
+        model, lam, slack, convexity, capacity = build_master(problem, columns, 'C')
+        solution = solve(model, solver)
+        if solution.status != OPTIMAL or solution.duals is None:
+            add_message('The master LP is not solved: {0}.'.format(solution.status))
+            return solve_arc_formulation(problem, columns, solver, limits)
+
+        lower_bound = solution.objective
+
+        # Arc weights of the pricing: length minus the dual of the capacity (not positive for the '<' rows)
+        mu = dict((arc, min(solution.duals[capacity[arc]], 0.0)) for arc in problem.arcs)
+
+        added = 0
+        for r, dem in problem.RL:
+            weights = dict((arc, problem.d[arc] - problem.R[dem] * mu[arc]) for arc in problem.arcs)
+            pair = price_demand(problem, dem, weights, solver)
+            if pair is None:
+                continue
+
+            pi = solution.duals[convexity[r]]
+            reduced_cost = sum(weights[arc] for arc in pair[0] + pair[1]) - pi
+            if reduced_cost < -REDUCED_COST_TOLERANCE * max(1.0, abs(pi)):
+                added += add_column(problem, columns[r], dem, pair[0], pair[1])
+
+        if added == 0:
+            converged = True
+            break
+
+    # No column with a negative reduced cost is left, so the LP relaxation cannot be met within the capacity
+    if converged and any(solution.x[index] > 1e-6 for index in slack.values()):
+        add_message('Optimal solution is not found! The model is infeasible.')
+        problem.status = INFEASIBLE
+        return None
+    if not converged:
+        add_message('Column generation stopped after {0} pricing rounds without convergence, the LP objective is not '
+                    'a bound.'.format(max_iterations))
+
+    # The columns of every demand in the order of their values in the last LP, the start of the arc formulation; the
+    # columns added after the last LP come last
+    values = {} if solution is None else dict((key, solution.x[index]) for key, index in lam.items())
+    ordered = dict((r, [columns[r][n] for n in sorted(range(len(columns[r])),
+                                                      key=lambda n: ((r, n) not in values, -values.get((r, n), 0.0)))])
+                   for r, _ in problem.RL)
+
+    # Integer solve on the generated columns
+    model, lam, slack, convexity, capacity = build_master(problem, columns, 'B')
+    solution = solve(model, solver, limits=limits)
+    if solution.status not in (OPTIMAL, FEASIBLE) or any(solution.x[index] > 1e-6 for index in slack.values()):
+        add_message('No feasible solution is found on the {0} generated path pairs, the arc formulation is '
+                    'solved.'.format(model.num_vars - len(slack)))
+        return solve_arc_formulation(problem, ordered, solver, limits)
+
+    add_message('Column generation: {0} path pairs, LP bound {1}, integer solution {2:.2f}'.format(
+        model.num_vars - len(slack), '{0:.2f}'.format(lower_bound) if converged else '-', solution.objective))
+    # Only the LP master of the converged pricing bounds the objective
+    if converged and solution.status == OPTIMAL and \
+            solution.objective <= lower_bound + 1e-6 * max(1.0, abs(lower_bound)):
+        problem.status = OPTIMAL
+    else:
+        problem.status = FEASIBLE
+
+    chosen = {}
+    for (r, n), index in lam.items():
+        if solution.x[index] > 0.5:
+            chosen[problem.RL[r][1]] = columns[r][n]
+    return chosen
+
+
+def arc_formulation(problem):
+    """
+    :return: the arc based MILP formulation of the problem, see optimize_ilp, None for the node SRGs of the link
+             disjoint paths, which have no arc formulation
+    """
+    if problem.node_disjoint:
+        if problem.srg_nodes is not None:
+            f = build_node_disjoint_cap_srg_nodes(problem.G, problem.d, problem.R, problem.srg_nodes,
+                                                  capacity_mode=problem.capacity_mode)
+        else:
+            f = build_node_disjoint_cap(problem.G, problem.d, problem.R, capacity_mode=problem.capacity_mode)
+        if problem.srg_links is not None:
+            add_srg_links(f, problem.srg_links)
+        return f
+
+    if problem.srg_nodes is not None:
+        return None
+    if problem.srg_links is not None:
+        return build_link_disjoint_cap_srg_links(problem.G, problem.d, problem.R, problem.srg_links,
+                                                 capacity_mode=problem.capacity_mode)
+    return build_link_disjoint_cap(problem.G, problem.d, problem.R, capacity_mode=problem.capacity_mode)
+
+
+def solve_arc_formulation(problem, columns, solver='gurobi', limits=None):
+    """
+    Solves the arc based MILP formulation of the problem, when the generated columns do not contain an integer
+    solution within the capacity. The heuristic of the warm start tries the columns of each demand first, see
+    optimize_ilp.heuristic_paths.
+
+    :param columns: dictionary {r: [(working path, protection path)]} in the order, in which they are tried
+    :return: dictionary {dem: (working path, protection path)} or None, if no feasible solution is found
+    """
+    f = arc_formulation(problem)
+    if f is None:
+        add_message('Optimal solution is not found! The node SRGs of the link disjoint paths have no arc formulation.')
+        problem.status = NOT_SOLVED
+        return None
+
+    f.start_pairs = columns
+    solution = solve_formulation(f, solver, limits)
+    problem.status = solution.status
+    if solution.status not in (OPTIMAL, FEASIBLE):
+        return None
+
+    working, protection = solution_paths(f, solution)
+    return dict((dem, (working[r], protection[r])) for r, dem in f.RL)
+
+
+def optimize_path_pairs(G, D, R, node_disjoint=False, srg_links=None, srg_nodes=None, solver='gurobi', k=3,
+                        max_iterations=100, limits=None, capacity_mode=None):
+    """
+    Path based alternative to the MILP formulations of the Capacity, Node_Disjoint, SRG_Links and SRG_Nodes problems.
+    The integer solve is restricted to the generated columns, so the solution is not proven optimal, unless it
+    reaches the LP bound; the status of the results is OPTIMAL or FEASIBLE accordingly. Without an integer solution
+    on the columns the arc formulation is solved and its status is returned.
+
+    :param G: networkx graph of the topology, with the edge attribute "capacity"
+    :param D: python dictionary with the lengths of the arcs, {(i, j): length}
+    :param R: python dictionary with the demands, {(source, destination): volume}
+    :param node_disjoint: if True the paths are node disjoint, otherwise link disjoint
+    :param srg_links: python dictionary of the link SRGs or None
+    :param srg_nodes: python dictionary of the node SRGs or None
+    :param limits: milp_solvers.SolveLimits of the integer master problem or None
+    :param capacity_mode: 'arc' or 'link', None uses optimize_ilp.CAPACITY_MODE, see optimize_ilp.capacity_groups
+    :return: optimize_ilp.SolveResults distance1, distance2, path1, path2 in the format of optimize_link_disjoint_cap
+    """
+    infeasible = infeasible_demands(G, R, 'node' if node_disjoint else 'link', srg_links, srg_nodes)
+    if infeasible:
+        report_infeasible_demands(infeasible)
+        return SolveResults((0, 0, 0, 0), INFEASIBLE)
+
+    problem = PathPairProblem(G, D, R, node_disjoint, srg_links, srg_nodes, capacity_mode)
+    chosen = column_generation(problem, solver, k, max_iterations, limits)
+
+    if chosen is None:
+        return SolveResults((0, 0, 0, 0), problem.status)
+
+    distance1, distance2 = {}, {}
+    path1, path2 = {}, {}
+    for dem, (p1, p2) in chosen.items():
+        d1, d2 = problem.length(p1), problem.length(p2)
+
+        # Select the shorter path as working path and longer as backup path
+        if d1 > d2:
+            p1, p2, d1, d2 = p2, p1, d2, d1
+
+        distance1[dem] = d1
+        distance2[dem] = d2
+        path1[dem] = p1
+        path2[dem] = p2
+
+    return SolveResults((distance1, distance2, path1, path2), problem.status)
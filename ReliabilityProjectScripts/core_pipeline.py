@@ -0,0 +1,417 @@
+# -------------------------------------------------------------
+# Name:             core_pipeline.py
+# Purpose:          Core network protection without ArcGIS: reads the topology and the demands, optimizes the selected
+#                   problems and writes the results, the map output is left to a GIS backend
+# Created:          12/10/2018
+# Copyright:        (c) Chair of Communication Networks, Department of Electrical and Computer Engineering,
+#                   Technical University of Munich
+# ArcGIS Version:   10.3.1
+# Python Version:   2.7
+# -------------------------------------------------------------
+
+import os
+import pickle
+
+import optimize_ilp
+from optimize_ilp import *
+from column_generation import optimize_path_pairs
+from geodesic import edge_lengths
+from gis_backends import GisBackend
+from result_cache import ResultCache, result_key, limits_key, versioned_name, NAME_DIGEST
+from results_store import ResultsStore, RESULT_FILES
+
+PROBLEMS = ('Unprotected', 'Link_Disjoint', 'Capacity', 'Node_Disjoint', 'SRG_Links', 'SRG_Nodes')
+
+# Lengths of the links with the length method 'gis', if the backend does not measure them, see geodesic.METHODS
+GIS_FALLBACK_METHOD = 'vincenty'
+
+# The problems of run_core in the order of the solves: problem, title, MILP function, keyword arguments of
+# column_generation.optimize_path_pairs (None if the problem is not capacitated), keyword of its SRGs and name of its
+# paths in the map
+OPTIMIZED_PROBLEMS = [
+    ('Unprotected', 'Unprotected paths', optimize_unprotected_path, None, None, 'unprotected'),
+    ('Link_Disjoint', 'Link disjoint paths', optimize_link_disjoint, None, None, 'LinkDisjoint'),
+    ('Capacity', 'Link disjoint paths with capacity constraint', optimize_link_disjoint_cap, {}, None,
+     'LinkDisjoint_cap'),
+    ('Node_Disjoint', 'Node disjoint paths with capacity constraint', optimize_node_disjoint_cap,
+     {'node_disjoint': True}, None, 'NodeDisjoint_cap'),
+    ('SRG_Links', 'Link disjoint paths with capacity constraint and link SRGs', optimize_link_disjoint_cap_srg_links,
+     {}, 'srg_links', 'SRG_links_cap'),
+    ('SRG_Nodes', 'Node disjoint paths with capacity constraint and node SRGs', optimize_node_disjoint_cap_srg_nodes,
+     {'node_disjoint': True}, 'srg_nodes', 'SRG_nodes_cap')]
+
+
+####################################################################################################################
+# Input
+####################################################################################################################
+# Read network
+def read_network(name, path='#'):
+    if path == '#':
+        topo = name + '.graphml'
+    else:
+        name_full = name + '.graphml'
+        topo = os.path.join(path, name_full)
+
+    g = nx.read_graphml(topo)
+    return g
+
+
+# Read demands
+def read_demand(name, path='#'):
+    if path == '#':
+        filename = name + '.txt'
+    else:
+        filename = os.path.join(path, name + '.txt')
+
+    fp = open(filename)
+    lines = fp.readlines()
+    # Read demands from file in the format
+    # "source" "destination" "capacity"
+    R = {}
+    for line in lines:
+        src, dst, cap = line.split()
+        R[(src, dst)] = int(cap)
+
+    fp.close()
+    return R
+
+
+# Read SRGs
+def read_srgs(path, srg_file):
+    """
+    :param srg_file: string, name of the .pkl file of the SRGs or None
+    :return: python dictionary of the SRGs, None if there is no SRG file
+    """
+    if srg_file is None:
+        return None
+    srg_path = os.path.join(path, srg_file)
+    if not os.path.isfile(srg_path):
+        return None
+    with open(srg_path, 'rb') as f_srgs:
+        return pickle.load(f_srgs)
+
+
+def graph_properties(G):
+    graph_properties_dic = {'#nodes': nx.number_of_nodes(G), '#edges': nx.number_of_edges(G), 'diameter': nx.diameter(G)}
+
+    node_degree_all = dict(nx.degree(G))
+    graph_properties_dic['average_node_degree'] = float(sum(node_degree_all.values())) / float(len(node_degree_all))
+
+    edge_lengths_all = nx.get_edge_attributes(G, "weight")
+    graph_properties_dic['average_edge_length'] = float(sum(edge_lengths_all.values())) / float(len(edge_lengths_all))
+    graph_properties_dic['maximum_edge_length'] = max(edge_lengths_all.values())
+
+    return graph_properties_dic
+
+
+def problem_limits(limits, problem):
+    """
+    :param limits: milp_solvers.SolveLimits for all the problems, a python dictionary {problem: SolveLimits} or None
+    :param problem: name of the problem, key of the problems dictionary of run_core
+    :return: the solve limits of the problem, None without limits
+    """
+    if isinstance(limits, dict):
+        return limits.get(problem)
+    return limits
+
+
+####################################################################################################################
+def run_core(problems, path_demands, path_results, core_network_name, demands_name, capacity_uniform, srg_links,
+             srg_nodes, solver='gurobi', link_disjoint_engine='ilp', workers=1, capacity_engine='ilp',
+             capacity_search=False, limits=None, backend=None, length_method='gis', cache=None, store=None,
+             capacity_mode=None):
+    """
+    The core network analysis of CoreNetworkProtection.main without ArcGIS: the map output goes through the backend.
+
+    :param problems: python dictionary, keys are the type of problem and the boolean saying if the problem has to be
+                     evaluated, see PROBLEMS
+    :param path_demands:  a string with the full path, where the topology, the demands and the SRGs are stored
+    :param path_results:  a string with the path, where the .pkl results will be stored
+    :param core_network_name: string name of the input topology
+    :param demands_name: string with the name of the demands
+    :param capacity_uniform: int, with the uniform capacity for each arc of the graph
+    :param srg_links: string, name of the file where the .pkl is stored
+    :param srg_nodes: string, name of the file where the .pkl is stored
+    :param backend: gis_backends.GisBackend, which draws the topology, the demands and the paths; None draws nothing
+    :param length_method: string, 'gis' (default) for the lengths measured by the backend, Vincenty's lengths if the
+                          backend does not measure them; 'vincenty' or 'karney' for the geodesic lengths of the links
+                          on the WGS84 ellipsoid, 'haversine' for the great circle lengths, see geodesic.METHODS
+    :param cache: result_cache.ResultCache of the solutions, None uses the folder result_cache in path_results, False
+                  solves every problem again; the result files are named with the hash of their inputs, see
+                  result_cache.versioned_name
+    :param store: results_store.ResultsStore, into which the results are written next to the .pkl files, None uses
+                  results.sqlite in path_results, False writes the .pkl files only
+    :param capacity_mode: string, 'arc' or 'link' capacity of the capacitated problems, None uses
+                          optimize_ilp.CAPACITY_MODE ('arc'), see optimize_ilp.capacity_groups
+    :return: graph properties; working and protection paths in .pkl files
+
+    For the other parameters see CoreNetworkProtection.main.
+    """
+
+    if backend is None:
+        backend = GisBackend()
+
+    if capacity_mode is None:
+        capacity_mode = optimize_ilp.CAPACITY_MODE
+
+    if cache is None:
+        cache = ResultCache(os.path.join(path_results, 'result_cache'))
+
+    # Key of the result of a problem, see result_cache.result_key
+    def problem_key(problem, srg_file=None, engine=None):
+        options = {'solver': solver, 'engine': engine, 'length_method': length_source,
+                   'capacity_mode': capacity_mode, 'limits': limits_key(problem_limits(limits, problem)),
+                   'presolve': optimize_ilp.PRESOLVE, 'symmetry_breaking': optimize_ilp.SYMMETRY_BREAKING,
+                   'lazy_constraints': optimize_ilp.LAZY_CONSTRAINTS, 'warm_start': optimize_ilp.WARM_START}
+        srg_path = None if srg_file is None else os.path.join(path_demands, srg_file)
+        return result_key(os.path.join(path_demands, core_network_name + '.graphml'),
+                          os.path.join(path_demands, demands_name + '.txt'), capacity_uniform, srg_path, problem,
+                          options)
+
+    # Stored solution and its status, (None, None) if the problem has to be solved
+    def cached(key):
+        entry = cache.get(key) if cache is not False else None
+        if entry is None:
+            return None, None
+        add_message('Stored result {0} is used.'.format(key[:NAME_DIGEST]))
+        return entry['solution'], entry['status']
+
+    # Only the optimal solutions are stored, a solution stopped at the solve limits or without a solution may change
+    # with the next run
+    def store_solution(key, solution, status):
+        if cache is not False and status == OPTIMAL:
+            cache.put(key, {'solution': solution, 'status': status})
+        return
+
+    if store is None:
+        store = ResultsStore(os.path.join(path_results, 'results.sqlite'))
+
+    # Writes the result of a problem into the results store
+    def save_run(problem, key, result, output_file):
+        if store is not False:
+            store.add_run(core_network_name, demands_name, problem, capacity_uniform, result, demands, key,
+                          output_file)
+        return
+
+    add_message('Importing underlying core network topology: {0}.'.format(core_network_name))
+
+    ####################################################################################################################
+    # Import topology
+    ####################################################################################################################
+    g = read_network(core_network_name, path_demands)
+
+    # Lengths of the links from the node coordinates, cached in path_results until the topology changes
+    length_source = GIS_FALLBACK_METHOD if length_method == 'gis' else length_method
+    distance_dict = edge_lengths(g, length_source, path_results, core_network_name)
+    for i, j in g.edges():
+        g[i][j]["weight"] = distance_dict[(i, j)]
+    backend.add_topology(g, core_network_name)
+
+    # The geodesic lengths measured by the GIS, e.g., ArcGIS, are used instead, if the backend measures them
+    if length_method == 'gis':
+        measured = backend.edge_lengths(g)
+        if measured is not None:
+            length_source, distance_dict = 'gis', measured
+            for i, j in g.edges():
+                g[i][j]["weight"] = distance_dict[(i, j)]
+        else:
+            add_warning('The backend does not measure the link lengths, the {0} lengths are used instead of the GIS '
+                        'lengths.'.format(GIS_FALLBACK_METHOD))
+
+    for i, j in g.edges():
+        g[i][j]["capacity"] = capacity_uniform
+    backend.set_capacity(capacity_uniform)
+
+    output_file_dist = os.path.join(path_results, 'graph_distances_{0}.pkl'.format(core_network_name))
+
+    with open(output_file_dist, 'wb') as f_d:
+        pickle.dump(distance_dict, f_d)
+
+    # Input demands
+    demands = read_demand(demands_name, path_demands)
+    backend.add_demands(demands, demands_name)
+
+    add_message('Importing demands: {0}.'.format(demands_name))
+    add_message(demands)
+
+
+    ####################################################################################################################
+    # Core network analysis
+    ####################################################################################################################
+
+    ####################################################################################################################
+    # Graph analysis
+    graph_properties_out = graph_properties(g)
+
+    output_file_graph = os.path.join(path_results, 'graph_properties_{0}.pkl'.format(core_network_name))
+
+    with open(output_file_graph, 'wb') as f_g:
+        pickle.dump(graph_properties_out, f_g)
+
+    ####################################################################################################################
+    # Minimum feasible capacity
+    if capacity_search:
+        capacitated = [('Capacity', build_link_disjoint_cap, None), ('Node_Disjoint', build_node_disjoint_cap, None),
+                       ('SRG_Links', build_link_disjoint_cap_srg_links, srg_links),
+                       ('SRG_Nodes', build_node_disjoint_cap_srg_nodes, srg_nodes)]
+
+        for problem, build, srg_file in capacitated:
+            if not problems[problem]:
+                continue
+
+            extra = ()
+            if srg_file is not None:
+                srg = read_srgs(path_demands, srg_file)
+                if srg is None:
+                    add_message('The {0} problem cannot be solved as there are no SRGs defined for this '
+                                'topology.'.format(problem))
+                    continue
+                extra = (srg,)
+
+            add_message('~~~~ Minimum feasible capacity: {0} ~~~~'.format(problem))
+            key = problem_key('{0}_Capacity_Search'.format(problem), srg_file)
+            solution, status = cached(key)
+            if solution is None:
+                solution = minimum_capacity(build, g, distance_dict, demands, extra, solver=solver,
+                                            capacity_mode=capacity_mode)
+                # The search is exact, if every probe is optimal or proven infeasible
+                statuses = set(probe[1] for probe in solution[1]) - {OPTIMAL, INFEASIBLE, INF_OR_UNBD}
+                store_solution(key, solution, statuses.pop() if statuses else OPTIMAL)
+            capacity, probes = solution
+
+            result_capacity = {'minimum_capacity': capacity, 'probes': probes}
+
+            output_name = 'graph_properties_{0}_{1}_{2}_Capacity_Search'.format(core_network_name, demands_name,
+                                                                                 problem)
+            output_file = os.path.join(path_results, versioned_name(output_name, key) + '.pkl')
+            with open(output_file, 'wb') as f_cs:
+                pickle.dump(result_capacity, f_cs)
+
+        return
+
+    ####################################################################################################################
+    # Optimization
+
+    # Presolved topology and base model shared by the MILP problems, the members of the SRGs are kept for all of them
+    srgs = {'srg_links': read_srgs(path_demands, srg_links) if problems['SRG_Links'] else None,
+            'srg_nodes': read_srgs(path_demands, srg_nodes) if problems['SRG_Nodes'] else None}
+    family = ProblemFamily(g, distance_dict, demands, [srg for srg in srgs.values() if srg is not None])
+
+    # Solves the problem, draws its paths and writes its results, see OPTIMIZED_PROBLEMS
+    def solve_problem(problem, title, optimize_milp, path_pairs_options, srg_keyword, path_name):
+        add_message('~~~~ {0} ~~~~'.format(title))
+
+        srg_file, extra = None, ()
+        if srg_keyword is not None:
+            srg_file = srg_links if srg_keyword == 'srg_links' else srg_nodes
+            srg = srgs[srg_keyword]
+            if srg is None:
+                add_message('The {0} problem cannot be solved as there are no SRGs defined for this '
+                            'topology.'.format(problem))
+                return
+            extra = (srg,)
+
+        engine = None
+        if problem == 'Link_Disjoint':
+            engine = link_disjoint_engine
+        elif path_pairs_options is not None:
+            engine = capacity_engine
+
+        key = problem_key(problem, srg_file, engine)
+        solution, status = cached(key)
+        if solution is None:
+            if engine == 'suurballe':
+                solution = optimize_link_disjoint_suurballe(g, distance_dict, demands)
+            elif engine == 'column_generation':
+                options = dict(path_pairs_options)
+                if srg_keyword is not None:
+                    options[srg_keyword] = extra[0]
+                solution = optimize_path_pairs(g, distance_dict, demands, solver=solver,
+                                               limits=problem_limits(limits, problem), capacity_mode=capacity_mode,
+                                               **options)
+            else:
+                # Only the capacitated problems take the capacity mode
+                options = {} if path_pairs_options is None else {'capacity_mode': capacity_mode}
+                solution = optimize_milp(g, distance_dict, demands, *extra, solver=solver, workers=workers,
+                                         limits=problem_limits(limits, problem), family=family, **options)
+            status = solution.status
+            store_solution(key, tuple(solution), status)
+
+        # Distances and paths of the working and, for the protected problems, the protection paths
+        distances, paths = solution[:len(solution) // 2], solution[len(solution) // 2:]
+        if distances[0] == 0:
+            return
+
+        prefixes = ('Path',) if len(paths) == 1 else ('WorkingPath', 'ProtectionPath')
+        for prefix, path in zip(prefixes, paths):
+            backend.add_paths('{0}_{1}_{2}_{3}'.format(prefix, demands_name, core_network_name, path_name), path)
+
+        result = {'working_paths': paths[0], 'working_distance': distances[0], 'demands': demands}
+        if len(paths) == 2:
+            result['protection_path'] = paths[1]
+            result['protection_distance'] = distances[1]
+        # Node sequences, hop lengths and demands per arc
+        result.update(path_details(distance_dict, *paths))
+        # Solver status, 'feasible' if the solve stopped at its limits
+        result['status'] = status
+
+        for label, path, distance in zip(('Working', 'Protection'), paths, distances):
+            add_message('{0} paths:'.format(label))
+            add_message(path)
+            add_message('{0} path lengths:'.format(label))
+            add_message(distance)
+
+        output_name = 'graph_properties_{0}_{1}_{2}'.format(core_network_name, demands_name,
+                                                            dict(RESULT_FILES)[problem])
+        output_file = os.path.join(path_results, versioned_name(output_name, key) + '.pkl')
+        with open(output_file, 'wb') as f_out:
+            pickle.dump(result, f_out)
+        save_run(problem, key, result, output_file)
+        return
+
+    for problem_row in OPTIMIZED_PROBLEMS:
+        if problems[problem_row[0]]:
+            solve_problem(*problem_row)
+
+    return
+
+
+if __name__ == '__main__':
+    # Batch run without ArcGIS, e.g.,
+    # python core_pipeline.py ../CoreNetworkTopologies/ProblemSetGER nobel_ger demand_ger_small 20 --solver highs
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Core network protection without ArcGIS.')
+    parser.add_argument('path_demands', help='folder with the topology, the demands and the SRGs')
+    parser.add_argument('core_network', help='name of the topology, e.g., nobel_ger')
+    parser.add_argument('demands', help='name of the demands, e.g., demand_ger_small')
+    parser.add_argument('capacity', type=int, help='uniform capacity of the links')
+    parser.add_argument('--results', default='.', help='folder of the .pkl results')
+    parser.add_argument('--problems', nargs='+', choices=PROBLEMS, default=list(PROBLEMS))
+    parser.add_argument('--srg-links', default='srg_links.pkl')
+    parser.add_argument('--srg-nodes', default='srg_nodes.pkl')
+    parser.add_argument('--solver', default='gurobi', choices=('gurobi', 'highs', 'cbc'))
+    parser.add_argument('--link-disjoint-engine', default='ilp', choices=('ilp', 'suurballe'))
+    parser.add_argument('--capacity-engine', default='ilp', choices=('ilp', 'column_generation'))
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--capacity-mode', default='arc', choices=('arc', 'link'),
+                        help='full capacity per direction (arc) or shared by both directions of a link')
+    parser.add_argument('--length-method', default='gis', choices=('gis', 'vincenty', 'karney', 'haversine'),
+                        help='lengths measured by the GIS backend (Vincenty without one) or computed from the nodes')
+    parser.add_argument('--no-cache', action='store_true', help='solve every problem again')
+    parser.add_argument('--no-store', action='store_true', help='write the .pkl files only, not results.sqlite')
+    parser.add_argument('--geojson', help='folder of the GeoJSON map output, no map output without it')
+    args = parser.parse_args()
+
+    if args.geojson:
+        from gis_backends import GeoJsonBackend
+        backend_in = GeoJsonBackend(args.geojson)
+    else:
+        backend_in = GisBackend()
+
+    run_core(dict((problem, problem in args.problems) for problem in PROBLEMS), args.path_demands, args.results,
+             args.core_network, args.demands, args.capacity, args.srg_links, args.srg_nodes, solver=args.solver,
+             link_disjoint_engine=args.link_disjoint_engine, workers=args.workers,
+             capacity_engine=args.capacity_engine, backend=backend_in, length_method=args.length_method,
+             cache=False if args.no_cache else None, store=False if args.no_store else None,
+             capacity_mode=args.capacity_mode)
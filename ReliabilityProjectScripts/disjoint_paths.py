@@ -0,0 +1,240 @@
+# -------------------------------------------------------------
+# Name:             disjoint_paths.py
+# Purpose:          Minimum length pair of link or node disjoint paths with the Suurballe/Bhandari algorithm
+# Created:          12/10/2018
+# Copyright:        (c) Chair of Communication Networks, Department of Electrical and Computer Engineering,
+#                   Technical University of Munich
+# ArcGIS Version:   10.3.1
+# Python Version:   2.7
+# -------------------------------------------------------------
+
+import heapq
+import itertools
+
+
+def dijkstra(adjacency, src):
+    """
+    :param adjacency: dictionary {node: [(neighbour, length)]}, the lengths are not negative
+    :return: dictionaries of the distance from the source and the predecessor of every reached node
+    """
+    distance = {src: 0}
+    predecessor = {src: None}
+    done = set()
+    counter = itertools.count()
+    heap = [(0, next(counter), src)]
+
+    while heap:
+        dist_n, _, n = heapq.heappop(heap)
+        if n in done:
+            continue
+        done.add(n)
+
+        for m, length in adjacency.get(n, ()):
+            dist_m = dist_n + length
+            if m not in distance or dist_m < distance[m]:
+                distance[m] = dist_m
+                predecessor[m] = n
+                heapq.heappush(heap, (dist_m, next(counter), m))
+
+    return distance, predecessor
+
+
+def tree_path(predecessor, dst):
+    """
+    :return: list of the arcs from the root of the shortest path tree to dst
+    """
+    path = []
+    n = dst
+    while predecessor[n] is not None:
+        path.append((predecessor[n], n))
+        n = predecessor[n]
+    path.reverse()
+    return path
+
+
+def order_path(arcs, src):
+    """
+    :param arcs: unordered arcs of a path, e.g., read from the solution of a formulation
+    :return: the arcs of the path in the order from the source, the arcs not reachable from the source (cycles) are
+             left out
+    """
+    successor = dict(arcs)
+    path = []
+    n = src
+    while n in successor:
+        path.append((n, successor[n]))
+        n = successor.pop(n)
+    return path
+
+
+def suurballe(adjacency, src, dst):
+    """
+    Minimum total length pair of arc disjoint paths from src to dst in a directed graph. The first path is the
+    shortest path; the second shortest path is searched in the residual graph, where the arcs of the first path are
+    reversed and all the lengths are reduced by the distances from the source, so that they stay non negative and
+    Dijkstra can be used again. The arcs used by both paths in opposite directions cancel out.
+
+    :param adjacency: dictionary {node: [(neighbour, length)]}, the lengths are not negative
+    :return: two lists of the arcs of the paths or None, if there are no two arc disjoint paths
+    """
+    distance, predecessor = dijkstra(adjacency, src)
+    if dst not in distance:
+        return None
+
+    path1 = tree_path(predecessor, dst)
+    path1_arcs = set(path1)
+
+    # Residual graph with the reduced lengths
+    residual = {}
+    for i in adjacency:
+        if i not in distance:
+            continue
+        for j, length in adjacency[i]:
+            if j in distance and (i, j) not in path1_arcs:
+                residual.setdefault(i, []).append((j, length + distance[i] - distance[j]))
+    for i, j in path1:
+        residual.setdefault(j, []).append((i, 0))
+
+    _, predecessor = dijkstra(residual, src)
+    if dst not in predecessor:
+        return None
+
+    # Cancel the arcs used in both directions
+    arcs = set(path1)
+    for i, j in tree_path(predecessor, dst):
+        if (j, i) in arcs:
+            arcs.remove((j, i))
+        else:
+            arcs.add((i, j))
+
+    # Split the arcs into two paths
+    successors = {}
+    for i, j in arcs:
+        successors.setdefault(i, []).append(j)
+
+    paths = []
+    for _ in range(2):
+        path = []
+        n = src
+        while n != dst:
+            m = successors[n].pop()
+            path.append((n, m))
+            n = m
+        paths.append(path)
+
+    return paths[0], paths[1]
+
+
+def disjoint_path(adjacency, src, dst, working, node_disjoint=False, forbidden_links=(), forbidden_tails=()):
+    """
+    :param working: list of the arcs of the working path
+    :param forbidden_links: links {i, j} (frozensets), which the path must not use in any direction
+    :param forbidden_tails: nodes, which the path must not leave
+    :return: list of the arcs of the shortest path from src to dst, which is link (or node) disjoint to the working
+             path, or None
+    """
+    used_links = set(frozenset(arc) for arc in working) | set(forbidden_links)
+    used_nodes = set(i for i, _ in working) - {src} if node_disjoint else set()
+
+    residual = {}
+    for i in adjacency:
+        if i in used_nodes or i in forbidden_tails:
+            continue
+        residual[i] = [(j, length) for j, length in adjacency[i]
+                       if frozenset((i, j)) not in used_links and j not in used_nodes]
+
+    _, predecessor = dijkstra(residual, src)
+    if dst not in predecessor:
+        return None
+    return tree_path(predecessor, dst)
+
+
+def link_disjoint_pair(adjacency, src, dst):
+    """
+    :return: two lists of the arcs of the link disjoint paths or None
+    """
+    return suurballe(adjacency, src, dst)
+
+
+def split_nodes(adjacency):
+    """
+    Splits every node n in (n, 'in') and (n, 'out') connected by a single arc, so that the arc disjoint paths in the
+    split graph are node disjoint in the original graph.
+
+    :return: adjacency of the split graph
+    """
+    split = {}
+    for i in adjacency:
+        split.setdefault((i, 'in'), []).append(((i, 'out'), 0))
+        for j, length in adjacency[i]:
+            split.setdefault((i, 'out'), []).append(((j, 'in'), length))
+    return split
+
+
+def node_disjoint_pair(split, src, dst):
+    """
+    :param split: adjacency of the split graph, see split_nodes
+    :return: two lists of the arcs of the node disjoint paths or None
+    """
+    pair = suurballe(split, (src, 'out'), (dst, 'in'))
+    if pair is None:
+        return None
+
+    # Map the arcs between the split nodes back to the original arcs
+    return tuple([(i[0], j[0]) for i, j in path if i[1] == 'out'] for path in pair)
+
+
+def arc_adjacency(G, D):
+    """
+    :return: dictionary {node: [(neighbour, length)]} with both directions of every undirected edge
+    """
+    adjacency = dict((n, []) for n in G.nodes())
+    for i, j in G.edges():
+        adjacency[i].append((j, D[i, j]))
+        adjacency[j].append((i, D[j, i]))
+    return adjacency
+
+
+def disjoint_paths(G, D, R, node_disjoint=False):
+    """
+    Solves the uncapacitated link (or node) disjoint problem demand by demand, which gives the same total length as
+    the MILP formulation, as there are no constraints coupling the demands.
+
+    :param G: networkx graph of the topology
+    :param D: python dictionary with the lengths of the arcs, {(i, j): length}
+    :param R: python dictionary with the demands, {(source, destination): volume}
+    :param node_disjoint: if True the paths are node disjoint, otherwise link disjoint
+    :return: distance1, distance2, path1, path2 in the format of optimize_link_disjoint and the list of the demands
+             without two disjoint paths, which are missing in the dictionaries
+    """
+    adjacency = arc_adjacency(G, D)
+    if node_disjoint:
+        adjacency = split_nodes(adjacency)
+        pair_function = node_disjoint_pair
+    else:
+        pair_function = link_disjoint_pair
+
+    distance1, distance2 = {}, {}
+    path1, path2 = {}, {}
+    infeasible = []
+
+    for src, dst in R:
+        pair = pair_function(adjacency, src, dst)
+        if pair is None:
+            infeasible.append((src, dst))
+            continue
+
+        p1, p2 = pair
+        d1 = sum(D[i, j] for i, j in p1)
+        d2 = sum(D[i, j] for i, j in p2)
+
+        # Select the shorter path as working path and longer as backup path
+        if d1 > d2:
+            p1, p2, d1, d2 = p2, p1, d2, d1
+
+        distance1[(src, dst)] = d1
+        distance2[(src, dst)] = d2
+        path1[(src, dst)] = p1
+        path2[(src, dst)] = p2
+
+    return distance1, distance2, path1, path2, infeasible
@@ -0,0 +1,187 @@
+# -------------------------------------------------------------
+# Name:             geodesic.py
+# Purpose:          Lengths of the links from the node coordinates of the GraphML topologies, computed for all the
+#                   links at once and cached per topology
+# Created:          12/10/2018
+# Copyright:        (c) Chair of Communication Networks, Department of Electrical and Computer Engineering,
+#                   Technical University of Munich
+# ArcGIS Version:   10.3.1
+# Python Version:   2.7
+# -------------------------------------------------------------
+
+import os
+import json
+import pickle
+import hashlib
+
+import numpy as np
+import networkx as nx
+
+try:
+    from geographiclib.geodesic import Geodesic
+except ImportError:
+    # Karney's algorithm needs the geographiclib package
+    Geodesic = None
+
+# WGS84 ellipsoid, the datum of the node coordinates (spatial reference 4326)
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+
+# Mean radius of the Earth for the great circle distances
+MEAN_RADIUS = 6371008.8
+
+# 'haversine': great circle on the sphere, 'vincenty': geodesic on the ellipsoid as LENGTH_GEODESIC of ArcGIS,
+# 'karney': geodesic on the ellipsoid with geographiclib
+METHODS = ('haversine', 'vincenty', 'karney')
+
+
+####################################################################################################################
+# Distances between the coordinate arrays
+####################################################################################################################
+def haversine(lon1, lat1, lon2, lat2, radius=MEAN_RADIUS):
+    """
+    :param lon1, lat1, lon2, lat2: numpy arrays of the coordinates of the end points in degrees
+    :return: numpy array of the great circle distances in meters
+    """
+    lat1, lat2 = np.radians(lat1), np.radians(lat2)
+    dlon = np.radians(lon2 - lon1)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * radius * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def vincenty(lon1, lat1, lon2, lat2, a=WGS84_A, f=WGS84_F, tolerance=1e-12, iterations=200):
+    """
+    Vincenty's inverse formula on the ellipsoid, iterated for all the pairs at once until the longitude on the
+    auxiliary sphere converges for every pair. The iteration does not converge for nearly antipodal points.
+
+    :return: numpy array of the geodesic distances in meters and boolean numpy array of the converged pairs
+    """
+    b = (1 - f) * a
+    L = np.radians(lon2 - lon1)
+    U1 = np.arctan((1 - f) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - f) * np.tan(np.radians(lat2)))
+    sin_u1, cos_u1 = np.sin(U1), np.cos(U1)
+    sin_u2, cos_u2 = np.sin(U2), np.cos(U2)
+
+    lam = L
+    converged = np.zeros(np.shape(L), dtype=bool)
+    for _ in range(iterations):
+        sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+        sin_sigma = np.sqrt((cos_u2 * sin_lam) ** 2 + (cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam) ** 2)
+        cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+        sigma = np.arctan2(sin_sigma, cos_sigma)
+
+        # Coincident points (sin_sigma = 0) and equatorial lines (cos2_alpha = 0)
+        sin_alpha = np.where(sin_sigma > 0, cos_u1 * cos_u2 * sin_lam / np.where(sin_sigma > 0, sin_sigma, 1), 0.0)
+        cos2_alpha = 1 - sin_alpha ** 2
+        cos_2sigma_m = np.where(cos2_alpha > 0,
+                                cos_sigma - 2 * sin_u1 * sin_u2 / np.where(cos2_alpha > 0, cos2_alpha, 1), 0.0)
+
+        C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+        previous = lam
+        lam = L + (1 - C) * f * sin_alpha * (sigma + C * sin_sigma *
+                                             (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+        converged = np.abs(lam - previous) <= tolerance
+        if converged.all():
+            break
+
+    u2 = cos2_alpha * (a ** 2 - b ** 2) / b ** 2
+    A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+    B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+    delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (cos_sigma * (-1 + 2 * cos_2sigma_m ** 2) -
+                                                           B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) *
+                                                           (-3 + 4 * cos_2sigma_m ** 2)))
+    return b * A * (sigma - delta_sigma), converged
+
+
+def karney(lon1, lat1, lon2, lat2):
+    """
+    Karney's algorithm of geographiclib, converges for all the pairs, but is evaluated pair by pair.
+
+    :return: numpy array of the geodesic distances in meters on the WGS84 ellipsoid
+    """
+    if Geodesic is None:
+        raise ValueError("Karney's algorithm needs the geographiclib package.")
+    return np.array([Geodesic.WGS84.Inverse(p1, l1, p2, l2, Geodesic.DISTANCE)['s12']
+                     for l1, p1, l2, p2 in zip(lon1, lat1, lon2, lat2)], dtype=float)
+
+
+def distances(lon1, lat1, lon2, lat2, method='vincenty'):
+    """
+    :param method: see METHODS; the pairs, for which Vincenty's formula does not converge, are computed with Karney's
+                   algorithm, or on the sphere without geographiclib
+    :return: numpy array of the distances in meters
+    """
+    lon1, lat1, lon2, lat2 = [np.asarray(x, dtype=float) for x in (lon1, lat1, lon2, lat2)]
+
+    if method == 'haversine':
+        return haversine(lon1, lat1, lon2, lat2)
+    if method == 'karney':
+        return karney(lon1, lat1, lon2, lat2)
+    if method != 'vincenty':
+        raise ValueError('Unknown length method {0}, the options are {1}.'.format(method, ', '.join(METHODS)))
+
+    s, converged = vincenty(lon1, lat1, lon2, lat2)
+    if not converged.all():
+        failed = ~converged
+        fallback = karney if Geodesic is not None else haversine
+        s[failed] = fallback(lon1[failed], lat1[failed], lon2[failed], lat2[failed])
+    return s
+
+
+####################################################################################################################
+# Link lengths of the topology
+####################################################################################################################
+# Lengths computed in this process {digest: {(i, j): length}}
+LENGTHS_CACHE = {}
+
+
+def coordinates_digest(edges, longitude, latitude, method):
+    """
+    :return: hash of the links, their end point coordinates and the method, which identifies the cached lengths
+    """
+    key = [method] + sorted([i, j, longitude[i], latitude[i], longitude[j], latitude[j]] for i, j in edges)
+    return hashlib.sha1(json.dumps(key).encode('utf-8')).hexdigest()
+
+
+def edge_lengths(g, method='vincenty', cache_dir=None, name='topology'):
+    """
+    Computes the lengths of all the links of the topology at once from the Longitude/Latitude attributes of the nodes.
+    The lengths are cached in memory and, with cache_dir, in the file geodesic_lengths_{name}_{method}.pkl, which is
+    used as long as the links and the coordinates of the topology do not change.
+
+    :param g: networkx graph of the topology
+    :param method: see METHODS
+    :param cache_dir: a string with the folder of the cache file, None caches in memory only
+    :param name: string name of the topology
+    :return: python dictionary with the lengths of the arcs in both directions {(i, j): length} in meters, rounded
+             to centimeters as the lengths read from ArcGIS
+    """
+    edges = list(g.edges())
+    longitude, latitude = nx.get_node_attributes(g, 'Longitude'), nx.get_node_attributes(g, 'Latitude')
+    digest = coordinates_digest(edges, longitude, latitude, method)
+
+    cache_file = None
+    if cache_dir is not None:
+        cache_file = os.path.join(cache_dir, 'geodesic_lengths_{0}_{1}.pkl'.format(name, method))
+        if digest not in LENGTHS_CACHE and os.path.isfile(cache_file):
+            with open(cache_file, 'rb') as f_c:
+                cached = pickle.load(f_c)
+            if cached['digest'] == digest:
+                LENGTHS_CACHE[digest] = cached['lengths']
+
+    if digest not in LENGTHS_CACHE:
+        lengths = distances([longitude[i] for i, _ in edges], [latitude[i] for i, _ in edges],
+                            [longitude[j] for _, j in edges], [latitude[j] for _, j in edges], method)
+
+        distance_dict = {}
+        for (i, j), length in zip(edges, np.round(lengths, 2).tolist()):
+            distance_dict[(i, j)] = length
+            distance_dict[(j, i)] = length
+        LENGTHS_CACHE[digest] = distance_dict
+
+        if cache_file is not None:
+            with open(cache_file, 'wb') as f_c:
+                pickle.dump({'digest': digest, 'lengths': distance_dict}, f_c, 2)
+
+    return dict(LENGTHS_CACHE[digest])
@@ -0,0 +1,151 @@
+# -------------------------------------------------------------
+# Name:             gis_backends.py
+# Purpose:          Map output of the core network analysis: no output or GeoJSON files, the ArcGIS backend is in
+#                   CoreNetworkProtection.py
+# Created:          12/10/2018
+# Copyright:        (c) Chair of Communication Networks, Department of Electrical and Computer Engineering,
+#                   Technical University of Munich
+# ArcGIS Version:   10.3.1
+# Python Version:   2.7
+# -------------------------------------------------------------
+
+import os
+import json
+
+import networkx as nx
+
+
+####################################################################################################################
+# No map output
+####################################################################################################################
+class GisBackend(object):
+    """
+    The interface of the map output of core_pipeline.run_core. This backend draws nothing, e.g., for the batch runs
+    without ArcGIS, where only the .pkl results are needed.
+    """
+
+    def add_topology(self, g, name):
+        """
+        Draws the nodes and the links of the topology, called first.
+
+        :param g: networkx graph of the topology, the nodes with the Longitude and Latitude attributes, the links with
+                  the weight attribute, i.e., the length in meters
+        :param name: string name of the topology
+        """
+        return
+
+    def edge_lengths(self, g):
+        """
+        :return: python dictionary with the lengths of the arcs in both directions {(i, j): length} measured by the
+                 GIS when the topology was drawn, None if the backend does not measure them
+        """
+        return None
+
+    def set_capacity(self, capacity):
+        """
+        :param capacity: the uniform capacity of the links
+        """
+        return
+
+    def add_demands(self, demands, demands_name):
+        """
+        :param demands: python dictionary with the demands, {(source, destination): volume}, or an iterable of
+                        ((source, destination), volume)
+        """
+        return
+
+    def add_paths(self, name, paths):
+        """
+        :param name: string name of the output, e.g., WorkingPath_demand_ger_small_nobel_ger_LinkDisjoint
+        :param paths: python dictionary {(source, destination): ordered list of the arcs}
+        """
+        return
+
+
+####################################################################################################################
+# GeoJSON files
+####################################################################################################################
+class GeoJsonBackend(GisBackend):
+    """
+    Writes the topology, the demands and the paths as GeoJSON feature collections into a folder, one file per
+    output, which can be opened in QGIS or ArcGIS Pro without a geodatabase.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: a string with the folder of the .geojson files, created if it does not exist
+        """
+        self.path = path
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        self.name = None
+        self.g = None
+        self.coordinates = {}
+
+    def write(self, name, features):
+        """
+        Writes the feature collection one feature at a time, so that the features are not held in memory together.
+
+        :param features: iterable of the GeoJSON features, see feature
+        """
+        with open(os.path.join(self.path, name + '.geojson'), 'w') as f_out:
+            f_out.write('{"type": "FeatureCollection", "features": [')
+            for n, item in enumerate(features):
+                if n > 0:
+                    f_out.write(', ')
+                f_out.write(json.dumps(item))
+            f_out.write(']}')
+        return
+
+    def add_topology(self, g, name):
+        self.name = name
+        self.g = g
+
+        longitude, latitude = nx.get_node_attributes(g, 'Longitude'), nx.get_node_attributes(g, 'Latitude')
+        self.coordinates = dict((n, [longitude[n], latitude[n]]) for n in g.nodes())
+
+        self.write('nodes_{0}'.format(name), (feature('Point', self.coordinates[n], {'NAME': n}) for n in g.nodes()))
+        self.write_lines()
+        return
+
+    def write_lines(self, capacity=None):
+        self.write('lines_{0}'.format(self.name), self.line_features(capacity))
+        return
+
+    def line_features(self, capacity=None):
+        for i, j in self.g.edges():
+            properties = {'OriginID': i, 'DestinationID': j, 'LENGTH_GEO': self.g[i][j].get('weight')}
+            if capacity is not None:
+                properties['Capacity'] = capacity
+            yield feature('LineString', [self.coordinates[i], self.coordinates[j]], properties)
+
+    def set_capacity(self, capacity):
+        self.write_lines(capacity)
+        return
+
+    def add_demands(self, demands, demands_name):
+        if isinstance(demands, dict):
+            demands = sorted(demands.items())
+
+        features = (feature('MultiPoint', [self.coordinates[src], self.coordinates[dst]],
+                            {'source': src, 'destination': dst, 'volume': volume})
+                    for (src, dst), volume in demands)
+        self.write('{0}_{1}'.format(demands_name, self.name), features)
+        return
+
+    def add_paths(self, name, paths):
+        self.write(name, self.path_features(paths))
+        return
+
+    def path_features(self, paths):
+        for src, dst in sorted(paths):
+            path = paths[src, dst]
+            nodes = [i for i, _ in path] + [path[-1][1]] if path else []
+            yield feature('LineString', [self.coordinates[n] for n in nodes],
+                          {'source': src, 'destination': dst, 'hops': len(path)})
+
+
+def feature(geometry_type, coordinates, properties):
+    return {'type': 'Feature', 'geometry': {'type': geometry_type, 'coordinates': coordinates},
+            'properties': properties}
@@ -0,0 +1,236 @@
+# -------------------------------------------------------------
+# Name:             graph_presolve.py
+# Purpose:          Reduces the topology before the optimization models are built and maps the paths back
+# Created:          12/10/2018
+# Copyright:        (c) Chair of Communication Networks, Department of Electrical and Computer Engineering,
+#                   Technical University of Munich
+# ArcGIS Version:   10.3.1
+# Python Version:   2.7
+# -------------------------------------------------------------
+
+import networkx as nx
+
+
+####################################################################################################################
+# Degree-2 chains
+####################################################################################################################
+def kept_nodes(R, srgs=()):
+    """
+    :param R: python dictionary with the demands, {(source, destination): volume}
+    :param srgs: SRG dictionaries, the values are lists of the links (i, j) or of the nodes
+    :return: set of the nodes, which must not be contracted: the sources, the destinations and the SRG members
+    """
+    keep = set()
+    for src, dst in R:
+        keep.add(src)
+        keep.add(dst)
+    for srg in srgs:
+        for value in srg.values():
+            for member in value:
+                if isinstance(member, tuple):
+                    keep.update(member)
+                else:
+                    keep.add(member)
+    return keep
+
+
+def contract_chains(G, D, keep, R=()):
+    """
+    Replaces every node of degree 2, which is not kept, and its two links by a single link between its neighbours.
+    The length of the new link is the sum of the lengths and the capacity the minimum of the capacities, so that a
+    path on the contracted graph has the same length and load as the expanded path. A node is not contracted, if its
+    neighbours are already linked or if they are the source and the destination of a demand, as the formulations
+    treat the direct link between the source and the destination differently.
+
+    :param G: networkx graph of the topology
+    :param D: python dictionary with the lengths of the arcs, {(i, j): length}
+    :param keep: set of the nodes, which must not be contracted, see kept_nodes
+    :param R: the demands
+    :return: contracted graph, dictionary of its arc lengths and dictionary {arc: [original arcs]} of the contracted
+             arcs
+    """
+    H = G.copy()
+    DH = dict(D)
+    expansion = {}
+    demand_pairs = set(frozenset(dem) for dem in R)
+
+    def original(i, j):
+        return expansion.pop((i, j), [(i, j)])
+
+    for n in list(H.nodes()):
+        if n in keep or H.degree(n) != 2:
+            continue
+        a, b = list(H.neighbors(n))
+        if H.has_edge(a, b) or frozenset((a, b)) in demand_pairs:
+            continue
+
+        capacity = [H[n][m]["capacity"] for m in (a, b) if "capacity" in H[n][m]]
+
+        expansion[a, b] = original(a, n) + original(n, b)
+        expansion[b, a] = original(b, n) + original(n, a)
+        DH[a, b] = DH.pop((a, n)) + DH.pop((n, b))
+        DH[b, a] = DH.pop((b, n)) + DH.pop((n, a))
+
+        H.remove_node(n)
+        H.add_edge(a, b, weight=DH[a, b])
+        if len(capacity) == 2:
+            H[a][b]["capacity"] = min(capacity)
+
+    return H, DH, expansion
+
+
+def expand_path(path, expansion):
+    """
+    :return: the path with the contracted arcs replaced by the original arcs
+    """
+    return [arc for contracted in path for arc in expansion.get(contracted, [contracted])]
+
+
+####################################################################################################################
+# Block-cut tree
+####################################################################################################################
+class BlockCutTree(object):
+    """
+    The biconnected components (blocks) of the topology connected through the cut vertices they share. A simple path
+    between two nodes only uses the links of the blocks on the path between the nodes in the tree.
+    """
+
+    def __init__(self, G):
+        self.blocks = [set(frozenset(edge) for edge in edges) for edges in nx.biconnected_component_edges(G)]
+
+        self.tree = nx.Graph()
+        self.block_of = {}
+        for index, links in enumerate(self.blocks):
+            self.tree.add_node(('block', index))
+            for link in links:
+                for n in link:
+                    self.block_of.setdefault(n, set()).add(index)
+        for n, indices in self.block_of.items():
+            if len(indices) > 1:
+                for index in indices:
+                    self.tree.add_edge(('cut', n), ('block', index))
+
+    def tree_node(self, n):
+        if n not in self.block_of:
+            return None
+        if len(self.block_of[n]) > 1:
+            return 'cut', n
+        return 'block', next(iter(self.block_of[n]))
+
+    def path(self, src, dst):
+        """
+        :return: list of the tree nodes ('block', index) and ('cut', node) between src and dst, None if they are not
+                 connected
+        """
+        start, end = self.tree_node(src), self.tree_node(dst)
+        if start is None or end is None or not nx.has_path(self.tree, start, end):
+            return None
+        return nx.shortest_path(self.tree, start, end)
+
+
+####################################################################################################################
+# Arcs per demand
+####################################################################################################################
+def demand_arcs(G, arcs, RL):
+    """
+    Prunes the arcs, which cannot be on a simple path of the demand, e.g., the dead end branches behind a bridge.
+
+    :param G: networkx graph of the topology
+    :param arcs: list of the directed arcs
+    :param RL: list of the enumerated demands [(r, (source, destination))]
+    :return: dictionary {r: list of the arcs, which can be on a path of the demand}
+    """
+    bct = BlockCutTree(G)
+
+    allowed = {}
+    cache = {}
+    for r, (src, dst) in RL:
+        key = frozenset((src, dst))
+        if key not in cache:
+            links = set()
+            for kind, index in bct.path(src, dst) or ():
+                if kind == 'block':
+                    links |= bct.blocks[index]
+            cache[key] = links
+        allowed[r] = [(i, j) for i, j in arcs if frozenset((i, j)) in cache[key]]
+    return allowed
+
+
+####################################################################################################################
+# Infeasibility pre-check
+####################################################################################################################
+def infeasible_demands(G, R, protection=None, srg_links=None, srg_nodes=None):
+    """
+    Structural check of the demands before the model is built: the source and the destination must be connected,
+    for the link disjoint paths no bridge, for the node disjoint paths no cut vertex may separate them, unless they
+    are linked directly, and no SRG may cut all the paths between them.
+
+    :param G: networkx graph of the topology
+    :param R: python dictionary with the demands, {(source, destination): volume}
+    :param protection: None for the unprotected paths, 'link' or 'node' for the link or node disjoint paths
+    :param srg_links: python dictionary of the link SRGs or None
+    :param srg_nodes: python dictionary of the node SRGs or None
+    :return: list of (demand, reason) of the demands without a feasible pair of paths
+    """
+    bct = BlockCutTree(G)
+
+    infeasible = []
+    cache = {}
+    for src, dst in R:
+        path = bct.path(src, dst)
+        if path is None:
+            infeasible.append(((src, dst), 'no path'))
+            continue
+
+        reason = None
+        if protection == 'link':
+            for kind, index in path:
+                if kind == 'block' and len(bct.blocks[index]) == 1:
+                    reason = 'bridge {0}-{1}'.format(*sorted(next(iter(bct.blocks[index])), key=str))
+                    break
+        elif protection == 'node' and not G.has_edge(src, dst):
+            for kind, n in path:
+                if kind == 'cut' and n != src and n != dst:
+                    reason = 'cut vertex {0}'.format(n)
+                    break
+
+        if reason is None and srg_links is not None:
+            reason = srg_cut(G, src, dst, srg_links, 'links', cache)
+        if reason is None and srg_nodes is not None:
+            reason = srg_cut(G, src, dst, srg_nodes, 'nodes', cache)
+
+        if reason is not None:
+            infeasible.append(((src, dst), reason))
+
+    return infeasible
+
+
+def srg_cut(G, src, dst, srgs, kind, cache):
+    """
+    If all the paths between src and dst use the SRG, the working and the protection path cannot both avoid it.
+
+    :param cache: dictionary of the connected components of the topology without the SRG, shared by the demands
+    :return: the reason, if one of the SRGs cuts src from dst, otherwise None
+    """
+    for key, value in sorted(srgs.items()):
+        if kind == 'links':
+            removed = frozenset(link for link in value if G.has_edge(*link))
+        else:
+            removed = frozenset(n for n in value if n != src and n != dst and n in G)
+
+        if (kind, removed) not in cache:
+            H = G.copy()
+            if kind == 'links':
+                H.remove_edges_from(removed)
+            else:
+                H.remove_nodes_from(removed)
+            component = {}
+            for index, nodes in enumerate(nx.connected_components(H)):
+                for n in nodes:
+                    component[n] = index
+            cache[kind, removed] = component
+
+        component = cache[kind, removed]
+        if component[src] != component[dst]:
+            return 'SRG {0} {1}'.format(key, value)
+    return None
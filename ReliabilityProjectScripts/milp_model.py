@@ -0,0 +1,200 @@
+# -------------------------------------------------------------
+# Name:             milp_model.py
+# Purpose:          Solver independent representation of the optimization problems
+# Created:          12/10/2018
+# Copyright:        (c) Chair of Communication Networks, Department of Electrical and Computer Engineering,
+#                   Technical University of Munich
+# ArcGIS Version:   10.3.1
+# Python Version:   2.7
+# -------------------------------------------------------------
+
+
+class MilpModel(object):
+    """
+    Mixed integer linear program: minimize the sum of obj[k] * x[k] subject to the rows
+    sum(coefficient * x[index]) (<, =, >) rhs and the bounds lb[k] <= x[k] <= ub[k].
+
+    The rows are stored in the compressed sparse row format (row_start, row_index, row_coef), so that they can be
+    passed to any solver without going through the solver specific expression objects. Every variable and every row
+    belongs to a family, e.g., "u" or "Flow conservation u", which is used for the names and the model statistics.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+        # Columns
+        self.obj = []
+        self.lb = []
+        self.ub = []
+        self.vtype = []
+        self.var_family = []
+        self.var_key = []
+
+        # Rows
+        self.row_start = [0]
+        self.row_index = []
+        self.row_coef = []
+        self.sense = []
+        self.rhs = []
+        self.row_family = []
+
+        # MIP start {index of the variable: value}, the variables without a value are left to the solver
+        self.start = {}
+
+    @property
+    def num_vars(self):
+        return len(self.obj)
+
+    @property
+    def num_constrs(self):
+        return len(self.rhs)
+
+    @property
+    def num_nonzeros(self):
+        return len(self.row_index)
+
+    def add_var(self, obj=0.0, lb=0.0, ub=1.0, vtype='B', family='x', key=()):
+        """
+        :param vtype: 'B' binary, 'I' integer or 'C' continuous
+        :param family: name of the variable family
+        :param key: index of the variable within the family, used for the name
+        :return: index of the variable
+        """
+        self.obj.append(obj)
+        self.lb.append(lb)
+        self.ub.append(ub)
+        self.vtype.append(vtype)
+        self.var_family.append(family)
+        self.var_key.append(key)
+        return len(self.obj) - 1
+
+    def add_vars(self, keys, family, obj=0.0, lb=0.0, ub=1.0, vtype='B'):
+        """
+        Adds the variables of the same bounds and type as one block of consecutive indices.
+
+        :return: dictionary {key: index of the variable}
+        """
+        keys = list(keys)
+        start = self.num_vars
+        n = len(keys)
+        self.obj.extend([obj] * n)
+        self.lb.extend([lb] * n)
+        self.ub.extend([ub] * n)
+        self.vtype.extend([vtype] * n)
+        self.var_family.extend([family] * n)
+        self.var_key.extend(keys)
+        return dict(zip(keys, range(start, start + n)))
+
+    def add_constr(self, terms, sense, rhs, family=''):
+        """
+        :param terms: iterable of (index of the variable, coefficient)
+        :param sense: '<', '=' or '>'
+        :return: index of the row
+        """
+        for index, coef in terms:
+            self.row_index.append(index)
+            self.row_coef.append(coef)
+        self.row_start.append(len(self.row_index))
+        self.sense.append(sense)
+        self.rhs.append(rhs)
+        self.row_family.append(family)
+        return len(self.rhs) - 1
+
+    def add_constr_matrix(self, A, sense, rhs, family, columns):
+        """
+        Adds the rows of a sparse matrix at once.
+
+        :param A: scipy.sparse matrix, its column n is the variable columns[n]
+        :param sense: '<', '=' or '>' for all the rows
+        :param rhs: list of the right-hand sides of the rows
+        :param columns: numpy array of the indices of the variables
+        :return: list of the indices of the rows
+        """
+        A = A.tocsr()
+        first = self.num_constrs
+        offset = self.num_nonzeros
+        self.row_index.extend(columns[A.indices].tolist())
+        self.row_coef.extend(A.data.tolist())
+        self.row_start.extend((A.indptr[1:] + offset).tolist())
+        self.sense.extend([sense] * A.shape[0])
+        self.rhs.extend(rhs)
+        self.row_family.extend([family] * A.shape[0])
+        return list(range(first, self.num_constrs))
+
+    def copy(self, name=None, num_vars=None, num_constrs=None):
+        """
+        Copies the columns and the rows, the MIP start is not copied. With num_vars and num_constrs only the first
+        variables and rows are kept, the kept rows must not use the dropped variables.
+
+        :return: MilpModel
+        """
+        n = self.num_vars if num_vars is None else num_vars
+        m = self.num_constrs if num_constrs is None else num_constrs
+        nonzeros = self.row_start[m]
+
+        model = MilpModel(self.name if name is None else name)
+        model.obj = self.obj[:n]
+        model.lb = self.lb[:n]
+        model.ub = self.ub[:n]
+        model.vtype = self.vtype[:n]
+        model.var_family = self.var_family[:n]
+        model.var_key = self.var_key[:n]
+
+        model.row_start = self.row_start[:m + 1]
+        model.row_index = self.row_index[:nonzeros]
+        model.row_coef = self.row_coef[:nonzeros]
+        model.sense = self.sense[:m]
+        model.rhs = self.rhs[:m]
+        model.row_family = self.row_family[:m]
+        return model
+
+    def set_objective(self, terms):
+        """
+        Replaces the objective with the sum of the terms (index of the variable, coefficient) to be minimized.
+        """
+        self.obj = [0.0] * self.num_vars
+        for index, coef in terms:
+            self.obj[index] += coef
+        return
+
+    def row(self, k):
+        """
+        :return: list of the (index of the variable, coefficient) of row k
+        """
+        start, end = self.row_start[k], self.row_start[k + 1]
+        return list(zip(self.row_index[start:end], self.row_coef[start:end]))
+
+    def var_name(self, k):
+        key = self.var_key[k]
+        if not isinstance(key, tuple):
+            key = (key,)
+        return '{0}[{1}]'.format(self.var_family[k], ','.join(str(i) for i in key))
+
+    def statistics(self):
+        """
+        Counts the rows, columns and nonzeros of the model per family. Rows, which are exact copies of another row of
+        the same family, are counted as duplicates.
+
+        :return: two dictionaries {family: {'rows': .., 'nonzeros': .., 'duplicates': ..}} and {family: columns}
+        """
+        rows = {}
+        seen = set()
+        for k in range(self.num_constrs):
+            family = self.row_family[k]
+            terms = tuple(sorted(self.row(k)))
+
+            stats = rows.setdefault(family, {'rows': 0, 'nonzeros': 0, 'duplicates': 0})
+            stats['rows'] += 1
+            stats['nonzeros'] += len(terms)
+
+            key = (family, terms, self.sense[k], self.rhs[k])
+            if key in seen:
+                stats['duplicates'] += 1
+            else:
+                seen.add(key)
+
+        columns = {}
+        for family in self.var_family:
+            columns[family] = columns.get(family, 0) + 1
+
+        return rows, columns
@@ -0,0 +1,421 @@
+# -------------------------------------------------------------
+# Name:             milp_solvers.py
+# Purpose:          Solves the MilpModel with Gurobi, HiGHS (scipy.optimize.milp) or CBC (PuLP)
+# Created:          12/10/2018
+# Copyright:        (c) Chair of Communication Networks, Department of Electrical and Computer Engineering,
+#                   Technical University of Munich
+# ArcGIS Version:   10.3.1
+# Python Version:   2.7
+# -------------------------------------------------------------
+
+import time
+
+# Solver independent status of the solution
+OPTIMAL = 'optimal'
+INFEASIBLE = 'infeasible'
+UNBOUNDED = 'unbounded'
+INF_OR_UNBD = 'infeasible_or_unbounded'
+NOT_SOLVED = 'not_solved'
+# A limit of SolveLimits is reached, the solution is feasible, but not proven optimal
+FEASIBLE = 'feasible'
+
+# Pass the variable names to the solver, e.g., to write the model to a file. The names cost time and memory on the
+# large models, without them Gurobi gets the model through its matrix API.
+NAMES = False
+
+
+class SolveLimits(object):
+    """
+    Budget of a MIP solve, None leaves the setting to the solver. If the time or the node limit is reached, the best
+    solution found so far is returned with the status FEASIBLE.
+
+    :param time_limit: seconds
+    :param mip_gap: relative gap between the objective and the bound, at which the solution is accepted as optimal
+    :param node_limit: number of the branch-and-bound nodes
+    """
+
+    def __init__(self, time_limit=None, mip_gap=None, node_limit=None):
+        self.time_limit = time_limit
+        self.mip_gap = mip_gap
+        self.node_limit = node_limit
+
+
+class MilpSolution(object):
+    """
+    Status, objective value and the variable values x (indexed as the variables of the MilpModel) of a solve. For the
+    models with only continuous variables the duals of the rows are given as well, dual[k] is the change of the
+    objective per unit increase of rhs[k]. The time to the first incumbent, the number of the branch-and-bound nodes
+    and the best bound are given by the solvers, which report them.
+    """
+
+    def __init__(self, status, objective=None, x=None, runtime=0.0, solver='', duals=None, first_incumbent=None,
+                 nodes=None, bound=None):
+        self.status = status
+        self.objective = objective
+        self.x = x
+        self.runtime = runtime
+        self.solver = solver
+        self.duals = duals
+        self.first_incumbent = first_incumbent
+        self.nodes = nodes
+        self.bound = bound
+
+    @property
+    def gap(self):
+        return relative_gap(self.objective, self.bound)
+
+    def values(self, variables):
+        """
+        :param variables: dictionary {key: index of the variable}
+        :return: dictionary {key: value of the variable}
+        """
+        return dict((key, self.x[index]) for key, index in variables.items())
+
+
+def is_lp(model):
+    return all(vtype == 'C' for vtype in model.vtype)
+
+
+def relative_gap(objective, bound):
+    """
+    :return: |objective - bound| / |objective|, None if one of them is not known
+    """
+    if objective is None or bound is None:
+        return None
+    if objective == bound:
+        return 0.0
+    return abs(objective - bound) / max(abs(objective), 1e-10)
+
+
+####################################################################################################################
+# Gurobi
+####################################################################################################################
+def solve_gurobi(model, separate=None, limits=None, on_incumbent=None):
+    """
+    :param separate: function of the lazy constraints, see solve; the violated rows are added in the callback on
+                     every new integer solution
+    :param on_incumbent: called in the callback on every new incumbent, see solve
+    """
+    import gurobipy as grb
+
+    start = time.time()
+
+    m = grb.Model(model.name)
+    m.params.outputflag = 0
+
+    if NAMES or not hasattr(m, 'addMConstr'):
+        x = [m.addVar(lb=model.lb[k], ub=model.ub[k], obj=model.obj[k], vtype=model.vtype[k],
+                      name=model.var_name(k)) for k in range(model.num_vars)]
+        m.update()
+
+        constrs = []
+        for k in range(model.num_constrs):
+            start_k, end_k = model.row_start[k], model.row_start[k + 1]
+            expr = grb.LinExpr(model.row_coef[start_k:end_k], [x[i] for i in model.row_index[start_k:end_k]])
+            constrs.append(m.addLConstr(expr, model.sense[k], model.rhs[k], name=model.row_family[k]))
+    else:
+        x, constrs = add_gurobi_matrix(m, model)
+
+    # MIP start
+    for k, value in model.start.items():
+        x[k].Start = value
+
+    m.ModelSense = grb.GRB.MINIMIZE
+    if separate is not None:
+        m.params.LazyConstraints = 1
+    if limits is not None:
+        if limits.time_limit is not None:
+            m.params.TimeLimit = limits.time_limit
+        if limits.mip_gap is not None:
+            m.params.MIPGap = limits.mip_gap
+        if limits.node_limit is not None:
+            m.params.NodeLimit = limits.node_limit
+
+    # Time to the first incumbent, the accepted MIP start counts as well
+    first_incumbent = []
+
+    def incumbent_callback(cb_model, where):
+        if not first_incumbent and (where == grb.GRB.Callback.MIPSOL or
+                                    (where == grb.GRB.Callback.MIP and
+                                     cb_model.cbGet(grb.GRB.Callback.MIP_SOLCNT) > 0)):
+            first_incumbent.append(cb_model.cbGet(grb.GRB.Callback.RUNTIME))
+
+        if where != grb.GRB.Callback.MIPSOL:
+            return
+
+        rows = separate(cb_model.cbGetSolution(x)) if separate is not None else []
+        for terms, sense, rhs, family in rows:
+            cb_model.cbLazy(grb.LinExpr([coef for _, coef in terms], [x[index] for index, _ in terms]), sense, rhs)
+            # The rows stay in the MilpModel for the next solve
+            model.add_constr(terms, sense, rhs, family)
+
+        # The solutions cut off by the lazy constraints are not incumbents
+        if on_incumbent is not None and not rows:
+            on_incumbent(cb_model.cbGet(grb.GRB.Callback.MIPSOL_OBJ), cb_model.cbGet(grb.GRB.Callback.MIPSOL_OBJBND),
+                         cb_model.cbGet(grb.GRB.Callback.RUNTIME))
+
+    m.optimize(incumbent_callback)
+
+    status = {grb.GRB.Status.OPTIMAL: OPTIMAL, grb.GRB.Status.INFEASIBLE: INFEASIBLE,
+              grb.GRB.Status.INF_OR_UNBD: INF_OR_UNBD, grb.GRB.Status.UNBOUNDED: UNBOUNDED}.get(m.status, NOT_SOLVED)
+
+    nodes = m.NodeCount if m.IsMIP else None
+    if m.SolCount > 0:
+        if status == NOT_SOLVED and m.status in (grb.GRB.Status.TIME_LIMIT, grb.GRB.Status.NODE_LIMIT):
+            status = FEASIBLE
+        duals = m.getAttr('Pi', constrs) if status == OPTIMAL and is_lp(model) else None
+        return MilpSolution(status, m.ObjVal, m.getAttr('X', x), time.time() - start, 'gurobi', duals,
+                            first_incumbent[0] if first_incumbent else None, nodes, m.ObjBound if m.IsMIP else None)
+    return MilpSolution(status, runtime=time.time() - start, solver='gurobi', nodes=nodes)
+
+
+def add_gurobi_matrix(m, model):
+    """
+    Passes the columns and the rows in bulk through the matrix API of Gurobi (gurobipy 9 and newer).
+
+    :return: lists of the Gurobi variables and constraints
+    """
+    import numpy as np
+    from scipy.sparse import csr_matrix
+
+    A = csr_matrix((model.row_coef, model.row_index, model.row_start), shape=(model.num_constrs, model.num_vars))
+
+    x = m.addMVar(model.num_vars, lb=np.array(model.lb, dtype=float), ub=np.array(model.ub, dtype=float),
+                  obj=np.array(model.obj, dtype=float), vtype=np.array(model.vtype))
+    if model.num_constrs > 0:
+        m.addMConstr(A, x, np.array(model.sense), np.array(model.rhs, dtype=float))
+    m.update()
+    return m.getVars(), m.getConstrs()
+
+
+####################################################################################################################
+# HiGHS through scipy.optimize.milp
+####################################################################################################################
+def solve_highs(model, limits=None, on_incumbent=None):
+    """
+    scipy.optimize.milp does not take a MIP start and has no callback, on_incumbent is called once with the final
+    solution. If the solve stops at a limit, the MIP start is returned instead of a worse or missing incumbent.
+    """
+    import numpy as np
+    from scipy.optimize import milp, LinearConstraint, Bounds
+    from scipy.sparse import csr_matrix
+
+    start = time.time()
+
+    sense = np.array(model.sense)
+    rhs = np.array(model.rhs, dtype=float)
+    row_lb = np.where(sense == '<', -np.inf, rhs)
+    row_ub = np.where(sense == '>', np.inf, rhs)
+
+    A = csr_matrix((model.row_coef, model.row_index, model.row_start), shape=(model.num_constrs, model.num_vars))
+
+    options = {'disp': False}
+    if limits is not None:
+        if limits.time_limit is not None:
+            options['time_limit'] = limits.time_limit
+        if limits.mip_gap is not None:
+            options['mip_rel_gap'] = limits.mip_gap
+        if limits.node_limit is not None:
+            options['node_limit'] = limits.node_limit
+
+    if is_lp(model):
+        return solve_highs_lp(model, A, sense, rhs, start, options.get('time_limit'))
+
+    constraints = None
+    if model.num_constrs > 0:
+        constraints = LinearConstraint(A, row_lb, row_ub)
+
+    integrality = np.array([0 if vtype == 'C' else 1 for vtype in model.vtype])
+
+    res = milp(np.array(model.obj, dtype=float), constraints=constraints, integrality=integrality,
+               bounds=Bounds(np.array(model.lb, dtype=float), np.array(model.ub, dtype=float)),
+               options=options)
+
+    # 0 optimal, 1 iteration, time or node limit, 2 infeasible, 3 unbounded, 4 other
+    status = {0: OPTIMAL, 1: FEASIBLE, 2: INFEASIBLE, 3: UNBOUNDED}.get(res.status, NOT_SOLVED)
+
+    nodes = getattr(res, 'mip_node_count', None)
+    bound = getattr(res, 'mip_dual_bound', None)
+    x, objective = res.x, res.fun
+
+    # The MIP start as the incumbent, if it covers all the variables and the solver stopped at a limit without a
+    # better solution
+    if res.status == 1 and len(model.start) == model.num_vars:
+        start_x = [model.start[k] for k in range(model.num_vars)]
+        start_objective = sum(c * value for c, value in zip(model.obj, start_x))
+        if x is None or start_objective < objective:
+            status, x, objective = FEASIBLE, start_x, start_objective
+
+    if x is not None:
+        solution = MilpSolution(status, objective, list(x), time.time() - start, 'highs', nodes=nodes, bound=bound)
+        if on_incumbent is not None:
+            on_incumbent(solution.objective, solution.bound, solution.runtime)
+        return solution
+    return MilpSolution(NOT_SOLVED if status == FEASIBLE else status, runtime=time.time() - start, solver='highs',
+                        nodes=nodes)
+
+
+def solve_highs_lp(model, A, sense, rhs, start, time_limit=None):
+    """
+    scipy.optimize.milp does not return the duals, so the LPs are solved with scipy.optimize.linprog.
+    """
+    import numpy as np
+    from scipy.optimize import linprog
+
+    # The rows '>' are passed as '<' with the opposite sign
+    upper = np.flatnonzero(sense != '=')
+    equal = np.flatnonzero(sense == '=')
+    sign = np.where(sense[upper] == '>', -1.0, 1.0)
+
+    A_ub, b_ub, A_eq, b_eq = None, None, None, None
+    if len(upper) > 0:
+        A_ub = A[upper].multiply(sign[:, None]).tocsr()
+        b_ub = rhs[upper] * sign
+    if len(equal) > 0:
+        A_eq = A[equal]
+        b_eq = rhs[equal]
+
+    bounds = [(model.lb[k], None if model.ub[k] == float('inf') else model.ub[k]) for k in range(model.num_vars)]
+    options = {} if time_limit is None else {'time_limit': time_limit}
+    res = linprog(np.array(model.obj, dtype=float), A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=b_eq, bounds=bounds,
+                  method='highs', options=options)
+
+    # 0 optimal, 1 iteration limit, 2 infeasible, 3 unbounded, 4 numerical difficulties
+    status = {0: OPTIMAL, 2: INFEASIBLE, 3: UNBOUNDED}.get(res.status, NOT_SOLVED)
+
+    if status != OPTIMAL:
+        return MilpSolution(status, runtime=time.time() - start, solver='highs')
+
+    duals = np.zeros(model.num_constrs)
+    if len(upper) > 0:
+        duals[upper] = res.ineqlin.marginals * sign
+    if len(equal) > 0:
+        duals[equal] = res.eqlin.marginals
+    return MilpSolution(status, res.fun, list(res.x), time.time() - start, 'highs', list(duals))
+
+
+####################################################################################################################
+# CBC through PuLP
+####################################################################################################################
+def solve_cbc(model, limits=None, on_incumbent=None):
+    """
+    PuLP has no callback and does not report the bound, on_incumbent is called once with the final solution.
+    """
+    import pulp
+
+    start = time.time()
+
+    category = {'B': pulp.LpBinary, 'I': pulp.LpInteger, 'C': pulp.LpContinuous}
+    pulp_sense = {'<': pulp.LpConstraintLE, '=': pulp.LpConstraintEQ, '>': pulp.LpConstraintGE}
+
+    prob = pulp.LpProblem('model', pulp.LpMinimize)
+
+    x = [pulp.LpVariable('x{0}'.format(k), lowBound=model.lb[k],
+                         upBound=None if model.ub[k] == float('inf') else model.ub[k], cat=category[model.vtype[k]])
+         for k in range(model.num_vars)]
+    prob += pulp.LpAffineExpression([(x[k], model.obj[k]) for k in range(model.num_vars) if model.obj[k] != 0])
+
+    for k in range(model.num_constrs):
+        start_k, end_k = model.row_start[k], model.row_start[k + 1]
+        expr = pulp.LpAffineExpression([(x[model.row_index[n]], model.row_coef[n]) for n in range(start_k, end_k)])
+        prob += pulp.LpConstraint(expr, sense=pulp_sense[model.sense[k]], rhs=model.rhs[k],
+                                  name='c{0}'.format(k))
+
+    # MIP start
+    for k, value in model.start.items():
+        x[k].setInitialValue(value)
+
+    settings = {}
+    if limits is not None:
+        if limits.time_limit is not None:
+            settings['timeLimit'] = limits.time_limit
+        if limits.mip_gap is not None:
+            settings['gapRel'] = limits.mip_gap
+        if limits.node_limit is not None:
+            settings['options'] = ['maxNodes {0}'.format(limits.node_limit)]
+
+    prob.solve(pulp.PULP_CBC_CMD(msg=0, warmStart=len(model.start) > 0, **settings))
+
+    status = {pulp.LpStatusOptimal: OPTIMAL, pulp.LpStatusInfeasible: INFEASIBLE,
+              pulp.LpStatusUnbounded: UNBOUNDED}.get(prob.status, NOT_SOLVED)
+
+    # A solution found before the limit is reported with the status optimal and the solution status integer feasible
+    if status == OPTIMAL and getattr(prob, 'sol_status', None) == pulp.LpSolutionIntegerFeasible:
+        status = FEASIBLE
+
+    if status in (OPTIMAL, FEASIBLE):
+        values = [var.varValue if var.varValue is not None else 0.0 for var in x]
+        duals = None
+        if status == OPTIMAL and is_lp(model):
+            duals = [prob.constraints['c{0}'.format(k)].pi for k in range(model.num_constrs)]
+        solution = MilpSolution(status, pulp.value(prob.objective) or 0.0, values, time.time() - start, 'cbc',
+                                duals)
+        if on_incumbent is not None and not is_lp(model):
+            on_incumbent(solution.objective, None, solution.runtime)
+        return solution
+    return MilpSolution(status, runtime=time.time() - start, solver='cbc')
+
+
+SOLVERS = {'gurobi': solve_gurobi, 'highs': solve_highs, 'cbc': solve_cbc}
+
+
+def available_solvers():
+    """
+    :return: list of the solvers, which python packages can be imported
+    """
+    packages = {'gurobi': 'gurobipy', 'highs': 'scipy.optimize', 'cbc': 'pulp'}
+    available = []
+    for solver in sorted(SOLVERS):
+        try:
+            module = __import__(packages[solver], fromlist=['*'])
+        except ImportError:
+            continue
+        if solver == 'highs' and not hasattr(module, 'milp'):
+            # scipy.optimize.milp is available since scipy 1.9
+            continue
+        available.append(solver)
+    return available
+
+
+def solve(model, solver='gurobi', separate=None, limits=None, on_incumbent=None):
+    """
+    :param model: MilpModel
+    :param solver: 'gurobi', 'highs' or 'cbc'
+    :param separate: None or the function of the lazy constraints, separate(x) returns the list of the rows
+                     (terms, sense, rhs, family) violated by the integer solution x. Gurobi separates them in a
+                     callback, the other solvers are called again with the violated rows added to the model, until
+                     the optimal solution violates no row.
+    :param limits: SolveLimits or None
+    :param on_incumbent: None or the function on_incumbent(objective, bound, elapsed time) called on every new
+                         incumbent by Gurobi, once with the final solution by HiGHS and CBC. The bound is None, if
+                         the solver does not report it.
+    :return: MilpSolution
+    """
+    if solver not in SOLVERS:
+        raise ValueError('Unknown solver {0}, the options are {1}.'.format(solver, ', '.join(sorted(SOLVERS))))
+    if solver == 'gurobi':
+        return solve_gurobi(model, separate, limits, on_incumbent)
+    if separate is None:
+        return SOLVERS[solver](model, limits, on_incumbent)
+
+    runtime = 0.0
+    round_limits = limits
+    while True:
+        solution = SOLVERS[solver](model, round_limits)
+        runtime += solution.runtime
+        solution.runtime = runtime
+
+        # Only a solution violating no lazy row is an incumbent of the full model
+        rows = separate(solution.x) if solution.status in (OPTIMAL, FEASIBLE) else []
+        if not rows:
+            if on_incumbent is not None and solution.x is not None:
+                on_incumbent(solution.objective, solution.bound, solution.runtime)
+            return solution
+        for terms, sense, rhs, family in rows:
+            model.add_constr(terms, sense, rhs, family)
+
+        # The time limit holds for all the rounds together
+        if limits is not None and limits.time_limit is not None:
+            if runtime >= limits.time_limit:
+                return MilpSolution(NOT_SOLVED, runtime=runtime, solver=solver)
+            round_limits = SolveLimits(limits.time_limit - runtime, limits.mip_gap, limits.node_limit)
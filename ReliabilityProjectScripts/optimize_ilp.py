@@ -1,6 +1,6 @@
 # -------------------------------------------------------------
 # Name:             optimize_ilp.py
-# Purpose:          Optimization formulations for Gurobi
+# Purpose:          Optimization formulations for Gurobi, HiGHS and CBC
 # Author:           Petra Stojsavljevic
 # Created:          12/10/2018
 # Copyright:        (c) Chair of Communication Networks, Department of Electrical and Computer Engineering,
@@ -10,745 +10,1641 @@
 # -------------------------------------------------------------
 
 
-from gurobipy import *
+import multiprocessing
 import networkx as nx
-import arcpy
-
+from contextlib import closing
+
+from milp_model import MilpModel
+from milp_solvers import solve, relative_gap, OPTIMAL, FEASIBLE, INFEASIBLE, UNBOUNDED, INF_OR_UNBD
+from graph_presolve import kept_nodes, contract_chains, expand_path, demand_arcs, infeasible_demands
+from disjoint_paths import disjoint_paths, disjoint_path, dijkstra, tree_path, order_path, link_disjoint_pair, \
+    split_nodes, node_disjoint_pair
+
+try:
+    import arcpy
+except ImportError:
+    # Batch runs without ArcGIS, e.g., on the Linux workers
+    arcpy = None
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    # Python 2.7 without the futures package, e.g., ArcGIS Python, the chunks are solved in a multiprocessing pool
+    ProcessPoolExecutor = None
+
+try:
+    import numpy as np
+    import scipy.sparse as sp
+except ImportError:
+    # ArcGIS Python without scipy, the constraints are added row by row
+    np, sp = None, None
+
+
+def add_message(message):
+    if arcpy is not None:
+        arcpy.AddMessage(message)
+    else:
+        print(message)
+    return
 
-# Optimize resilience
-def optimize_unprotected_path(G, D, R):
-    model = Model("Unprotected paths")
 
-    # Identify the source and the destination of the demand
-    t = {}
+def add_warning(message):
+    if arcpy is not None:
+        arcpy.AddWarning(message)
+    else:
+        print('WARNING: {0}'.format(message))
+    return
+
+
+####################################################################################################################
+# Shared model construction
+####################################################################################################################
+def demand_table(G, R):
+    """
+    Enumerates the demands and builds the source/sink table of the flow conservation constraints.
+
+    :param G: networkx graph of the topology
+    :param R: python dictionary with the demands, {(source, destination): volume}
+    :return: list of the enumerated demands [(r, (source, destination))] and the dictionary t[r, n], which is -1 for
+             the source, 1 for the destination and 0 for all the other nodes
+    """
     RL = list(enumerate(R))
 
+    t = {}
     for r, (src, dst) in RL:
         for n in G.nodes():
-            if n == src:
-                t[r, n] = -1
-            elif n == dst:
-                t[r, n] = 1
-            else:
-                t[r, n] = 0
+            t[r, n] = 0
+        t[r, src] = -1
+        t[r, dst] = 1
+
+    return RL, t
+
 
+def directed_arcs(G, D):
+    """
+    Transforms the undirected edges to the directed arcs.
 
-    # Transform undirected edges to directed arcs
+    :param G: networkx graph of the topology, the capacity is read from the edge attribute "capacity" if it is set
+    :param D: python dictionary with the lengths of the arcs, {(i, j): length}
+    :return: list of the arcs, dictionary of the arc lengths and dictionary of the arc capacities
+    """
     d = {}
+    c = {}
     arcs = []
+    C = nx.get_edge_attributes(G, "capacity")
 
     for i, j in G.edges():
-        d[i,j] = D[i,j]
-        d[j,i] = D[j,i]
-        arcs.append((i,j))
-        arcs.append((j,i))
-
-    # Binary variables indicate if arc (i,j) belongs to the path of demand r
-    u= {}
-    for r in RL:
-        for i,j in arcs:
-            u[r[0],i,j] = model.addVar(obj=0, vtype="B", name="u[%s,%s,%s]" %(r,i,j))
-    model.update()
-
-    # Optimization goal is to minimize the length of the paths
-    model.setObjective(quicksum(u[r[0],i,j] * d[i,j] for r in RL for i,j in arcs), GRB.MINIMIZE)
-
-    # Flow conservation constraint
-    for r in RL:
-        for m in G.nodes():
-            model.addConstr(quicksum(u[r[0],i,j] for i,j in arcs if j==m) - quicksum(u[r[0],i,j] for i,j in arcs if i==m), "=", t[r[0],m])
+        d[i, j] = D[i, j]
+        d[j, i] = D[j, i]
+        if (i, j) in C:
+            c[i, j] = C[i, j]
+            c[j, i] = C[i, j]
+        arcs.append((i, j))
+        arcs.append((j, i))
 
-    # Start optimization
-    model.params.outputflag = 0
-    model.optimize()
-
-    # If optimal solution is found get the results
-    if model.status != GRB.Status.OPTIMAL:
-        arcpy.AddMessage('The model cannot be solved.')
-        distance = 0
-        path = 0
-    else:
-        su = model.getAttr('x', u)
-
-        # The result is given as set of paths for every demand
-        distance = {}
-        path = {}
-        for r in RL:
-            p = []
-            dp = 0
-            for i,j in arcs:
-                if su[r[0],i,j]>0:
-                    p.append((i,j))
-                    dp += d[i,j]
-
-            distance[r[1]] = dp
-            path[r[1]] = p
-    return distance, path
+    return arcs, d, c
 
 
-# MILP formulation for link disjoint paths
-def optimize_link_disjoint(G, D, R):
-    model = Model("Link disjoint paths")
+def arc_index(G, arcs):
+    """
+    Indexes the incoming and the outgoing arcs of every node, so that the flow conservation constraint of a node does
+    not have to scan the whole arc list.
 
-    # Identify the source and the destination of the demand
-    t = {}
-    RL = list(enumerate(R))
+    :param G: networkx graph of the topology
+    :param arcs: list of the directed arcs
+    :return: two dictionaries {node: [arcs entering the node]} and {node: [arcs leaving the node]}
+    """
+    in_arcs = dict((n, []) for n in G.nodes())
+    out_arcs = dict((n, []) for n in G.nodes())
 
+    for i, j in arcs:
+        out_arcs[i].append((i, j))
+        in_arcs[j].append((i, j))
+
+    return in_arcs, out_arcs
+
+
+# Contract the degree-2 chains of the topology and prune the arcs, which cannot be on a path of the demand
+PRESOLVE = True
+
+
+class ModelBase(object):
+    """
+    The index sets of one topology and demand set and the base model shared by its problems: the arc variables of the
+    working (u) and the protection (v) paths with their flow conservation and the node variables (h, k) with the node
+    indication. Each level of the base model is a prefix of the columns and the rows of the next one, so that every
+    problem starts from a copy of the level it needs and only adds its constraint families, see Formulation.
+    """
+
+    # Levels of the base model, each one adds its variables and rows to the previous one
+    LEVELS = ('u', 'uv', 'uvhk')
+
+    def __init__(self, G, D, R):
+        self.G = G
+        self.R = R
+        self.model = MilpModel("Base model")
+
+        # Identify the source and the destination of the demand
+        self.RL, self.t = demand_table(G, R)
+
+        # Transform undirected edges to directed arcs
+        self.arcs, self.d, self.c = directed_arcs(G, D)
+        self.in_arcs, self.out_arcs = arc_index(G, self.arcs)
+
+        # Arcs, which can be on a path of the demand {r: arcs}, None if all the arcs are used
+        self.demand_arcs = demand_arcs(G, self.arcs, self.RL) if PRESOLVE else None
+
+        # Arc variables of the working (u) and protection (v) paths, node variables of the working (h) and
+        # protection (k) paths
+        self.u, self.v, self.h, self.k = None, None, None, None
+
+        # Positions of the arc variables and the incidence matrices, see arc_columns and incidence_matrices
+        self.arc_positions = None
+        self.incidence = None
+
+        # Number of the columns and the rows of the built levels {level: (columns, rows)}
+        self.size = {}
+
+    def build(self, level):
+        """
+        Extends the base model up to the level, the levels already built are kept.
+        """
+        if level in self.size:
+            return
+        index = self.LEVELS.index(level)
+        if index > 0:
+            self.build(self.LEVELS[index - 1])
+
+        if level == 'u':
+            # Binary variables indicate if arc (i,j) belongs to the working path of demand r
+            self.u = add_arc_variables(self.model, self.RL, self.arcs, "u", self.demand_arcs)
+            set_length_objective(self)
+            self.add_flow_conservation(self.u, "Flow conservation u")
+        elif level == 'uv':
+            # Binary variables indicate if arc (i,j) belongs to the backup path of demand r
+            self.v = add_arc_variables(self.model, self.RL, self.arcs, "v", self.demand_arcs)
+            set_length_objective(self)
+            self.add_flow_conservation(self.v, "Flow conservation v")
+        else:
+            # Binary variables indicate if node n belongs to the working and backup paths of demand r
+            self.h = add_node_variables(self.model, self.RL, self.G, "h")
+            self.k = add_node_variables(self.model, self.RL, self.G, "k")
+
+            # Constraint: if the link is chosen, both of the nodes have to be indicated as chosen
+            if MATRIX_BUILDER:
+                add_node_indication_matrix(self, self.u, self.h, "Node indication h")
+                add_node_indication_matrix(self, self.v, self.k, "Node indication k")
+            else:
+                add_node_indication(self.model, self.u, self.h, self.RL, self.out_arcs, "Node indication h")
+                add_node_indication(self.model, self.v, self.k, self.RL, self.out_arcs, "Node indication k")
+
+        self.size[level] = (self.model.num_vars, self.model.num_constrs)
+        return
+
+    def add_flow_conservation(self, x, name):
+        if MATRIX_BUILDER:
+            add_flow_conservation_matrix(self, x, name)
+        else:
+            add_flow_conservation(self.model, x, self.RL, self.t, self.in_arcs, self.out_arcs, name)
+        return
+
+    def copy_model(self, name, level):
+        """
+        :return: copy of the base model up to the level
+        """
+        self.build(level)
+        columns, rows = self.size[level]
+        return self.model.copy(name, columns, rows)
+
+
+class Formulation(object):
+    """
+    The MilpModel of one of the problems together with the index sets and the variables it was built from. The model
+    starts as a copy of a level of the base model, without a base given the base is built for this formulation only.
+    """
+
+    def __init__(self, name, G, D, R, level=None, base=None):
+        if base is None:
+            base = ModelBase(G, D, R)
+
+        self.G = base.G
+        self.R = base.R
+
+        # Index sets of the base, the capacities are copied as set_uniform_capacity changes them
+        self.RL, self.t = base.RL, base.t
+        self.arcs, self.d, self.c = base.arcs, base.d, dict(base.c)
+        self.in_arcs, self.out_arcs = base.in_arcs, base.out_arcs
+        self.demand_arcs = base.demand_arcs
+
+        # Arc variables of the working (u) and protection (v) paths, node variables of the working (h) and
+        # protection (k) paths
+        self.u, self.v, self.h, self.k = None, None, None, None
+        if level is None:
+            self.model = MilpModel(name)
+        else:
+            self.model = base.copy_model(name, level)
+            self.u = base.u
+            self.v = base.v if 'v' in level else None
+            self.h, self.k = (base.h, base.k) if 'h' in level else (None, None)
+
+        # Positions (r * number of arcs + arc) of the arc variables of the demands and the incidence matrices, see
+        # arc_columns and incidence_matrices
+        self.arc_positions = base.arc_positions
+        self.incidence = base.incidence
+
+        # Rows of the capacity constraint {arc: index of the row}
+        self.capacity_rows = None
+
+        # SRGs of the SRG constraints
+        self.srg_links, self.srg_nodes = None, None
+
+        # Constraint families left out of the model and separated on the integer solutions: 'nodes', 'srg links' or
+        # 'srg nodes', see separate_lazy_constraints
+        self.lazy = set()
+
+        # Pairs of the working and the protection path tried first by the warm start heuristic
+        # {r: [(working path, protection path)]} or None, see heuristic_paths
+        self.start_pairs = None
+
+        # Order of the working and the protection paths: None, 'length' or 'source', see add_symmetry_breaking
+        self.symmetry_breaking = None
+
+
+class ProblemFamily(object):
+    """
+    The problems of one topology and demand set, e.g., the six problems of CoreNetworkProtection.main. The topology is
+    presolved once, keeping the members of all the SRGs of the family, and the base model is built once per presolved
+    topology; the formulation of every problem is derived from the shared base, see ModelBase.
+    """
+
+    def __init__(self, G, D, R, srgs=()):
+        """
+        :param srgs: SRG dictionaries of the SRG problems of the family, their members are not contracted
+        """
+        self.G = G
+        self.D = D
+        self.R = R
+        self.keep = kept_nodes(R, srgs)
+        self.presolved = {}
+        self.bases = {}
+
+    def presolve(self, keep):
+        """
+        :param keep: nodes kept by the problem, the nodes kept by the family are kept as well
+        :return: contracted graph, its arc lengths and the contracted arcs, see contract_chains
+        """
+        key = frozenset(keep | self.keep)
+        if key not in self.presolved:
+            self.presolved[key] = contract_chains(self.G, self.D, key, self.R)
+        return self.presolved[key]
+
+    def base(self, G, D):
+        """
+        :param G: the topology of the family or one of its presolved topologies
+        :return: ModelBase of the topology
+        """
+        if id(G) not in self.bases:
+            self.bases[id(G)] = ModelBase(G, D, self.R)
+        return self.bases[id(G)]
+
+
+def add_arc_variables(model, RL, arcs, name, demand_arcs=None):
+    """
+    Adds the binary variables indicating if arc (i,j) belongs to the path of demand r. With the pruned arcs
+    {r: arcs} the variables are added only for the arcs of the demand; the constraints skip the missing variables.
+
+    :return: dictionary of the variables {(r, i, j): index of the variable}
+    """
+    if demand_arcs is None:
+        return model.add_vars([(r, i, j) for r, _ in RL for i, j in arcs], name)
+    return model.add_vars([(r, i, j) for r, _ in RL for i, j in demand_arcs[r]], name)
+
+
+def add_node_variables(model, RL, G, name):
+    """
+    Adds the binary variables indicating if node n belongs to the path of demand r.
+
+    :return: dictionary of the variables {(r, n): index of the variable}
+    """
+    return model.add_vars([(r, n) for r, _ in RL for n in G.nodes()], name)
+
+
+def add_flow_conservation(model, x, RL, t, in_arcs, out_arcs, name):
+    """
+    Adds the flow conservation constraint for every demand and node. With the arc index every arc variable is touched
+    twice per demand, i.e., the construction is O(R*A) instead of O(R*N*A).
+    """
+    for r, _ in RL:
+        for m in in_arcs:
+            terms = [(x[r, i, j], 1) for i, j in in_arcs[m] if (r, i, j) in x] + \
+                    [(x[r, i, j], -1) for i, j in out_arcs[m] if (r, i, j) in x]
+            if terms or t[r, m] != 0:
+                model.add_constr(terms, "=", t[r, m], name)
+    return
+
+
+def add_link_disjointness(model, u, v, RL, arcs):
+    """
+    Adds the constraint: working and protection paths do not share a link, in the same or in the opposite direction.
+    One row per link covers both of its arcs, as a path does not use a link in both directions.
+    """
+    links = capacity_groups(arcs, 'link')
+    for r, _ in RL:
+        for link in links:
+            terms = [(x[r, i, j], 1) for x in (u, v) for i, j in link if (r, i, j) in x]
+            if terms:
+                model.add_constr(terms, "<", 1, "Link disjoint paths")
+    return
+
+
+def add_node_indication(model, x, y, RL, out_arcs, name):
+    """
+    Adds the constraint: if the arc is chosen, its tail node has to be indicated as chosen.
+    """
+    for r, _ in RL:
+        for n in out_arcs:
+            terms = [(x[r, i, j], -1) for i, j in out_arcs[n] if (r, i, j) in x]
+            if terms:
+                model.add_constr([(y[r, n], 1)] + terms, ">", 0, name)
+    return
+
+
+def add_node_disjointness(model, h, k, RL, G):
+    """
+    Adds the constraint: working and protection paths do not share a node except the source and the destination.
+    """
     for r, (src, dst) in RL:
         for n in G.nodes():
-            if n == src:
-                t[r, n] = -1
-            elif n == dst:
-                t[r, n] = 1
+            if n != src and n != dst:
+                model.add_constr([(h[r, n], 1), (k[r, n], 1)], "<", 1, "Node disjoint paths")
+    return
+
+
+# Default capacity constraint, per 'arc': each direction has the full capacity, or per 'link': both directions share
+# the capacity of the physical link; the capacitated build and optimize functions take it as capacity_mode
+CAPACITY_MODE = 'arc'
+
+
+def capacity_groups(arcs, mode=None):
+    """
+    :param mode: 'arc' or 'link', None uses CAPACITY_MODE
+    :return: list of the groups of the arcs sharing one capacity row, [(i, j)] per arc or [(i, j), (j, i)] per link
+    """
+    if mode is None:
+        mode = CAPACITY_MODE
+    if mode == 'arc':
+        return [[arc] for arc in arcs]
+    if mode != 'link':
+        raise ValueError('Unknown capacity mode {0}, the options are arc, link.'.format(mode))
+
+    groups = {}
+    order = []
+    for i, j in arcs:
+        link = frozenset((i, j))
+        if link not in groups:
+            groups[link] = []
+            order.append(link)
+        groups[link].append((i, j))
+    return [groups[link] for link in order]
+
+
+def add_capacity(model, u, v, R, RL, arcs, c, mode=None):
+    """
+    Adds the capacity constraint: working and protection flows of all the demands share the capacity of the arc (or
+    of the link), see capacity_groups.
+
+    :return: dictionary of the rows {(i, j): index of the row}, the arcs of a link share the row
+    """
+    rows = {}
+    for group in capacity_groups(arcs, mode):
+        row = model.add_constr([(x[r, i, j], R[dem]) for i, j in group for r, dem in RL for x in (u, v)
+                                if (r, i, j) in x], '<', c[group[0]], "Capacity")
+        for arc in group:
+            rows[arc] = row
+    return rows
+
+
+# Break the symmetry between the working and the protection variables of the protected formulations:
+# None, 'length' or 'source', see add_symmetry_breaking
+SYMMETRY_BREAKING = None
+
+
+def add_symmetry_breaking(f, mode):
+    """
+    Without the constraint every solution exists twice per demand, once with u and v swapped, which the
+    branch-and-bound explores separately. The shorter path is selected as the working path after the solve anyway,
+    so the results do not change.
+
+    :param mode: 'length': the working path is not longer than the protection path,
+                 'source': the working path leaves the source through an arc listed before the arc of the protection
+                 path in out_arcs
+    """
+    for r, (src, _) in f.RL:
+        if mode == 'length':
+            terms = [(x[r, i, j], sign * f.d[i, j]) for x, sign in ((f.u, 1), (f.v, -1)) for i, j in f.arcs
+                     if (r, i, j) in x]
+        elif mode == 'source':
+            terms = [(x[r, i, j], sign * position) for position, (i, j) in enumerate(f.out_arcs[src])
+                     for x, sign in ((f.u, 1), (f.v, -1)) if (r, i, j) in x]
+        else:
+            raise ValueError('Unknown symmetry breaking {0}, the options are length, source.'.format(mode))
+        f.model.add_constr(terms, "<", 0, "Symmetry breaking")
+    f.symmetry_breaking = mode
+    return
+
+
+def symmetry_order(f, dem, p, q):
+    """
+    :return: the working and the protection path of the pair in the order of the symmetry breaking rows of the
+             formulation, see add_symmetry_breaking
+    """
+    if f.symmetry_breaking == 'length':
+        swap = sum(f.d[arc] for arc in p) > sum(f.d[arc] for arc in q)
+    elif f.symmetry_breaking == 'source':
+        position = dict((arc, n) for n, arc in enumerate(f.out_arcs[dem[0]]))
+        first_p, first_q = [next(arc for arc in path if arc[0] == dem[0]) for path in (p, q)]
+        swap = position[first_p] > position[first_q]
+    else:
+        swap = False
+    return (q, p) if swap else (p, q)
+
+
+def set_length_objective(f):
+    """
+    Optimization goal is to minimize the total length of the working and protection paths.
+    """
+    if MATRIX_BUILDER:
+        set_length_objective_matrix(f)
+        return
+    f.model.set_objective((index, f.d[key[1], key[2]]) for x in (f.u, f.v) if x is not None
+                          for key, index in x.items())
+    return
+
+
+####################################################################################################################
+# Sparse matrix construction
+####################################################################################################################
+# Build the flow, disjointness and capacity constraints as blocks of the node-arc incidence matrix instead of row by
+# row, the model is the same
+MATRIX_BUILDER = sp is not None
+
+
+def incidence_matrices(f):
+    """
+    :return: node-arc incidence matrix (+1 at the head and -1 at the tail of the arc), node-arc matrix of the tails
+             (+1) and the dictionary {node: row}, the nodes in the order of G.nodes() and the arcs in the order of
+             f.arcs; built once per base model
+    """
+    if f.incidence is None:
+        position = dict((n, p) for p, n in enumerate(f.G.nodes()))
+        arcs = np.arange(len(f.arcs))
+        heads = np.array([position[j] for _, j in f.arcs], dtype=int)
+        tails = np.array([position[i] for i, _ in f.arcs], dtype=int)
+        shape = (len(position), len(f.arcs))
+
+        E = sp.csr_matrix((np.r_[np.ones(len(arcs)), -np.ones(len(arcs))],
+                           (np.r_[heads, tails], np.r_[arcs, arcs])), shape=shape)
+        T = sp.csr_matrix((np.ones(len(arcs)), (tails, arcs)), shape=shape)
+        f.incidence = E, T, position
+    return f.incidence
+
+
+def arc_columns(f, x):
+    """
+    The arc variables of a family are one block, demand by demand in the order of f.arcs, see add_arc_variables.
+
+    :return: numpy array of the indices of the variables x[r, i, j] at the positions r * number of arcs + arc, -1 for
+             the pruned arcs
+    """
+    if f.arc_positions is None:
+        if f.demand_arcs is None:
+            f.arc_positions = np.arange(len(f.RL) * len(f.arcs))
+        else:
+            arc = dict((a, p) for p, a in enumerate(f.arcs))
+            f.arc_positions = np.array([r * len(f.arcs) + arc[a] for r, _ in f.RL for a in f.demand_arcs[r]],
+                                       dtype=int)
+
+    columns = -np.ones(len(f.RL) * len(f.arcs), dtype=int)
+    if x:
+        columns[f.arc_positions] = min(x.values()) + np.arange(len(x))
+    return columns
+
+
+def node_columns(f, y):
+    """
+    :return: numpy array of the indices of the variables y[r, n] at the positions r * number of nodes + node
+    """
+    return min(y.values()) + np.arange(len(y)) if y else np.zeros(0, dtype=int)
+
+
+def add_matrix_rows(model, A, sense, rhs, name, columns, keep_empty=False):
+    """
+    Drops the columns of the pruned variables (-1) and, unless keep_empty, the rows left without a variable, which
+    have the right-hand side 0, as the row by row construction does.
+
+    :return: list of the indices of the added rows
+    """
+    present = np.flatnonzero(columns >= 0)
+    A = A.tocsc()[:, present].tocsr()
+    rhs = np.asarray(rhs, dtype=float)
+    if not keep_empty:
+        rows = np.flatnonzero((np.diff(A.indptr) > 0) | (rhs != 0))
+        A, rhs = A[rows], rhs[rows]
+    return model.add_constr_matrix(A, sense, rhs.tolist(), name, columns[present])
+
+
+def add_flow_conservation_matrix(f, x, name):
+    """
+    Flow conservation of all the demands as the block diagonal matrix I(R) x E of the incidence matrix E.
+    """
+    E, _, position = incidence_matrices(f)
+
+    t = np.zeros(len(f.RL) * len(position))
+    for r, (src, dst) in f.RL:
+        t[r * len(position) + position[src]] = -1
+        t[r * len(position) + position[dst]] = 1
+
+    add_matrix_rows(f.model, sp.kron(sp.identity(len(f.RL)), E), "=", t, name, arc_columns(f, x))
+    return
+
+
+def add_link_disjointness_matrix(f):
+    """
+    Link disjointness of all the demands as the matrix I(R) x L for the working and the protection variables, L is
+    the link-arc incidence matrix. The rows of the pruned links are dropped.
+    """
+    position = dict((arc, p) for p, arc in enumerate(f.arcs))
+    link_of = np.zeros(len(f.arcs), dtype=int)
+    links = capacity_groups(f.arcs, 'link')
+    for l, link in enumerate(links):
+        for arc in link:
+            link_of[position[arc]] = l
+    L = sp.csr_matrix((np.ones(len(f.arcs)), (link_of, np.arange(len(f.arcs)))), shape=(len(links), len(f.arcs)))
+
+    block = sp.kron(sp.identity(len(f.RL)), L)
+    columns = np.r_[arc_columns(f, f.u), arc_columns(f, f.v)]
+    present = np.flatnonzero(columns >= 0)
+    A = sp.hstack([block, block]).tocsc()[:, present].tocsr()
+    rows = np.flatnonzero(np.diff(A.indptr) > 0)
+    f.model.add_constr_matrix(A[rows], "<", [1] * len(rows), "Link disjoint paths", columns[present])
+    return
+
+
+def add_node_indication_matrix(f, x, y, name):
+    """
+    The rows of the nodes without an outgoing arc variable are dropped.
+    """
+    _, T, position = incidence_matrices(f)
+    columns = arc_columns(f, x)
+    present = np.flatnonzero(columns >= 0)
+
+    X = sp.kron(sp.identity(len(f.RL)), T).tocsc()[:, present].tocsr()
+    rows = np.flatnonzero(np.diff(X.indptr) > 0)
+    A = sp.hstack([sp.identity(X.shape[0], format='csr'), -X]).tocsr()[rows]
+    f.model.add_constr_matrix(A, ">", [0] * len(rows), name, np.r_[node_columns(f, y), columns[present]])
+    return
+
+
+def add_node_disjointness_matrix(f):
+    _, _, position = incidence_matrices(f)
+
+    # The source and the destination are on both paths
+    keep = np.ones(len(f.RL) * len(position), dtype=bool)
+    for r, (src, dst) in f.RL:
+        keep[r * len(position) + position[src]] = False
+        keep[r * len(position) + position[dst]] = False
+
+    I = sp.identity(int(keep.sum()), format='csr')
+    f.model.add_constr_matrix(sp.hstack([I, I]), "<", [1] * I.shape[0], "Node disjoint paths",
+                              np.r_[node_columns(f, f.h)[keep], node_columns(f, f.k)[keep]])
+    return
+
+
+def add_capacity_matrix(f, mode=None):
+    """
+    Capacity of all the arcs (or links) as the matrix volume^T x L for the working and the protection variables,
+    L is the identity per arc (the link-arc incidence matrix per link).
+
+    :return: dictionary of the rows {(i, j): index of the row}, the arcs of a link share the row
+    """
+    groups = capacity_groups(f.arcs, mode)
+    position = dict((arc, p) for p, arc in enumerate(f.arcs))
+    group_of = np.zeros(len(f.arcs), dtype=int)
+    for g, group in enumerate(groups):
+        for arc in group:
+            group_of[position[arc]] = g
+    L = sp.csr_matrix((np.ones(len(f.arcs)), (group_of, np.arange(len(f.arcs)))), shape=(len(groups), len(f.arcs)))
+
+    volume = sp.csr_matrix(np.array([[f.R[dem] for _, dem in f.RL]], dtype=float))
+    block = sp.kron(volume, L)
+    rows = add_matrix_rows(f.model, sp.hstack([block, block]), "<", [f.c[group[0]] for group in groups],
+                           "Capacity", np.r_[arc_columns(f, f.u), arc_columns(f, f.v)], keep_empty=True)
+    return dict((arc, rows[group_of[p]]) for p, arc in enumerate(f.arcs))
+
+
+def set_length_objective_matrix(f):
+    lengths = np.tile(np.array([f.d[arc] for arc in f.arcs], dtype=float), len(f.RL))
+    obj = np.zeros(f.model.num_vars)
+    for x in (f.u, f.v):
+        if x is not None:
+            columns = arc_columns(f, x)
+            present = columns >= 0
+            obj[columns[present]] = lengths[present]
+    f.model.obj = obj.tolist()
+    return
+
+
+####################################################################################################################
+# Model statistics
+####################################################################################################################
+# Report the size of every model before it is solved
+REPORT_MODEL_STATISTICS = True
+
+
+def report_model_statistics(model):
+    """
+    Writes the model statistics to the messages and warns about the constraint families with duplicated rows.
+    """
+    if not REPORT_MODEL_STATISTICS:
+        return
+
+    rows, columns = model.statistics()
+
+    add_message('Model "{0}": {1} rows, {2} columns, {3} nonzeros'.format(
+        model.name, model.num_constrs, model.num_vars, model.num_nonzeros))
+    for family in sorted(columns):
+        add_message('  columns {0}: {1}'.format(family, columns[family]))
+    for family in sorted(rows):
+        add_message('  rows {0}: {1}, nonzeros: {2}'.format(family, rows[family]['rows'], rows[family]['nonzeros']))
+        if rows[family]['duplicates'] > 0:
+            add_warning('  {0} rows of the family "{1}" are duplicates!'.format(rows[family]['duplicates'], family))
+    return
+
+
+####################################################################################################################
+# Warm start
+####################################################################################################################
+# Start the MIP solves from the heuristic solution
+WARM_START = True
+
+
+def heuristic_paths(f):
+    """
+    Greedy routing of the demands in the order of decreasing volume: the shortest path (unprotected) or the pair of
+    Suurballe/Bhandari on the arcs with enough remaining capacity. If the pair violates the SRGs, the shortest path
+    is protected by the shortest disjoint path avoiding the SRGs used by the shortest path. The start pairs of the
+    formulation are tried first, the first one fitting into the remaining capacity is taken.
+
+    :return: dictionary {r: (working path, protection path)}, the protection path is None for the unprotected problem,
+             the demands without a path are missing
+    """
+    node_disjoint = f.h is not None
+
+    # Remaining capacity of the capacity rows, the arcs of a link share the row
+    residual = None
+    if f.capacity_rows is not None:
+        residual = dict((k, f.model.rhs[k]) for k in set(f.capacity_rows.values()))
+
+    paths = {}
+    for r, dem in sorted(f.RL, key=lambda item: -f.R[item[1]]):
+        volume = f.R[dem]
+        adjacency = dict((n, []) for n in f.G.nodes())
+        for i, j in f.arcs:
+            if residual is None or residual[f.capacity_rows[i, j]] >= volume:
+                adjacency[i].append((j, f.d[i, j]))
+
+        pair = start_pair(f, r, residual, volume)
+        if pair is None:
+            if f.v is None:
+                _, predecessor = dijkstra(adjacency, dem[0])
+                pair = (tree_path(predecessor, dem[1]), None) if dem[1] in predecessor else None
+            elif node_disjoint:
+                pair = node_disjoint_pair(split_nodes(adjacency), dem[0], dem[1])
             else:
-                t[r, n] = 0
-
-    # Transform undirected edges to directed arcs
-    d = {}
-    arcs = []
-    for i, j in G.edges():
-        d[i,j] = D[i,j]
-        d[j,i] = D[j,i]
-        arcs.append((i,j))
-        arcs.append((j,i))
-
-    # # Binary variables indicate if arc (i,j) belongs to the working and backup paths of demand r
-    u, v = {}, {}
-    for r in RL:
-        for i,j in arcs:
-            u[r[0],i,j] = model.addVar(vtype="B", name="u[%s,%s,%s]" %(r,i,j))
-            v[r[0],i,j] = model.addVar(vtype="B", name="v[%s,%s,%s]" %(r,i,j))
-    model.update()
-
-    # Optimization goal
-    model.setObjective(quicksum((u[r[0],i,j] + v[r[0],i,j])*d[i,j] for r in RL for i,j in arcs), GRB.MINIMIZE)
-
-    # Constraint: Link paths have to be link disjoint
-    for r in RL:
-        for i,j in arcs:
-            model.addConstr(u[r[0],i,j] + v[r[0],i,j], "<=", 1, name="Link disjoint paths")
-
-    # Flow conservation constraint
-    for r in RL:
-        for m in G.nodes():
-            model.addConstr(quicksum(u[r[0],i,j] for i,j in arcs if j==m) - quicksum(u[r[0],i,j] for i,j in arcs if i==m), "=", t[r[0],m])
-            model.addConstr(quicksum(v[r[0],i,j] for i,j in arcs if j==m) - quicksum(v[r[0],i,j] for i,j in arcs if i==m), "=", t[r[0],m])
+                pair = link_disjoint_pair(adjacency, dem[0], dem[1])
+
+            if pair is not None and pair[1] is not None and \
+                    srg_conflict(dem, pair[0], pair[1], f.srg_links, f.srg_nodes):
+                pair = srg_disjoint_pair(f, adjacency, dem, node_disjoint)
+
+        if pair is None:
+            continue
+
+        paths[r] = pair
+        if residual is not None:
+            for arc in pair[0] + (pair[1] or []):
+                residual[f.capacity_rows[arc]] -= volume
+
+    return paths
+
+
+def start_pair(f, r, residual, volume):
+    """
+    :return: the first start pair of the demand r, which has a variable for each of its arcs and fits into the
+             remaining capacity of the capacity rows, or None
+    """
+    if not f.start_pairs:
+        return None
+
+    for pair in f.start_pairs.get(r, []):
+        if any((r, i, j) not in x for x, path in ((f.u, pair[0]), (f.v, pair[1] or [])) for i, j in path):
+            continue
+        if residual is not None:
+            load = {}
+            for arc in pair[0] + (pair[1] or []):
+                load[f.capacity_rows[arc]] = load.get(f.capacity_rows[arc], 0) + volume
+            if any(residual[row] < value for row, value in load.items()):
+                continue
+        return pair
+    return None
+
+
+def srg_disjoint_pair(f, adjacency, dem, node_disjoint):
+    """
+    :return: the shortest path and the shortest disjoint path, which does not use the links (or leave the nodes) of
+             the SRGs used by the shortest path, or None
+    """
+    _, predecessor = dijkstra(adjacency, dem[0])
+    if dem[1] not in predecessor:
+        return None
+    p = tree_path(predecessor, dem[1])
+
+    forbidden_links = set()
+    if f.srg_links is not None:
+        links_p = set(frozenset(arc) for arc in p)
+        for value in f.srg_links.values():
+            members = srg_link_members(value)
+            if members & links_p:
+                forbidden_links |= members
+
+    forbidden_tails = set()
+    if f.srg_nodes is not None:
+        nodes_p = set(i for i, _ in p)
+        for value in f.srg_nodes.values():
+            members = srg_node_members(value, dem)
+            if members & nodes_p:
+                forbidden_tails |= members
+
+    q = disjoint_path(adjacency, dem[0], dem[1], p, node_disjoint, forbidden_links, forbidden_tails)
+    if q is None or srg_conflict(dem, p, q, f.srg_links, f.srg_nodes):
+        return None
+    return p, q
+
+
+def set_warm_start(f, solver=None):
+    """
+    Sets the heuristic solution as the MIP start of the model, if the heuristic routes all the demands. The working
+    and the protection path of every pair are ordered as the symmetry breaking rows require.
+
+    :param solver: string, the solver of the model, see milp_solvers.solve
+    """
+    paths = heuristic_paths(f)
+
+    if len(paths) < len(f.RL):
+        f.model.start = {}
+        add_message('Warm start: heuristic solution routes {0} of {1} demands, no MIP start.'.format(len(paths),
+                                                                                                   len(f.RL)))
+        return
+
+    demands = dict(f.RL)
+    start = {}
+    for r, (p, q) in paths.items():
+        if q is not None:
+            p, q = symmetry_order(f, demands[r], p, q)
+        for x, y, path in ((f.u, f.h, p), (f.v, f.k, q)):
+            if x is None:
+                continue
+            chosen = set(path)
+            for i, j in f.arcs:
+                if (r, i, j) in x:
+                    start[x[r, i, j]] = 1 if (i, j) in chosen else 0
+            if y is not None:
+                tails = set(i for i, _ in path)
+                for n in f.G.nodes():
+                    start[y[r, n]] = 1 if n in tails else 0
+
+    f.model.start = start
+    add_message('Warm start: heuristic solution of length {0:.2f}.'.format(
+        sum(f.model.obj[k] * value for k, value in start.items())))
+    if solver == 'highs':
+        add_message('Warm start: HiGHS does not take a MIP start, it is used only if the solve stops at a limit '
+                    'without a better solution.')
+    return
+
+
+####################################################################################################################
+# Solve and get the results
+####################################################################################################################
+STATUS_MESSAGES = {INFEASIBLE: 'Optimal solution is not found! The model is infeasible.',
+                   INF_OR_UNBD: 'Optimal solution is not found! The model is infeasible or unbounded.',
+                   UNBOUNDED: 'Optimal solution is not found! The model is unbounded.'}
+
+
+# Write every new incumbent (objective, bound, gap, elapsed time) to the messages
+LOG_INCUMBENTS = True
+
+
+def log_incumbent(objective, bound, elapsed):
+    gap = relative_gap(objective, bound)
+    add_message('Incumbent {0:.2f}, bound {1}, gap {2}, {3:.2f} s'.format(
+        objective, '-' if bound is None else '{0:.2f}'.format(bound), '-' if gap is None else '{0:.2%}'.format(gap),
+        elapsed))
+    return
+
+
+class SolveResults(tuple):
+    """
+    The results of an optimize_* function, unpacked as the tuple of the results, e.g.,
+    distance1, distance2, path1, path2 = optimize_link_disjoint_cap(...), with the status of the solve: OPTIMAL,
+    FEASIBLE (a limit of the SolveLimits is reached, the solution is not proven optimal) or the status without a
+    solution, for which the results are zeros.
+    """
+
+    def __new__(cls, results, status):
+        self = tuple.__new__(cls, results)
+        self.status = status
+        return self
+
+    def __reduce__(self):
+        return SolveResults, (tuple(self), self.status)
+
+
+def solve_formulation(f, solver, limits=None):
+    """
+    :param limits: milp_solvers.SolveLimits or None
+    :return: MilpSolution, its values are the optimal solution or, at a limit, a feasible solution, if the status is
+             OPTIMAL or FEASIBLE
+    """
+    report_model_statistics(f.model)
+
+    if WARM_START:
+        set_warm_start(f, solver)
 
     # Start optimization
-    model.params.outputflag = 0
-    model.optimize()
-
-    # If optimal solution is found get the results
-    if model.status != GRB.Status.OPTIMAL:
-        if model.status == 3:
-            arcpy.AddMessage('Optimal solution is not found! The model is infeasible.')
-            distance1 = 0
-            distance2 = 0
-            path1 = 0
-            path2 = 0
-
-        elif model.status == 4:
-            arcpy.AddMessage('Optimal solution is not found! The model is infeasible or unbounded.')
-            distance1 = 0
-            distance2 = 0
-            path1 = 0
-            path2 = 0
-
-        if model.status == 5:
-            arcpy.AddMessage('Optimal solution is not found! The model is unbounded.')
-            distance1 = 0
-            distance2 = 0
-            path1 = 0
-            path2 = 0
-
+    separate = lazy_separator(f)
+    rows = f.model.num_constrs
+    solution = solve(f.model, solver, separate, limits, log_incumbent if LOG_INCUMBENTS else None)
+
+    if separate is not None:
+        add_message('Lazy constraints: {0} rows added, {1} rows with the full enumeration.'.format(
+            f.model.num_constrs - rows, enumerated_rows(f)))
+
+    if solution.status == FEASIBLE:
+        gap = solution.gap
+        add_warning('The solve stopped at a limit after {0:.2f} s, the solution is feasible with the gap {1}.'.format(
+            solution.runtime, '-' if gap is None else '{0:.2%}'.format(gap)))
+        return solution
+    if solution.status != OPTIMAL:
+        add_message(STATUS_MESSAGES.get(solution.status, 'Optimal solution is not found!'))
+    return solution
+
+
+def solution_paths(f, solution):
+    """
+    Reads only the variables with the value 1, instead of all the arcs of every demand, and orders the arcs of each
+    path from the source to the destination.
+
+    :return: dictionaries {r: working path} and {r: protection path}, the paths as ordered lists of the arcs, the
+             second one empty for the unprotected problem
+    """
+    if np is not None:
+        chosen = np.flatnonzero(np.asarray(solution.x) > 0.5).tolist()
     else:
-        su = model.getAttr('x', u)
-        sv = model.getAttr('x', v)
-
-        # The result is given as set of working and protection paths for every demand
-        distance1, distance2 = {}, {}
-        path1, path2 = {}, {}
-
-        for r in RL:
-            d1 = 0
-            d2 = 0
-            p1 = []
-            p2 = []
-            for i, j in arcs:
-                if su[r[0], i, j] > 0:
-                    p1.append((i, j))
-                    d1 += d[i, j]
-                if sv[r[0], i, j] > 0:
-                    p2.append((i, j))
-                    d2 += d[i, j]
-
-                    # Select the shorter path as working path and longer as backup path
-            if d1 <= d2:
-                distance1[r[1]] = d1
-                distance2[r[1]] = d2
-                path1[r[1]] = p1
-                path2[r[1]] = p2
-            else:
-                distance1[r[1]] = d2
-                distance2[r[1]] = d1
-                path1[r[1]] = p2
-                path2[r[1]] = p1
+        chosen = [k for k, value in enumerate(solution.x) if value > 0.5]
 
-    return distance1, distance2, path1, path2
+    arcs = {"u": {}, "v": {}}
+    for k in chosen:
+        family = f.model.var_family[k]
+        if family in arcs:
+            r, i, j = f.model.var_key[k]
+            arcs[family].setdefault(r, []).append((i, j))
 
+    working = dict((r, order_path(arcs["u"].get(r, []), src)) for r, (src, _) in f.RL)
+    protection = {}
+    if f.v is not None:
+        protection = dict((r, order_path(arcs["v"].get(r, []), src)) for r, (src, _) in f.RL)
+    return working, protection
 
-# MILP formulation for link disjoint paths with capacity constraint
-def optimize_link_disjoint_cap(G, D, R):
-    model = Model("Link disjoint paths with capacity constraint")
 
-    # Identify the source and the destination of the demand
-    t = {}
-    RL = list(enumerate(R))
+def working_paths(f, solution):
+    paths, _ = solution_paths(f, solution)
 
-    for r, (src, dst) in RL:
-        for n in G.nodes():
-            if n==src:
-                t[r,n] = -1
-            elif n==dst:
-                t[r,n] = 1
-            else:
-                t[r,n] = 0
+    # The result is given as the ordered path for every demand
+    distance = {}
+    path = {}
+    for r, dem in f.RL:
+        path[dem] = paths[r]
+        distance[dem] = sum(f.d[arc] for arc in paths[r])
 
-    # Transform undirected edges to directed arcs
-    d = {}
-    c = {}
-    arcs = []
-    C = nx.get_edge_attributes(G, "capacity")
+    return distance, path
 
-    for i, j in G.edges():
-        d[i,j] = D[i,j]
-        d[j,i] = D[j,i]
-        c[i,j] = C[i,j]
-        c[j,i] = C[i,j]
-        arcs.append((i,j))
-        arcs.append((j,i))
-
-    # Binary variables indicate if arc (i,j) belongs to the working and backup paths of demand r
-    u, v = {}, {}
-    for r in RL:
-        for i,j in arcs:
-            u[r[0],i,j] = model.addVar(vtype="B", name="u[%s,%s,%s]" %(r[0],i,j))
-            v[r[0],i,j] = model.addVar(vtype="B", name="v[%s,%s,%s]" %(r[0],i,j))
-    model.update()
-
-    # Optimization goal
-    model.setObjective(quicksum((u[r[0],i,j] + v[r[0],i,j])*d[i,j] for r in RL for i,j in arcs), GRB.MINIMIZE)
 
-    # Constraint: Link paths have to be link disjoint
-    for r in RL:
-        for i, j in arcs:
-            model.addConstr(u[r[0],i,j] + v[r[0],i,j], "<=", 1, name="Link disjoint paths")
+def working_protection_paths(f, solution):
+    working, protection = solution_paths(f, solution)
 
-    # Flow conservation constraint
-    for r in RL:
-        for m in G.nodes():
-            model.addConstr(quicksum(u[r[0],i,j] for i,j in arcs if j==m) - quicksum(u[r[0],i,j] for i,j in arcs if i==m), "=", t[r[0],m])
-            model.addConstr(quicksum(v[r[0],i,j] for i,j in arcs if j==m) - quicksum(v[r[0],i,j] for i,j in arcs if i==m), "=", t[r[0],m])
+    # The result is given as the ordered working and protection paths for every demand
+    distance1, distance2 = {}, {}
+    path1, path2 = {}, {}
 
-    # Capacity constraint
-    for i, j in arcs:
-        model.addConstr(quicksum(R[RL[r[0]][1]]*(u[r[0],i,j] + v[r[0],i,j]) for r in RL), '<', c[i,j])
+    for r, dem in f.RL:
+        p1, p2 = working[r], protection[r]
+        d1 = sum(f.d[arc] for arc in p1)
+        d2 = sum(f.d[arc] for arc in p2)
 
-    # Start optimization
-    model.params.outputflag = 0
-    model.optimize()
-
-    # If optimal solution is found get the results
-    if model.status != GRB.Status.OPTIMAL:
-        if model.status == 3:
-            arcpy.AddMessage('Optimal solution is not found! The model is infeasible.')
-            distance1 = 0
-            distance2 = 0
-            path1 = 0
-            path2 = 0
-
-        elif model.status == 4:
-            arcpy.AddMessage('Optimal solution is not found! The model is infeasible or unbounded.')
-            distance1 = 0
-            distance2 = 0
-            path1 = 0
-            path2 = 0
-
-        if model.status == 5:
-            arcpy.AddMessage('Optimal solution is not found! The model is unbounded.')
-            distance1 = 0
-            distance2 = 0
-            path1 = 0
-            path2 = 0
-
-    else:
-        su = model.getAttr('x', u)
-        sv = model.getAttr('x', v)
-
-        # The result is given as set of working and protection paths for every demand
-        distance1, distance2 = {}, {}
-        path1, path2 = {}, {}
-
-        for r in RL:
-            d1 = 0
-            d2 = 0
-            p1 = []
-            p2 = []
-            for i, j in arcs:
-                if su[r[0], i, j] > 0:
-                    p1.append((i, j))
-                    d1 += d[i, j]
-                if sv[r[0], i, j] > 0:
-                    p2.append((i, j))
-                    d2 += d[i, j]
-
-                    # Select the shorter path as working path and longer as backup path
-            if d1 <= d2:
-                distance1[r[1]] = d1
-                distance2[r[1]] = d2
-                path1[r[1]] = p1
-                path2[r[1]] = p2
-            else:
-                distance1[r[1]] = d2
-                distance2[r[1]] = d1
-                path1[r[1]] = p2
-                path2[r[1]] = p1
+        # Select the shorter path as working path and longer as backup path
+        if d1 <= d2:
+            distance1[dem] = d1
+            distance2[dem] = d2
+            path1[dem] = p1
+            path2[dem] = p2
+        else:
+            distance1[dem] = d2
+            distance2[dem] = d1
+            path1[dem] = p2
+            path2[dem] = p1
 
     return distance1, distance2, path1, path2
 
 
-# MILP formulation for node disjoint paths with capacity constraint
-def optimize_node_disjoint_cap(G, D, R):
-    model = Model("Node disjoint paths with capacity constraint")
-
-    # Identify the source and the destination of the demand
-    t = {}
-    RL = list(enumerate(R))
-
-    for r, (src, dst) in RL:
-        for n in G.nodes():
-            if n==src:
-                t[r,n] = -1
-            elif n==dst:
-                t[r,n] = 1
-            else:
-                t[r,n] = 0
+def formulation_results(f, solution):
+    """
+    :return: distance, path for the unprotected problem, otherwise distance1, distance2, path1, path2
+    """
+    if f.v is None:
+        return working_paths(f, solution)
+    return working_protection_paths(f, solution)
+
+
+def path_nodes(path):
+    """
+    :param path: ordered list of the arcs
+    :return: list of the nodes from the source to the destination
+    """
+    if not path:
+        return []
+    return [path[0][0]] + [j for _, j in path]
+
+
+def arc_demands(*paths):
+    """
+    :param paths: dictionaries {demand: path} of the working and protection paths
+    :return: dictionary {arc: list of the demands, which paths use the arc}
+    """
+    index = {}
+    for path in paths:
+        for dem, p in path.items():
+            for arc in p:
+                index.setdefault(arc, []).append(dem)
+    return index
+
+
+def path_details(D, working, protection=None):
+    """
+    The node sequences and the lengths of the hops of the paths and the demands per arc, computed once and stored
+    with the results.
+
+    :param D: python dictionary with the lengths of the arcs, {(i, j): length}
+    :param working: dictionary {demand: ordered working path}
+    :param protection: dictionary {demand: ordered protection path} or None
+    :return: dictionary of the entries of the result files
+    """
+    details = {'working_nodes': dict((dem, path_nodes(p)) for dem, p in working.items()),
+               'working_hop_lengths': dict((dem, [D[arc] for arc in p]) for dem, p in working.items())}
+    if protection is None:
+        details['arc_demands'] = arc_demands(working)
+    else:
+        details['protection_nodes'] = dict((dem, path_nodes(p)) for dem, p in protection.items())
+        details['protection_hop_lengths'] = dict((dem, [D[arc] for arc in p]) for dem, p in protection.items())
+        details['arc_demands'] = arc_demands(working, protection)
+    return details
 
-        print RL[r][1]
-        print R[RL[r][1]]
 
-    # Transform undirected edges to directed arcs
-    d = {}
-    c = {}
-    arcs = []
-    C = nx.get_edge_attributes(G, "capacity")
+def no_results(f):
+    # The results, if the optimal solution is not found
+    if f.v is None:
+        return 0, 0
+    return 0, 0, 0, 0
 
-    for i, j in G.edges():
-        d[i,j] = D[i,j]
-        d[j,i] = D[j,i]
-        c[i,j] = C[i,j]
-        c[j,i] = C[i,j]
-        arcs.append((i,j))
-        arcs.append((j,i))
-
-    # Binary variables indicate if arc (i,j) belongs to the working and backup paths of demand r
-    u, v = {}, {}
-    for r in RL:
-        for i,j in arcs:
-            u[r[0],i,j] = model.addVar(vtype="B", name="u[%s,%s,%s]" %(r[0],i,j))
-            v[r[0],i,j] = model.addVar(vtype="B", name="v[%s,%s,%s]" %(r[0],i,j))
-
-    # Binary variables indicate if node n belongs to the working and backup paths of demand r
-    h, k = {}, {}
-    for r in RL:
-        for n in G.nodes():
-            h[r[0],n] = model.addVar(vtype="B", name="u[%s,%s]" %(r[0],n))
-            k[r[0],n] = model.addVar(vtype="B", name="v[%s,%s]" %(r[0],n))
-    model.update()
-
-    # Optimization goal
-    model.setObjective(quicksum((u[r[0],i,j] + v[r[0],i,j])*d[i,j] for r in RL for i,j in arcs), GRB.MINIMIZE)
-
-    # Flow conservation constraint
-    for r in RL:
-        for m in G.nodes():
-            model.addConstr(
-                quicksum(u[r[0], i, j] for i, j in arcs if j == m) - quicksum(u[r[0], i, j] for i, j in arcs if i == m),
-                "=", t[r[0], m])
-            model.addConstr(
-                quicksum(v[r[0], i, j] for i, j in arcs if j == m) - quicksum(v[r[0], i, j] for i, j in arcs if i == m),
-                "=", t[r[0], m])
-
-            # Capacity constraint
-            for i, j in arcs:
-                model.addConstr(quicksum(R[RL[r[0]][1]]*(u[r[0],i,j] + v[r[0],i,j]) for r in RL), '<', c[i,j])
-
-    # Constraint: if the link is chosen, both of the nodes have to be indicated as chosen
-    for r in RL:
-        for n in G.nodes():
-            model.addConstr(h[r[0], n] - quicksum(u[r[0],n,j] for i,j in arcs if i == n), "=>", 0)
-            model.addConstr(k[r[0], n] - quicksum(v[r[0],n,j] for i,j in arcs if i == n), "=>", 0)
 
-    # Constraint: Link paths have to be node disjoint
-    for r in RL:
-        for n in G.nodes():
-            # except source and destination
-            if n != r[1][1] and n != r[1][0]:
-                model.addConstr(h[r[0], n] + k[r[0], n], "<=", 1, name="Node disjoint paths")
+####################################################################################################################
+# Formulations
+####################################################################################################################
+def build_unprotected_path(G, D, R, base=None):
+    # Binary variables, optimization goal (length of the paths) and flow conservation from the base model
+    return Formulation("Unprotected paths", G, D, R, 'u', base)
 
 
-    # Start optimization
-    model.params.outputflag = 0
-    model.optimize()
-
-    # If optimal solution is found get the results
-    if model.status != GRB.Status.OPTIMAL:
-        if model.status == 3:
-            arcpy.AddMessage('Optimal solution is not found! The model is infeasible.')
-            distance1 = 0
-            distance2 = 0
-            path1 = 0
-            path2 = 0
-
-        elif model.status == 4:
-            arcpy.AddMessage('Optimal solution is not found! The model is infeasible or unbounded.')
-            distance1 = 0
-            distance2 = 0
-            path1 = 0
-            path2 = 0
-
-        if model.status == 5:
-            arcpy.AddMessage('Optimal solution is not found! The model is unbounded.')
-            distance1 = 0
-            distance2 = 0
-            path1 = 0
-            path2 = 0
+def build_link_disjoint(G, D, R, name="Link disjoint paths", base=None):
+    # Binary variables indicate if arc (i,j) belongs to the working and backup paths of demand r, the optimization goal
+    # and the flow conservation constraint from the base model
+    f = Formulation(name, G, D, R, 'uv', base)
 
+    # Constraint: Link paths have to be link disjoint
+    if MATRIX_BUILDER:
+        add_link_disjointness_matrix(f)
     else:
-        su = model.getAttr('x', u)
-        sv = model.getAttr('x', v)
-
-        # The result is given as set of working and protection paths for every demand
-        distance1, distance2 = {}, {}
-        path1, path2 = {}, {}
-
-        for r in RL:
-            d1 = 0
-            d2 = 0
-            p1 = []
-            p2 = []
-            for i, j in arcs:
-                if su[r[0], i, j] > 0:
-                    p1.append((i, j))
-                    d1 += d[i, j]
-                if sv[r[0], i, j] > 0:
-                    p2.append((i, j))
-                    d2 += d[i, j]
-
-                    # Select the shorter path as working path and longer as backup path
-            if d1 <= d2:
-                distance1[r[1]] = d1
-                distance2[r[1]] = d2
-                path1[r[1]] = p1
-                path2[r[1]] = p2
-            else:
-                distance1[r[1]] = d2
-                distance2[r[1]] = d1
-                path1[r[1]] = p2
-                path2[r[1]] = p1
+        add_link_disjointness(f.model, f.u, f.v, f.RL, f.arcs)
 
-    return distance1, distance2, path1, path2
+    # Constraint: order of the working and protection paths
+    if SYMMETRY_BREAKING is not None:
+        add_symmetry_breaking(f, SYMMETRY_BREAKING)
 
+    return f
 
-# MILP formulation for link disjoint paths with capacity constraint and link SRGs
-def optimize_link_disjoint_cap_srg_links(G, D, R, srg_links):
-    model = Model("Link disjoint paths with capacity constraint and link SRGs")
 
-    # Identify the source and the destination of the demand
-    t = {}
-    RL = list(enumerate(R))
+def build_link_disjoint_cap(G, D, R, name="Link disjoint paths with capacity constraint", base=None,
+                            capacity_mode=None):
+    f = build_link_disjoint(G, D, R, name, base)
 
-    for r, (src, dst) in RL:
-        for n in G.nodes():
-            if n == src:
-                t[r, n] = -1
-            elif n == dst:
-                t[r, n] = 1
-            else:
-                t[r, n] = 0
+    # Capacity constraint per arc or per link, see capacity_groups
+    if MATRIX_BUILDER:
+        f.capacity_rows = add_capacity_matrix(f, capacity_mode)
+    else:
+        f.capacity_rows = add_capacity(f.model, f.u, f.v, f.R, f.RL, f.arcs, f.c, capacity_mode)
 
-        print RL[r][1]
-        print R[RL[r][1]]
+    return f
 
-    # Transform undirected edges to directed arcs
-    d = {}
-    c = {}
-    arcs = []
-    C = nx.get_edge_attributes(G, "capacity")
 
-    for i, j in G.edges():
-        d[i, j] = D[i, j]
-        d[j, i] = D[j, i]
-        c[i, j] = C[i, j]
-        c[j, i] = C[i, j]
-        arcs.append((i, j))
-        arcs.append((j, i))
+def build_node_disjoint(G, D, R, name="Node disjoint paths", base=None):
+    # Arc and node variables of the working and backup paths, the optimization goal, the flow conservation and the
+    # node indication constraints from the base model
+    f = Formulation(name, G, D, R, 'uvhk', base)
 
-    # Binary variables indicate if arc (i,j) belongs to the working and backup paths of demand r
-    u, v = {}, {}
-    for r in RL:
-        for i,j in arcs:
-            u[r[0],i,j] = model.addVar(vtype="B", name="u[%s,%s,%s]" %(r[0],i,j))
-            v[r[0],i,j] = model.addVar(vtype="B", name="v[%s,%s,%s]" %(r[0],i,j))
-    model.update()
+    # Constraint: Link paths have to be node disjoint
+    if LAZY_CONSTRAINTS:
+        f.lazy.add('nodes')
+    elif MATRIX_BUILDER:
+        add_node_disjointness_matrix(f)
+    else:
+        add_node_disjointness(f.model, f.h, f.k, f.RL, f.G)
 
-    # Optimization goal
-    model.setObjective(quicksum((u[r[0],i,j] + v[r[0],i,j])*d[i,j] for r in RL for i,j in arcs), GRB.MINIMIZE)
+    # Constraint: order of the working and protection paths
+    if SYMMETRY_BREAKING is not None:
+        add_symmetry_breaking(f, SYMMETRY_BREAKING)
 
-    # Constraint: Link paths have to be link disjoint
-    for r in RL:
-        for i, j in arcs:
-            model.addConstr(u[r[0],i,j] + v[r[0],i,j], "<=", 1, name="Link disjoint paths")
+    return f
 
-    # SRG constraint
-    for r in RL:
-        for key,value in srg_links.items():
-            model.addConstr(u[r[0], value[0][0], value[0][1]] + v[r[0], value[1][0], value[1][1]], "<=", 1, name="SRG links first direction")
-            model.addConstr(u[r[0], value[0][0], value[0][1]] + v[r[0], value[1][1], value[1][0]], "<=", 1,
-                            name="SRG links first direction")
-
-            model.addConstr(u[r[0], value[0][1], value[0][0]] + v[r[0], value[1][0], value[1][1]], "<=", 1, name="SRG links second direction")
-            model.addConstr(u[r[0], value[0][1], value[0][0]] + v[r[0], value[1][1], value[1][0]], "<=", 1,
-                            name="SRG links second direction")
-
-            model.addConstr(u[r[0], value[1][0], value[1][1]] + v[r[0], value[0][0], value[0][1]], "<=", 1, name="SRG links first direction")
-            model.addConstr(u[r[0], value[1][0], value[1][1]] + v[r[0], value[0][1], value[0][0]], "<=", 1,
-                            name="SRG links first direction")
-            model.addConstr(u[r[0], value[1][1], value[1][0]] + v[r[0], value[0][1], value[0][0]], "<=", 1, name="SRG links second direction")
-            model.addConstr(u[r[0], value[1][1], value[1][0]] + v[r[0], value[0][0], value[0][1]], "<=", 1,
-                        name="SRG links second direction")
-
-
-    # Flow conservation constraint
-    for r in RL:
-        for m in G.nodes():
-            model.addConstr(quicksum(u[r[0],i,j] for i,j in arcs if j==m) - quicksum(u[r[0],i,j] for i,j in arcs if i==m), "=", t[r[0],m])
-            model.addConstr(quicksum(v[r[0],i,j] for i,j in arcs if j==m) - quicksum(v[r[0],i,j] for i,j in arcs if i==m), "=", t[r[0],m])
-
-    # Capacity constraint
-    for i, j in arcs:
-        model.addConstr(quicksum(R[RL[r[0]][1]]*(u[r[0],i,j] + v[r[0],i,j]) for r in RL), '<', c[i,j])
 
-    # Start optimization
-    model.params.outputflag = 0
-    model.optimize()
-
-    # If optimal solution is found get the results
-    if model.status != GRB.Status.OPTIMAL:
-        if model.status == 3:
-            arcpy.AddMessage('Optimal solution is not found! The model is infeasible.')
-            distance1 = 0
-            distance2 = 0
-            path1 = 0
-            path2 = 0
-
-        elif model.status == 4:
-            arcpy.AddMessage('Optimal solution is not found! The model is infeasible or unbounded.')
-            distance1 = 0
-            distance2 = 0
-            path1 = 0
-            path2 = 0
-
-        if model.status == 5:
-            arcpy.AddMessage('Optimal solution is not found! The model is unbounded.')
-            distance1 = 0
-            distance2 = 0
-            path1 = 0
-            path2 = 0
+def build_node_disjoint_cap(G, D, R, name="Node disjoint paths with capacity constraint", base=None,
+                            capacity_mode=None):
+    f = build_node_disjoint(G, D, R, name, base)
 
+    # Capacity constraint per arc or per link, see capacity_groups
+    if MATRIX_BUILDER:
+        f.capacity_rows = add_capacity_matrix(f, capacity_mode)
     else:
-        su = model.getAttr('x', u)
-        sv = model.getAttr('x', v)
-
-        # The result is given as set of working and protection paths for every demand
-        distance1, distance2 = {}, {}
-        path1, path2 = {}, {}
-
-        for r in RL:
-            d1 = 0
-            d2 = 0
-            p1 = []
-            p2 = []
-            for i, j in arcs:
-                if su[r[0], i, j] > 0:
-                    p1.append((i, j))
-                    d1 += d[i, j]
-                if sv[r[0], i, j] > 0:
-                    p2.append((i, j))
-                    d2 += d[i, j]
-
-                    # Select the shorter path as working path and longer as backup path
-            if d1 <= d2:
-                distance1[r[1]] = d1
-                distance2[r[1]] = d2
-                path1[r[1]] = p1
-                path2[r[1]] = p2
-            else:
-                distance1[r[1]] = d2
-                distance2[r[1]] = d1
-                path1[r[1]] = p2
-                path2[r[1]] = p1
+        f.capacity_rows = add_capacity(f.model, f.u, f.v, f.R, f.RL, f.arcs, f.c, capacity_mode)
+
+    return f
+
+
+def srg_link_members(value):
+    """
+    :param value: list of the links (i, j) of the SRG
+    :return: set of the links of the SRG as frozensets {i, j}, independent of the direction
+    """
+    return set(frozenset(link) for link in value)
+
+
+def srg_node_members(value, dem):
+    """
+    The source and the destination are on both paths of the demand, so that they are not counted as the members of
+    the node SRG.
+
+    :param value: list of the nodes of the SRG
+    :return: set of the nodes of the SRG, which can fail without failing the demand dem
+    """
+    return set(value) - {dem[0], dem[1]}
+
+
+def add_srg_links(f, srg_links):
+    """
+    SRG constraint: the working and the protection path must not both use a link of the same SRG. Per demand and SRG
+    the indicators "SRG used by working/protection" are set by each arc of the SRG links, i.e., the SRGs of any size
+    need O(|SRG|) rows instead of the pairwise rows between the links.
+    """
+    f.srg_links = srg_links
+    u, v = f.u, f.v
+    for r, _ in f.RL:
+        for key, value in srg_links.items():
+            arcs = [(i, j) for link in value for i, j in (tuple(link), tuple(link)[::-1])]
+            arcs = [(i, j) for i, j in arcs if (r, i, j) in u]
+            add_srg_indicators(f.model, [u[r, i, j] for i, j in arcs], [v[r, i, j] for i, j in arcs], (r, key),
+                               "SRG links")
+    return
+
+
+def add_srg_nodes(f, srg_nodes):
+    """
+    SRG constraint: the working and the protection path must not both use a node of the same SRG, the source and the
+    destination of the demand excluded.
+    """
+    f.srg_nodes = srg_nodes
+    h, k = f.h, f.k
+    for r, dem in f.RL:
+        for key, value in srg_nodes.items():
+            members = srg_node_members(value, dem)
+            if members:
+                add_srg_indicators(f.model, [h[r, n] for n in members], [k[r, n] for n in members], (r, key),
+                                   "SRG nodes")
+    return
+
+
+def add_srg_indicators(model, working, protection, key, name):
+    """
+    Adds the indicators of the SRG used by the working and by the protection path, each one bounded from below by
+    the variables of the SRG members, and the constraint that at most one of the paths uses the SRG. The indicators
+    are continuous, as they are forced to 0 or 1 by the binary member variables.
+
+    :param working: list of the variables of the SRG members on the working path
+    :param protection: list of the variables of the SRG members on the protection path
+    """
+    a = model.add_var(0.0, 0.0, 1.0, 'C', name + " working", key)
+    b = model.add_var(0.0, 0.0, 1.0, 'C', name + " protection", key)
+
+    for x in working:
+        model.add_constr([(a, 1), (x, -1)], ">", 0, name + " working")
+    for x in protection:
+        model.add_constr([(b, 1), (x, -1)], ">", 0, name + " protection")
+    model.add_constr([(a, 1), (b, 1)], "<", 1, name)
+    return
+
+
+def srg_conflict(dem, p, q, srg_links=None, srg_nodes=None):
+    """
+    Checks the SRG constraints of add_srg_links and add_srg_nodes for the pair of the paths p and q of the demand.
+
+    :param p: list of the arcs of the working path
+    :param q: list of the arcs of the protection path
+    :return: True if the pair violates one of the SRGs
+    """
+    if srg_links is not None:
+        links_p = set(frozenset(arc) for arc in p)
+        links_q = set(frozenset(arc) for arc in q)
+        for value in srg_links.values():
+            members = srg_link_members(value)
+            if members & links_p and members & links_q:
+                return True
+
+    if srg_nodes is not None:
+        # Nodes indicated as chosen by the arcs leaving them, see add_node_indication
+        nodes_p = set(i for i, _ in p)
+        nodes_q = set(i for i, _ in q)
+        for value in srg_nodes.values():
+            members = srg_node_members(value, dem)
+            if members & nodes_p and members & nodes_q:
+                return True
+
+    return False
+
+
+####################################################################################################################
+# Lazy constraints
+####################################################################################################################
+# Leave the node disjointness and the SRG constraints out of the model and add only the rows violated by the integer
+# solutions, see milp_solvers.solve
+LAZY_CONSTRAINTS = False
+
+
+def separate_lazy_constraints(f, x):
+    """
+    Per demand the node disjointness of the nodes used by both paths and, for the SRGs used by both paths, the rows
+    excluding every pair of a working and a protection member. The pairwise rows need no indicator variables, which
+    cannot be added during the solve.
+
+    :param x: values of the variables of an integer solution
+    :return: list of the rows (terms, sense, rhs, family) violated by the solution
+    """
+    rows = []
+    for r, dem in f.RL:
+        p = [(i, j) for i, j in f.arcs if (r, i, j) in f.u and x[f.u[r, i, j]] > 0.5]
+        q = [(i, j) for i, j in f.arcs if (r, i, j) in f.v and x[f.v[r, i, j]] > 0.5]
+
+        # Nodes indicated as chosen by the arcs leaving them, see add_node_indication
+        nodes_p = set(i for i, _ in p)
+        nodes_q = set(i for i, _ in q)
+
+        if 'nodes' in f.lazy:
+            for n in (nodes_p & nodes_q) - {dem[0], dem[1]}:
+                rows.append(([(f.h[r, n], 1), (f.k[r, n], 1)], "<", 1, "Node disjoint paths"))
+
+        if 'srg links' in f.lazy:
+            links_p = set(frozenset(arc) for arc in p)
+            links_q = set(frozenset(arc) for arc in q)
+            for value in f.srg_links.values():
+                members = srg_link_members(value)
+                if members & links_p and members & links_q:
+                    arcs = [(i, j) for link in members for i, j in (tuple(link), tuple(link)[::-1]) if (r, i, j) in f.u]
+                    rows.extend(([(f.u[r, i, j], 1), (f.v[r, k, l], 1)], "<", 1, "SRG links")
+                                for i, j in arcs for k, l in arcs)
+
+        if 'srg nodes' in f.lazy:
+            for value in f.srg_nodes.values():
+                members = srg_node_members(value, dem)
+                if members & nodes_p and members & nodes_q:
+                    rows.extend(([(f.h[r, n], 1), (f.k[r, m], 1)], "<", 1, "SRG nodes") for n in members
+                                for m in members)
+    return rows
+
+
+def lazy_separator(f):
+    """
+    :return: the function of the lazy constraints of the formulation for milp_solvers.solve, None if all the
+             constraints are in the model
+    """
+    if not f.lazy:
+        return None
+    return lambda x: separate_lazy_constraints(f, x)
+
+
+def enumerated_rows(f):
+    """
+    :return: number of the rows of the lazy constraint families, if they are added up front
+    """
+    rows = 0
+    for r, dem in f.RL:
+        if 'nodes' in f.lazy:
+            rows += f.G.number_of_nodes() - 2
+        if 'srg links' in f.lazy:
+            for value in f.srg_links.values():
+                arcs = [(i, j) for link in value for i, j in (tuple(link), tuple(link)[::-1]) if (r, i, j) in f.u]
+                rows += 2 * len(arcs) + 1
+        if 'srg nodes' in f.lazy:
+            for value in f.srg_nodes.values():
+                members = srg_node_members(value, dem)
+                rows += 2 * len(members) + 1 if members else 0
+    return rows
+
+
+def build_link_disjoint_cap_srg_links(G, D, R, srg_links, base=None, capacity_mode=None):
+    f = build_link_disjoint_cap(G, D, R, "Link disjoint paths with capacity constraint and link SRGs", base,
+                                capacity_mode)
 
-    return distance1, distance2, path1, path2
+    # SRG constraint
+    if LAZY_CONSTRAINTS:
+        f.srg_links = srg_links
+        f.lazy.add('srg links')
+    else:
+        add_srg_links(f, srg_links)
 
+    return f
 
-# MILP formulation for node disjoint paths with capacity constraint and Node SRGs
-def optimize_node_disjoint_cap_srg_nodes(G, D, R, srg_node):
-    model = Model("Node disjoint paths with capacity constraint")
 
-    # Identify the source and the destination of the demand
-    t = {}
-    RL = list(enumerate(R))
+def build_node_disjoint_cap_srg_nodes(G, D, R, srg_node, base=None, capacity_mode=None):
+    f = build_node_disjoint_cap(G, D, R, "Node disjoint paths with capacity constraint and node SRGs", base,
+                                capacity_mode)
 
-    for r, (src, dst) in RL:
-        for n in G.nodes():
-            if n == src:
-                t[r, n] = -1
-            elif n == dst:
-                t[r, n] = 1
+    # SRG constraint
+    if LAZY_CONSTRAINTS:
+        f.srg_nodes = srg_node
+        f.lazy.add('srg nodes')
+    else:
+        add_srg_nodes(f, srg_node)
+
+    return f
+
+
+# Protection ('link', 'node' or None) and the SRG argument ('links', 'nodes' or None) of the formulations, used by the
+# infeasibility pre-check
+PROBLEM_STRUCTURE = {build_unprotected_path: (None, None),
+                     build_link_disjoint: ('link', None),
+                     build_link_disjoint_cap: ('link', None),
+                     build_node_disjoint_cap: ('node', None),
+                     build_link_disjoint_cap_srg_links: ('link', 'links'),
+                     build_node_disjoint_cap_srg_nodes: ('node', 'nodes')}
+
+# Formulations without constraints coupling the demands, no capacity and no SRGs, which are solved in chunks of
+# demands with workers > 1, see optimize_decomposed
+UNCOUPLED_PROBLEMS = (build_unprotected_path, build_link_disjoint)
+
+# Module flags, which change the models built in the worker processes, see solve_demands
+MODEL_FLAGS = ('PRESOLVE', 'SYMMETRY_BREAKING', 'LAZY_CONSTRAINTS', 'MATRIX_BUILDER')
+
+
+####################################################################################################################
+# Infeasibility pre-check
+####################################################################################################################
+def report_infeasible_demands(infeasible):
+    add_message('Optimal solution is not found! The model is infeasible for the demands:')
+    for (src, dst), reason in infeasible:
+        add_message('  {0}-{1}: {2}'.format(src, dst, reason))
+    return
+
+
+def precheck_problem(build, G, R, extra):
+    """
+    Checks the connectivity of the demands, before the model is built.
+
+    :return: True if no demand is found infeasible
+    """
+    if build not in PROBLEM_STRUCTURE:
+        return True
+
+    protection, srg = PROBLEM_STRUCTURE[build]
+    infeasible = infeasible_demands(G, R, protection, extra[0] if srg == 'links' else None,
+                                    extra[0] if srg == 'nodes' else None)
+    if infeasible:
+        report_infeasible_demands(infeasible)
+        return False
+    return True
+
+
+####################################################################################################################
+# Decomposition into independent demands
+####################################################################################################################
+def is_uncoupled(build):
+    """
+    The problem is uncoupled, if no constraint of its formulation couples the demands, i.e., the model falls apart
+    into one independent model per demand for any topology and demands. The capacity and the SRG constraints couple
+    them, even if the demands of a part of the model happen to share no arc.
+    """
+    return build in UNCOUPLED_PROBLEMS
+
+
+def model_flags():
+    """
+    :return: python dictionary {name: value} of the MODEL_FLAGS of this process
+    """
+    return dict((name, globals()[name]) for name in MODEL_FLAGS)
+
+
+def solve_demands(build, G, D, R, extra, solver, limits=None, options=None, flags=None):
+    """
+    Builds and solves the model for a part of the demands, runs in the worker processes.
+
+    :param options: python dictionary of the keyword arguments of the build function or None
+    :param flags: python dictionary of the MODEL_FLAGS of the parent process, see model_flags; a spawned worker
+                  imports this module with the default flags
+    :return: solution status and the results for the demands, None if no solution is found
+    """
+    if flags is not None:
+        globals().update(flags)
+
+    f = build(G, D, R, *extra, **(options or {}))
+    solution = solve(f.model, solver, lazy_separator(f), limits)
+
+    if solution.status not in (OPTIMAL, FEASIBLE):
+        return solution.status, None
+    return solution.status, formulation_results(f, solution)
+
+
+def map_in_pool(function, jobs, workers=None):
+    """
+    Runs function(*job) for every job in a pool of worker processes, concurrent.futures or multiprocessing.Pool.
+
+    :param jobs: list of the tuples of the arguments
+    :param workers: number of the worker processes, None uses all the cores
+    :return: generator of the results in the order of the jobs, closing it cancels the pending jobs
+    """
+    if ProcessPoolExecutor is not None:
+        futures = []
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            futures = [executor.submit(function, *job) for job in jobs]
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown()
+    else:
+        pool = multiprocessing.Pool(workers)
+        try:
+            pending = [pool.apply_async(function, job) for job in jobs]
+            for result in pending:
+                yield result.get()
+        finally:
+            pool.terminate()
+            pool.join()
+    return
+
+
+def optimize_decomposed(build, G, D, R, extra=(), solver='gurobi', workers=None, chunk_size=None, limits=None,
+                        options=None):
+    """
+    Solves an uncoupled problem in chunks of demands in a process pool and merges the results of the chunks.
+
+    :param build: the function building the formulation, build(G, D, R, *extra)
+    :param workers: number of the worker processes, None uses all the cores
+    :param chunk_size: number of the demands solved in one model, by default every worker gets about four chunks
+    :param limits: milp_solvers.SolveLimits of every chunk or None
+    :param options: python dictionary of the keyword arguments of the build function or None
+    :return: status, OPTIMAL if all the chunks are optimal, and the results as the optimize_* functions, None if no
+             solution is found for a chunk
+    """
+    demands = list(R)
+    if chunk_size is None:
+        chunk_size = max(1, len(demands) // (4 * (workers or multiprocessing.cpu_count())))
+    chunks = [dict((dem, R[dem]) for dem in demands[n:n + chunk_size]) for n in range(0, len(demands), chunk_size)]
+
+    results = None
+    jobs = [(build, G, D, chunk, extra, solver, limits, options, model_flags()) for chunk in chunks]
+    with closing(map_in_pool(solve_demands, jobs, workers)) as chunk_solutions:
+        status = OPTIMAL
+        for chunk_status, chunk_results in chunk_solutions:
+
+            if chunk_results is None:
+                add_message(STATUS_MESSAGES.get(chunk_status, 'Optimal solution is not found!'))
+                return chunk_status, None
+
+            if chunk_status == FEASIBLE:
+                status = FEASIBLE
+
+            if results is None:
+                results = chunk_results
             else:
-                t[r, n] = 0
+                for merged, part in zip(results, chunk_results):
+                    merged.update(part)
+
+    return status, results
+
+
+####################################################################################################################
+# Minimum feasible capacity
+####################################################################################################################
+def set_uniform_capacity(f, capacity):
+    """
+    Changes the right-hand sides of the capacity rows, the rest of the model is kept.
+    """
+    for arc, k in f.capacity_rows.items():
+        f.model.rhs[k] = capacity
+        f.c[arc] = capacity
+    return
+
+
+def minimum_capacity(build, G, D, R, extra=(), solver='gurobi', capacity_mode=None):
+    """
+    Searches the minimum uniform arc capacity, at which the capacitated problem is feasible. The model is built once
+    and only the capacity of the arcs is changed between the solves: the capacity is doubled from the largest demand
+    volume until the problem is feasible, then the last interval is bisected.
+
+    :param build: the function building the capacitated formulation, build(G, D, R, *extra)
+    :param capacity_mode: 'arc' or 'link', None uses CAPACITY_MODE, see capacity_groups
+    :return: the minimum feasible capacity (None if the problem is infeasible at any capacity) and the list of the
+             probed capacities [(capacity, status, total length or None)] in the order of the solves
+    """
+    # The capacity of the edges of G is not changed
+    H = G.copy()
+    for i, j in H.edges():
+        H[i][j]["capacity"] = 0
+
+    f = build(H, D, R, *extra, capacity_mode=capacity_mode)
+    report_model_statistics(f.model)
+
+    probes = []
+    feasible = {}
+
+    def probe(capacity):
+        set_uniform_capacity(f, capacity)
+        if WARM_START:
+            set_warm_start(f, solver)
+        solution = solve(f.model, solver, lazy_separator(f))
+        feasible[capacity] = solution.status == OPTIMAL
+        probes.append((capacity, solution.status, solution.objective if feasible[capacity] else None))
+        if feasible[capacity]:
+            add_message('Capacity {0}: total length {1:.2f}'.format(capacity, solution.objective))
+        else:
+            add_message('Capacity {0}: {1}'.format(capacity, solution.status))
+        return feasible[capacity]
+
+    # Below the largest volume the demand does not fit on any path, above two times the sum of the volumes no
+    # capacity row is binding
+    lower = max(R.values()) - 1
+    limit = 2 * sum(R.values())
+
+    # Galloping search of a feasible capacity
+    upper = lower + 1
+    while not probe(upper):
+        if upper >= limit:
+            add_message('The problem is infeasible at any capacity.')
+            return None, probes
+        lower = upper
+        upper = min(2 * upper, limit)
+
+    # Bisection between the largest infeasible and the smallest feasible capacity
+    while upper - lower > 1:
+        middle = (lower + upper) // 2
+        if probe(middle):
+            upper = middle
+        else:
+            lower = middle
+
+    add_message('Minimum feasible capacity: {0}'.format(upper))
+    return upper, probes
+
+
+####################################################################################################################
+# Optimize resilience
+####################################################################################################################
+def expand_results(results, expansion, D):
+    """
+    Maps the paths found on the contracted graph back to the original arcs.
+    """
+    if results[0] == 0:
+        return results
+
+    expanded = []
+    for path in results[len(results) // 2:]:
+        expanded.append(dict((dem, expand_path(p, expansion)) for dem, p in path.items()))
+    distances = [dict((dem, sum(D[arc] for arc in p)) for dem, p in path.items()) for path in expanded]
+    return tuple(distances + expanded)
+
+
+def optimize_problem(build, G, D, R, extra=(), solver='gurobi', workers=1, limits=None, family=None,
+                     capacity_mode=None):
+    """
+    :param build: the function building the formulation, build(G, D, R, *extra, base=None)
+    :param workers: number of the worker processes for the uncoupled problems, None uses all the cores, 1 solves the
+                    whole model in this process
+    :param limits: milp_solvers.SolveLimits or None, at a limit the best solution found is returned with the status
+                   FEASIBLE
+    :param family: ProblemFamily of G, D and R shared with the other problems or None
+    :param capacity_mode: 'arc' or 'link' of the capacitated formulations, None uses CAPACITY_MODE
+    :return: SolveResults of the results of the formulation, see formulation_results
+    """
+    if not precheck_problem(build, G, R, extra):
+        return SolveResults((0, 0) if PROBLEM_STRUCTURE[build][0] is None else (0, 0, 0, 0), INFEASIBLE)
+
+    if family is None:
+        family = ProblemFamily(G, D, R)
+
+    # Keyword arguments of the build function, only the capacitated formulations take the capacity mode
+    options = {} if capacity_mode is None else {'capacity_mode': capacity_mode}
+
+    if PRESOLVE:
+        H, DH, expansion = family.presolve(kept_nodes(R, extra))
+        if expansion:
+            add_message('Presolve: {0} of {1} nodes are contracted.'.format(
+                G.number_of_nodes() - H.number_of_nodes(), G.number_of_nodes()))
+            results = optimize_graph(build, H, DH, R, extra, solver, workers, limits, family.base(H, DH), options)
+            return SolveResults(expand_results(results, expansion, D), results.status)
+    return optimize_graph(build, G, D, R, extra, solver, workers, limits, family.base(G, D), options)
+
+
+def optimize_graph(build, G, D, R, extra=(), solver='gurobi', workers=1, limits=None, base=None, options=None):
+    """
+    :param options: python dictionary of the keyword arguments of the build function or None
+    """
+    options = options or {}
+
+    if workers != 1 and len(R) > 1:
+        if is_uncoupled(build):
+            status, results = optimize_decomposed(build, G, D, R, extra, solver, workers, limits=limits,
+                                                  options=options)
+            if results is None:
+                results = (0, 0) if PROBLEM_STRUCTURE[build][0] is None else (0, 0, 0, 0)
+            return SolveResults(results, status)
+        add_message('The demands are coupled by the constraints, the model is solved as a whole.')
+
+    f = build(G, D, R, *extra, base=base, **options)
+    solution = solve_formulation(f, solver, limits)
+
+    # If optimal (or at a limit feasible) solution is found get the results
+    if solution.status not in (OPTIMAL, FEASIBLE):
+        return SolveResults(no_results(f), solution.status)
+    return SolveResults(formulation_results(f, solution), solution.status)
+
+
+# MILP formulation for unprotected paths
+def optimize_unprotected_path(G, D, R, solver='gurobi', workers=1, limits=None, family=None):
+    return optimize_problem(build_unprotected_path, G, D, R, (), solver, workers, limits, family)
 
-        print RL[r][1]
-        print R[RL[r][1]]
 
-    # Transform undirected edges to directed arcs
-    d = {}
-    c = {}
-    arcs = []
-    C = nx.get_edge_attributes(G, "capacity")
+# MILP formulation for link disjoint paths
+def optimize_link_disjoint(G, D, R, solver='gurobi', workers=1, limits=None, family=None):
+    return optimize_problem(build_link_disjoint, G, D, R, (), solver, workers, limits, family)
 
-    arcpy.AddMessage(C)
 
-    for i, j in G.edges():
-        d[i, j] = D[i, j]
-        d[j, i] = D[j, i]
-        c[i, j] = C[i, j]
-        c[j, i] = C[i, j]
-        arcs.append((i, j))
-        arcs.append((j, i))
+# MILP formulation for link disjoint paths with capacity constraint
+def optimize_link_disjoint_cap(G, D, R, solver='gurobi', workers=1, limits=None, family=None, capacity_mode=None):
+    return optimize_problem(build_link_disjoint_cap, G, D, R, (), solver, workers, limits, family, capacity_mode)
 
-    # Binary variables indicate if arc (i,j) belongs to the working and backup paths of demand r
-    u, v = {}, {}
-    for r in RL:
-        for i,j in arcs:
-            u[r[0],i,j] = model.addVar(vtype="B", name="u[%s,%s,%s]" %(r[0],i,j))
-            v[r[0],i,j] = model.addVar(vtype="B", name="v[%s,%s,%s]" %(r[0],i,j))
 
-    # Binary variables indicate if node n belongs to the working and backup paths of demand r
-    h, k = {}, {}
-    for r in RL:
-        for n in G.nodes():
-            h[r[0],n] = model.addVar(vtype="B", name="u[%s,%s]" %(r[0],n))
-            k[r[0],n] = model.addVar(vtype="B", name="v[%s,%s]" %(r[0],n))
-    model.update()
-
-    # Optimization goal
-    model.setObjective(quicksum((u[r[0],i,j] + v[r[0],i,j])*d[i,j] for r in RL for i,j in arcs), GRB.MINIMIZE)
-
-    # Flow conservation constraint
-    for r in RL:
-        for m in G.nodes():
-            model.addConstr(
-                quicksum(u[r[0], i, j] for i, j in arcs if j == m) - quicksum(u[r[0], i, j] for i, j in arcs if i == m),
-                "=", t[r[0], m])
-            model.addConstr(
-                quicksum(v[r[0], i, j] for i, j in arcs if j == m) - quicksum(v[r[0], i, j] for i, j in arcs if i == m),
-                "=", t[r[0], m])
-
-            # Capacity constraint
-            for i, j in arcs:
-                model.addConstr(quicksum(R[RL[r[0]][1]]*(u[r[0],i,j] + v[r[0],i,j]) for r in RL), '<', c[i,j])
-
-    # Constraint: if the link is chosen, both of the nodes have to be indicated as chosen
-    for r in RL:
-        for n in G.nodes():
-            model.addConstr(h[r[0], n] - quicksum(u[r[0],n,j] for i,j in arcs if i == n), "=>", 0)
-            model.addConstr(k[r[0], n] - quicksum(v[r[0],n,j] for i,j in arcs if i == n), "=>", 0)
+# MILP formulation for node disjoint paths with capacity constraint
+def optimize_node_disjoint_cap(G, D, R, solver='gurobi', workers=1, limits=None, family=None, capacity_mode=None):
+    return optimize_problem(build_node_disjoint_cap, G, D, R, (), solver, workers, limits, family, capacity_mode)
 
-    # Constraint: Link paths have to be node disjoint
-    for r in RL:
-        for n in G.nodes():
-            # except source and destination
-            if n != r[1][1] and n != r[1][0]:
-                model.addConstr(h[r[0], n] + k[r[0], n], "<=", 1, name="Node disjoint paths")
 
-    # SRG constraint
-    for r in RL:
-        for key, value in srg_node.items():
-            if value[0] != r[1][1] and value[1] != r[1][0]:
-                model.addConstr(h[r[0], value[0]] + k[r[0], value[1]], "<=", 1, name="Node srg 1")
-                model.addConstr(h[r[0], value[1]] + k[r[0], value[0]], "<=", 1, name="Node srg 2")
+# MILP formulation for link disjoint paths with capacity constraint and link SRGs
+def optimize_link_disjoint_cap_srg_links(G, D, R, srg_links, solver='gurobi', workers=1, limits=None, family=None,
+                                         capacity_mode=None):
+    return optimize_problem(build_link_disjoint_cap_srg_links, G, D, R, (srg_links,), solver, workers, limits, family,
+                            capacity_mode)
 
 
-    # Start optimization
-    model.params.outputflag = 0
-    model.optimize()
-
-    # If optimal solution is found get the results
-    if model.status != GRB.Status.OPTIMAL:
-        if model.status == 3:
-            arcpy.AddMessage('Optimal solution is not found! The model is infeasible.')
-            distance1 = 0
-            distance2 = 0
-            path1 = 0
-            path2 = 0
-
-        elif model.status == 4:
-            arcpy.AddMessage('Optimal solution is not found! The model is infeasible or unbounded.')
-            distance1 = 0
-            distance2 = 0
-            path1 = 0
-            path2 = 0
-
-        if model.status == 5:
-            arcpy.AddMessage('Optimal solution is not found! The model is unbounded.')
-            distance1 = 0
-            distance2 = 0
-            path1 = 0
-            path2 = 0
+# MILP formulation for node disjoint paths with capacity constraint and Node SRGs
+def optimize_node_disjoint_cap_srg_nodes(G, D, R, srg_node, solver='gurobi', workers=1, limits=None, family=None,
+                                         capacity_mode=None):
+    return optimize_problem(build_node_disjoint_cap_srg_nodes, G, D, R, (srg_node,), solver, workers, limits, family,
+                            capacity_mode)
 
-    else:
-        su = model.getAttr('x', u)
-        sv = model.getAttr('x', v)
-
-        # The result is given as set of working and protection paths for every demand
-        distance1, distance2 = {}, {}
-        path1, path2 = {}, {}
-
-        for r in RL:
-            d1 = 0
-            d2 = 0
-            p1 = []
-            p2 = []
-            for i, j in arcs:
-                if su[r[0], i, j] > 0:
-                    p1.append((i, j))
-                    d1 += d[i, j]
-                if sv[r[0], i, j] > 0:
-                    p2.append((i, j))
-                    d2 += d[i, j]
-
-                    # Select the shorter path as working path and longer as backup path
-            if d1 <= d2:
-                distance1[r[1]] = d1
-                distance2[r[1]] = d2
-                path1[r[1]] = p1
-                path2[r[1]] = p2
-            else:
-                distance1[r[1]] = d2
-                distance2[r[1]] = d1
-                path1[r[1]] = p2
-                path2[r[1]] = p1
 
-    return distance1, distance2, path1, path2
+# Suurballe/Bhandari algorithm for link (or node) disjoint paths without capacity constraint
+def optimize_link_disjoint_suurballe(G, D, R, node_disjoint=False):
+    distance1, distance2, path1, path2, infeasible = disjoint_paths(G, D, R, node_disjoint)
+
+    if infeasible:
+        add_message('Optimal solution is not found! There are no two disjoint paths for the demands: {0}'.format(
+            ', '.join('{0}-{1}'.format(src, dst) for src, dst in infeasible)))
+        return SolveResults((0, 0, 0, 0), INFEASIBLE)
+    return SolveResults((distance1, distance2, path1, path2), OPTIMAL)
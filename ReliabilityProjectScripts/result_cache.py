@@ -0,0 +1,163 @@
+# -------------------------------------------------------------
+# Name:             result_cache.py
+# Purpose:          Results of the core network problems stored under the hash of their inputs, so that a run with
+#                   the same topology, demands, capacity, SRGs and engine returns the stored solution
+# Created:          12/10/2018
+# Copyright:        (c) Chair of Communication Networks, Department of Electrical and Computer Engineering,
+#                   Technical University of Munich
+# ArcGIS Version:   10.3.1
+# Python Version:   2.7
+# -------------------------------------------------------------
+
+import os
+import time
+import json
+import pickle
+import hashlib
+
+# Version of the formulations and the algorithms, increase it when a change of the code changes the results, so that
+# the results stored before are not used anymore
+ENGINE_VERSION = 2
+
+# Eviction of the cache: the total size of the entries in bytes and the age of an entry since its last use in seconds,
+# None for no limit
+MAX_BYTES = 256 * 1024 * 1024
+MAX_AGE = 180 * 24 * 3600
+
+# Length of the hash in the versioned names of the result files
+NAME_DIGEST = 10
+
+
+####################################################################################################################
+# Keys
+####################################################################################################################
+def file_digest(path):
+    """
+    :return: sha1 of the content of the file, None if the file does not exist
+    """
+    if path is None or not os.path.isfile(path):
+        return None
+
+    h = hashlib.sha1()
+    with open(path, 'rb') as f_in:
+        for block in iter(lambda: f_in.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def limits_key(limits):
+    """
+    :param limits: milp_solvers.SolveLimits or None
+    """
+    if limits is None:
+        return None
+    return [limits.time_limit, limits.mip_gap, limits.node_limit]
+
+
+def result_key(topology_file, demands_file, capacity, srg_file, problem, options=None):
+    """
+    The key of a result: the content of the input files, the capacity, the problem, the version of the engine and
+    the options, which change the solution, e.g., the solver, the solve limits and the model flags of optimize_ilp.
+
+    :param topology_file: a string with the path of the .graphml file
+    :param demands_file: a string with the path of the demands .txt file
+    :param srg_file: a string with the path of the SRG .pkl file of the problem, None for the problems without SRGs
+    :param problem: string, see core_pipeline.PROBLEMS
+    :param options: python dictionary {name: value} of json serializable values
+    :return: string, sha1 of the key
+    """
+    key = {'topology': file_digest(topology_file), 'demands': file_digest(demands_file), 'capacity': capacity,
+           'srgs': file_digest(srg_file), 'problem': problem, 'engine_version': ENGINE_VERSION,
+           'options': options or {}}
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def versioned_name(name, key):
+    """
+    :return: the name of the result file with the hash of its inputs, e.g., graph_properties_nobel_ger_..._1a2b3c4d5e
+    """
+    return '{0}_{1}'.format(name, key[:NAME_DIGEST])
+
+
+####################################################################################################################
+# Cache
+####################################################################################################################
+class ResultCache(object):
+    """
+    Results stored in the folder as {key}.pkl. An entry is used only by a run with the same key, so it is never
+    overwritten. After every new entry the entries unused for longer than max_age are removed, then the least recently
+    used ones until the entries take at most max_bytes.
+    """
+
+    def __init__(self, path, max_bytes=MAX_BYTES, max_age=MAX_AGE):
+        """
+        :param path: a string with the folder of the cache, created if it does not exist
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def entry_path(self, key):
+        return os.path.join(self.path, '{0}.pkl'.format(key))
+
+    def get(self, key):
+        """
+        :return: the stored result, None if there is none
+        """
+        entry_path = self.entry_path(key)
+        if not os.path.isfile(entry_path):
+            return None
+
+        try:
+            with open(entry_path, 'rb') as f_in:
+                result = pickle.load(f_in)
+        except (EOFError, pickle.UnpicklingError):
+            # Damaged entry, e.g., of an interrupted run
+            os.remove(entry_path)
+            return None
+
+        # Last use for the eviction
+        os.utime(entry_path, None)
+        return result
+
+    def put(self, key, result):
+        """
+        Stores the result under the key, written to a temporary file first, so that an interrupted run does not leave
+        a partial entry.
+        """
+        entry_path = self.entry_path(key)
+        if not os.path.isfile(entry_path):
+            tmp_path = '{0}.{1}.tmp'.format(entry_path, os.getpid())
+            with open(tmp_path, 'wb') as f_out:
+                pickle.dump(result, f_out, 2)
+            os.rename(tmp_path, entry_path)
+
+        self.evict()
+        return
+
+    def evict(self):
+        """
+        :return: number of the removed entries
+        """
+        entries = []
+        for name in os.listdir(self.path):
+            if name.endswith('.pkl'):
+                entry_path = os.path.join(self.path, name)
+                entries.append((os.path.getmtime(entry_path), os.path.getsize(entry_path), entry_path))
+        # Least recently used first
+        entries.sort()
+
+        removed = 0
+        total = sum(size for _, size, _ in entries)
+        now = time.time()
+        for used, size, entry_path in entries:
+            too_old = self.max_age is not None and now - used > self.max_age
+            too_large = self.max_bytes is not None and total > self.max_bytes
+            if not too_old and not too_large:
+                break
+            os.remove(entry_path)
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,237 @@
+# -------------------------------------------------------------
+# Name:             results_store.py
+# Purpose:          SQLite store of the results of the core network problems: the runs, their demands, the working
+#                   and protection paths and their hops, indexed for the queries across many runs
+# Created:          12/10/2018
+# Copyright:        (c) Chair of Communication Networks, Department of Electrical and Computer Engineering,
+#                   Technical University of Munich
+# ArcGIS Version:   10.3.1
+# Python Version:   2.7
+# -------------------------------------------------------------
+
+import os
+import re
+import time
+import pickle
+import sqlite3
+from contextlib import closing
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    topology TEXT NOT NULL,
+    demand_set TEXT NOT NULL,
+    problem TEXT NOT NULL,
+    capacity REAL,
+    status TEXT,
+    working_length REAL,
+    protection_length REAL,
+    result_key TEXT,
+    source TEXT,
+    created REAL
+);
+CREATE TABLE IF NOT EXISTS demands (
+    demand_id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    source TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    volume REAL
+);
+CREATE TABLE IF NOT EXISTS paths (
+    path_id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    demand_id INTEGER NOT NULL REFERENCES demands (demand_id),
+    kind TEXT NOT NULL,
+    length REAL,
+    hops INTEGER
+);
+CREATE TABLE IF NOT EXISTS hops (
+    path_id INTEGER NOT NULL REFERENCES paths (path_id),
+    position INTEGER NOT NULL,
+    origin TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    length REAL,
+    PRIMARY KEY (path_id, position)
+);
+CREATE INDEX IF NOT EXISTS runs_lookup ON runs (topology, demand_set, problem, capacity);
+CREATE INDEX IF NOT EXISTS runs_key ON runs (result_key);
+CREATE INDEX IF NOT EXISTS runs_source ON runs (source);
+CREATE INDEX IF NOT EXISTS demands_run ON demands (run_id);
+CREATE INDEX IF NOT EXISTS paths_run ON paths (run_id, kind);
+CREATE INDEX IF NOT EXISTS paths_demand ON paths (demand_id);
+'''
+
+# Path kinds and their entries in the result dictionaries: paths, lengths, hop lengths
+PATH_KINDS = (('working', 'working_paths', 'working_distance', 'working_hop_lengths'),
+              ('protection', 'protection_path', 'protection_distance', 'protection_hop_lengths'))
+
+# Problems and the names of their result files graph_properties_{topology}_{demands}_{name}[_{hash}].pkl
+RESULT_FILES = (('Unprotected', 'Unprotected'), ('Link_Disjoint', 'Link_Disjoint'),
+                ('Capacity', 'Link_Disjoint_Capacity'), ('Node_Disjoint', 'Node_Disjoint'),
+                ('SRG_Links', 'SRG_Links'), ('SRG_Nodes', 'SRG_Nodes'))
+
+
+class ResultsStore(object):
+    """
+    The results of the runs in one SQLite file. A run is one problem solved for a topology, a demand set and a
+    capacity; it is written at once in one transaction, and written only once per result key or result file.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: a string with the path of the SQLite file, created if it does not exist
+        """
+        self.path = path
+        with closing(self.connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def connect(self):
+        # Transactions are started explicitly
+        return sqlite3.connect(self.path, isolation_level=None)
+
+    def add_run(self, topology, demand_set, problem, capacity, result, demands=None, result_key=None, source=None):
+        """
+        :param topology: string name of the topology, e.g., nobel_ger
+        :param demand_set: string name of the demands, e.g., demand_ger_small
+        :param problem: string, see core_pipeline.PROBLEMS
+        :param capacity: the uniform capacity of the links, None if it is not known
+        :param result: python dictionary of the result file, see core_pipeline.run_core
+        :param demands: python dictionary with the demands {(source, destination): volume}, None takes them from the
+                        result
+        :param result_key: string, the hash of the inputs, see result_cache.result_key
+        :param source: a string with the path of the result file
+        :return: run_id, of the run stored before, if it has the same result key or result file
+        """
+        if demands is None:
+            demands = result.get('demands', {})
+        if source is not None:
+            source = os.path.abspath(source)
+
+        lengths = {}
+        for kind, _, distance_entry, _ in PATH_KINDS:
+            if distance_entry in result:
+                lengths[kind] = sum(result[distance_entry].values())
+
+        with closing(self.connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                existing = conn.execute('SELECT run_id FROM runs WHERE result_key = ? OR source = ?',
+                                        (result_key, source)).fetchone()
+                if existing is not None:
+                    conn.execute('ROLLBACK')
+                    return existing[0]
+
+                run_id = conn.execute(
+                    'INSERT INTO runs (topology, demand_set, problem, capacity, status, working_length, '
+                    'protection_length, result_key, source, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (topology, demand_set, problem, capacity, result.get('status'), lengths.get('working'),
+                     lengths.get('protection'), result_key, source, time.time())).lastrowid
+
+                # The ids are assigned here, so that the rows of all the tables are written with executemany
+                demand_id = conn.execute('SELECT COALESCE(MAX(demand_id), 0) FROM demands').fetchone()[0]
+                path_id = conn.execute('SELECT COALESCE(MAX(path_id), 0) FROM paths').fetchone()[0]
+
+                demand_rows, path_rows, hop_rows = [], [], []
+                for dem in sorted(result.get('working_paths', {})):
+                    demand_id += 1
+                    demand_rows.append((demand_id, run_id, dem[0], dem[1], demands.get(dem)))
+
+                    for kind, path_entry, distance_entry, hop_entry in PATH_KINDS:
+                        if path_entry not in result:
+                            continue
+                        path = result[path_entry].get(dem, [])
+                        hop_lengths = result.get(hop_entry, {}).get(dem, [None] * len(path))
+
+                        path_id += 1
+                        path_rows.append((path_id, run_id, demand_id, kind, result[distance_entry].get(dem),
+                                          len(path)))
+                        hop_rows.extend((path_id, position, arc[0], arc[1], length)
+                                        for position, (arc, length) in enumerate(zip(path, hop_lengths)))
+
+                conn.executemany('INSERT INTO demands VALUES (?, ?, ?, ?, ?)', demand_rows)
+                conn.executemany('INSERT INTO paths VALUES (?, ?, ?, ?, ?, ?)', path_rows)
+                conn.executemany('INSERT INTO hops VALUES (?, ?, ?, ?, ?)', hop_rows)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return run_id
+
+    def query(self, sql, parameters=()):
+        """
+        :return: list of the rows of the SQL query
+        """
+        with closing(self.connect()) as conn:
+            return conn.execute(sql, parameters).fetchall()
+
+    def runs(self, topology=None, demand_set=None, problem=None):
+        """
+        :return: list of (run_id, topology, demand_set, problem, capacity, status, working_length, protection_length)
+                 of the runs, which match the given names
+        """
+        where, parameters = filters({'topology': topology, 'demand_set': demand_set, 'problem': problem})
+        return self.query('SELECT run_id, topology, demand_set, problem, capacity, status, working_length, '
+                          'protection_length FROM runs{0} ORDER BY topology, demand_set, problem, capacity'
+                          .format(where), parameters)
+
+    def path_lengths(self, topology, kind='protection', demand_set=None, problem=None):
+        """
+        E.g., all the protection path lengths of nobel_ger across the capacities: path_lengths('nobel_ger').
+
+        :param kind: string, 'working' or 'protection'
+        :return: list of (problem, demand_set, capacity, source, destination, length, hops) ordered by the capacity
+        """
+        where, parameters = filters({'r.topology': topology, 'r.demand_set': demand_set, 'r.problem': problem,
+                                     'p.kind': kind})
+        return self.query('SELECT r.problem, r.demand_set, r.capacity, d.source, d.destination, p.length, p.hops '
+                          'FROM runs r JOIN paths p ON p.run_id = r.run_id JOIN demands d ON d.demand_id = p.demand_id'
+                          '{0} ORDER BY r.capacity, r.problem, d.source, d.destination'.format(where), parameters)
+
+    def import_results(self, folder, topology, demand_set, capacity=None):
+        """
+        Imports the result files graph_properties_{topology}_{demand_set}_{problem}[_{hash}].pkl of the folder, the
+        files imported before are skipped.
+
+        :param capacity: the uniform capacity of the runs, the result files do not store it
+        :return: list of the run_id of the files
+        """
+        run_ids = []
+        for problem, file_name in RESULT_FILES:
+            pattern = re.compile(r'^graph_properties_{0}_{1}_{2}(_[0-9a-f]+)?\.pkl$'.format(
+                re.escape(topology), re.escape(demand_set), file_name))
+            for name in sorted(os.listdir(folder)):
+                if pattern.match(name):
+                    with open(os.path.join(folder, name), 'rb') as f_in:
+                        result = pickle.load(f_in)
+                    run_ids.append(self.add_run(topology, demand_set, problem, capacity, result,
+                                                source=os.path.join(folder, name)))
+        return run_ids
+
+
+def filters(columns):
+    """
+    :param columns: python dictionary {column: value}, the columns with the value None are not filtered
+    :return: the WHERE clause and its parameters
+    """
+    columns = sorted((column, value) for column, value in columns.items() if value is not None)
+    if not columns:
+        return '', ()
+    return ' WHERE ' + ' AND '.join('{0} = ?'.format(column) for column, _ in columns), tuple(v for _, v in columns)
+
+
+if __name__ == '__main__':
+    # Import of the existing result files, e.g.,
+    # python results_store.py results.sqlite ../Results nobel_ger demand_ger_small --capacity 20
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Imports the .pkl results of the core network problems.')
+    parser.add_argument('database', help='SQLite file of the results store')
+    parser.add_argument('folder', help='folder of the .pkl results')
+    parser.add_argument('core_network', help='name of the topology, e.g., nobel_ger')
+    parser.add_argument('demands', help='name of the demands, e.g., demand_ger_small')
+    parser.add_argument('--capacity', type=float, help='uniform capacity of the links of the runs')
+    args = parser.parse_args()
+
+    imported = ResultsStore(args.database).import_results(args.folder, args.core_network, args.demands,
+                                                          args.capacity)
+    print('{0} result files imported.'.format(len(imported)))
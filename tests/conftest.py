@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# The scripts import each other as top level modules, as in ArcGIS
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ReliabilityProjectScripts'))
+
+
+@pytest.fixture
+def solver():
+    """
+    The MILP solver of the tests, which needs no license: HiGHS or CBC, the test is skipped without them.
+    """
+    from milp_solvers import available_solvers
+
+    solvers = [name for name in ('highs', 'cbc') if name in available_solvers()]
+    if not solvers:
+        pytest.skip('Neither scipy >= 1.9 (HiGHS) nor PuLP (CBC) is installed.')
+    return solvers[0]
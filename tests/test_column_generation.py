@@ -0,0 +1,65 @@
+import pytest
+
+from benchmark_core import load_topology, load_demands
+from milp_solvers import OPTIMAL, FEASIBLE, INFEASIBLE
+from optimize_ilp import optimize_link_disjoint_cap
+from column_generation import optimize_path_pairs
+
+
+def total_length(results):
+    if results[0] == 0:
+        return None
+    return sum(results[0].values()) + sum(results[1].values())
+
+
+# nobel_ger at the capacity 15: the columns contain the optimum (small, arc), the arc formulation has to be solved
+# as the fallback (small, link), the problem is infeasible (medium)
+@pytest.mark.parametrize('demands, capacity_mode', [('small', 'arc'), ('small', 'link'), ('medium', 'arc'),
+                                                    ('medium', 'link')])
+def test_column_generation_matches_milp_at_tight_capacity(solver, demands, capacity_mode):
+    g, distance_dict = load_topology('ProblemSetGER', 'nobel_ger', 15)
+    R = load_demands('ProblemSetGER', 'demand_ger', demands)
+
+    milp = optimize_link_disjoint_cap(g, distance_dict, R, solver=solver, capacity_mode=capacity_mode)
+    paths = optimize_path_pairs(g, distance_dict, R, solver=solver, capacity_mode=capacity_mode)
+
+    if milp.status == INFEASIBLE:
+        assert paths.status == INFEASIBLE
+        assert total_length(paths) is None
+    else:
+        assert milp.status == OPTIMAL
+        assert paths.status in (OPTIMAL, FEASIBLE)
+        assert total_length(paths) == pytest.approx(total_length(milp), rel=1e-9)
+
+
+def test_column_generation_respects_capacity(solver):
+    g, distance_dict = load_topology('ProblemSetGER', 'nobel_ger', 15)
+    R = load_demands('ProblemSetGER', 'demand_ger', 'small')
+
+    _, _, path1, path2 = optimize_path_pairs(g, distance_dict, R, solver=solver, capacity_mode='link')
+
+    load = {}
+    for dem in R:
+        for i, j in path1[dem] + path2[dem]:
+            load[frozenset((i, j))] = load.get(frozenset((i, j)), 0) + R[dem]
+    assert max(load.values()) <= 15
+
+
+# The pricing stops before it converges: the LP objective is no bound, the solution is feasible at best
+@pytest.mark.parametrize('max_iterations', [0, 1, 2])
+def test_column_generation_without_convergence(solver, max_iterations):
+    g, distance_dict = load_topology('ProblemSetGER', 'nobel_ger', 20)
+    R = load_demands('ProblemSetGER', 'demand_ger', 'medium')
+
+    milp = optimize_link_disjoint_cap(g, distance_dict, R, solver=solver)
+    paths = optimize_path_pairs(g, distance_dict, R, solver=solver, max_iterations=max_iterations)
+
+    assert milp.status == OPTIMAL
+    assert paths.status in (OPTIMAL, FEASIBLE)
+    assert total_length(paths) >= total_length(milp) * (1 - 1e-9)
+
+    load = {}
+    for dem in R:
+        for arc in paths[2][dem] + paths[3][dem]:
+            load[arc] = load.get(arc, 0) + R[dem]
+    assert max(load.values()) <= 20
@@ -0,0 +1,67 @@
+import itertools
+
+import networkx as nx
+import pytest
+
+import optimize_ilp
+from benchmark_core import load_topology, load_demands
+from milp_solvers import OPTIMAL, INFEASIBLE
+
+
+def k4_bridge(capacity):
+    # Two complete graphs a0-a3 and b0-b3 joined by the bridge a0-b0
+    g = nx.Graph()
+    distance_dict = {}
+    for side in 'ab':
+        g.add_edges_from(itertools.combinations([side + str(k) for k in range(4)], 2))
+    g.add_edge('a0', 'b0')
+    for i, j in g.edges():
+        g[i][j]['weight'] = 1.0
+        g[i][j]['capacity'] = capacity
+        distance_dict[i, j] = distance_dict[j, i] = 1.0
+    return g, distance_dict
+
+
+def test_decomposable_problems():
+    assert optimize_ilp.is_uncoupled(optimize_ilp.build_unprotected_path)
+    assert optimize_ilp.is_uncoupled(optimize_ilp.build_link_disjoint)
+    assert not optimize_ilp.is_uncoupled(optimize_ilp.build_link_disjoint_cap)
+    assert not optimize_ilp.is_uncoupled(optimize_ilp.build_node_disjoint_cap_srg_nodes)
+
+
+@pytest.mark.parametrize('optimize', [optimize_ilp.optimize_link_disjoint_cap, optimize_ilp.optimize_node_disjoint_cap])
+def test_capacity_is_not_decomposed(solver, optimize):
+    # Capacity 1 does not fit the working and the protection paths of 7 demands in the two K4
+    g, distance_dict = k4_bridge(1)
+    # The first two demands share no link, a model with them alone falls apart
+    R = dict(((src, dst), 1) for src, dst in [('a1', 'a2'), ('b1', 'b2'), ('a1', 'a3'), ('b1', 'b3'), ('a2', 'a3'),
+                                              ('b2', 'b3'), ('a1', 'a0')])
+
+    assert optimize(g, distance_dict, R, solver=solver, workers=1).status == INFEASIBLE
+    assert optimize(g, distance_dict, R, solver=solver, workers=2).status == INFEASIBLE
+
+
+def test_workers_keep_the_objective(solver):
+    g, distance_dict = load_topology('ProblemSetGER', 'nobel_ger', 20)
+    R = load_demands('ProblemSetGER', 'demand_ger', 'medium')
+
+    totals = []
+    for optimize in (optimize_ilp.optimize_link_disjoint, optimize_ilp.optimize_link_disjoint_cap):
+        for workers in (1, 2):
+            results = optimize(g, distance_dict, R, solver=solver, workers=workers)
+            assert results.status == OPTIMAL
+            totals.append(sum(results[0].values()) + sum(results[1].values()))
+    assert totals[0] == pytest.approx(totals[1], rel=1e-9)
+    assert totals[2] == pytest.approx(totals[3], rel=1e-9)
+
+
+def test_workers_get_the_model_flags(monkeypatch, solver):
+    monkeypatch.setattr(optimize_ilp, 'PRESOLVE', True)
+    monkeypatch.setattr(optimize_ilp, 'SYMMETRY_BREAKING', None)
+    flags = dict(optimize_ilp.model_flags(), PRESOLVE=False, SYMMETRY_BREAKING='length')
+
+    g, distance_dict = k4_bridge(1)
+    status, _ = optimize_ilp.solve_demands(optimize_ilp.build_link_disjoint, g, distance_dict, {('a1', 'a2'): 1}, (),
+                                           solver, flags=flags)
+    assert status == OPTIMAL
+    assert (optimize_ilp.PRESOLVE, optimize_ilp.SYMMETRY_BREAKING) == (False, 'length')
@@ -0,0 +1,80 @@
+import networkx as nx
+import pytest
+
+import optimize_ilp
+from benchmark_core import TOPOLOGIES, load_topology, load_demands
+from milp_solvers import OPTIMAL, INFEASIBLE, solve
+from optimize_ilp import optimize_link_disjoint, optimize_link_disjoint_suurballe
+
+
+def total_length(results):
+    return sum(results[0].values()) + sum(results[1].values())
+
+
+def link_disjoint(p, q):
+    return not set(frozenset(arc) for arc in p) & set(frozenset(arc) for arc in q)
+
+
+def connects(path, src, dst):
+    return path[0][0] == src and path[-1][1] == dst and all(a[1] == b[0] for a, b in zip(path, path[1:]))
+
+
+@pytest.mark.parametrize('problem_set, name, prefix', [(problem_set, name, prefix)
+                                                       for problem_set, name, prefix, _, _ in TOPOLOGIES
+                                                       if name in ('nobel_ger', 'nobel_us', 'nobel_eu')])
+def test_suurballe_matches_milp(solver, problem_set, name, prefix):
+    g, distance_dict = load_topology(problem_set, name)
+    R = load_demands(problem_set, prefix, 'small')
+
+    milp = optimize_link_disjoint(g, distance_dict, R, solver=solver)
+    pairs = optimize_link_disjoint_suurballe(g, distance_dict, R)
+
+    assert milp.status == OPTIMAL and pairs.status == OPTIMAL
+    assert total_length(pairs) == pytest.approx(total_length(milp), rel=1e-9)
+
+
+def test_suurballe_paths_are_disjoint():
+    g, distance_dict = load_topology('ProblemSetGER', 'nobel_ger')
+    R = load_demands('ProblemSetGER', 'demand_ger', 'medium')
+
+    distance1, distance2, path1, path2 = optimize_link_disjoint_suurballe(g, distance_dict, R)
+
+    for src, dst in R:
+        p, q = path1[src, dst], path2[src, dst]
+        assert connects(p, src, dst) and connects(q, src, dst)
+        assert link_disjoint(p, q)
+        assert distance1[src, dst] <= distance2[src, dst]
+        assert distance1[src, dst] == pytest.approx(sum(distance_dict[arc] for arc in p))
+
+
+def test_suurballe_reports_bridge_as_infeasible():
+    # Triangle a-b-c with the bridge c-d
+    g = nx.Graph()
+    g.add_edges_from([('a', 'b'), ('b', 'c'), ('a', 'c'), ('c', 'd')])
+    distance_dict = {}
+    for i, j in g.edges():
+        distance_dict[i, j] = distance_dict[j, i] = 1.0
+
+    assert optimize_link_disjoint_suurballe(g, distance_dict, {('a', 'c'): 1}).status == OPTIMAL
+    assert optimize_link_disjoint_suurballe(g, distance_dict, {('a', 'd'): 1}).status == INFEASIBLE
+
+
+@pytest.mark.parametrize('matrix_builder', [False, True])
+@pytest.mark.parametrize('build', [optimize_ilp.build_link_disjoint, optimize_ilp.build_link_disjoint_cap])
+def test_paths_do_not_share_a_link_in_opposite_directions(solver, monkeypatch, matrix_builder, build):
+    if matrix_builder and optimize_ilp.sp is None:
+        pytest.skip('The matrix builder needs scipy.')
+    monkeypatch.setattr(optimize_ilp, 'MATRIX_BUILDER', matrix_builder)
+
+    # The working path s-a-b-t and the protection path s-b-a-t are arc disjoint, but share the link a-b
+    g = nx.Graph()
+    distance_dict = {}
+    for i, j, length in [('s', 'a', 1.0), ('s', 'b', 10.0), ('a', 'b', 1.0), ('a', 't', 10.0), ('b', 't', 1.0)]:
+        g.add_edge(i, j, weight=length, capacity=1)
+        distance_dict[i, j] = distance_dict[j, i] = length
+
+    f = build(g, distance_dict, {('s', 't'): 1})
+    assert solve(f.model, solver).status == OPTIMAL
+    f.model.add_constr([(f.u[0, 'a', 'b'], 1)], '=', 1, 'Fix')
+    f.model.add_constr([(f.v[0, 'b', 'a'], 1)], '=', 1, 'Fix')
+    assert solve(f.model, solver).status == INFEASIBLE
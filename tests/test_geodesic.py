@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import pytest
+
+import geodesic
+from benchmark_core import TOPOLOGIES, TOPOLOGIES_PATH
+from core_pipeline import read_network
+
+# Flinders Peak - Buninyong, the example of Vincenty (1975): 54972.271 m on the WGS84 ellipsoid
+FLINDERS_PEAK = (144.42486788888888, -37.95103341666667)
+BUNINYONG = (143.92649552777777, -37.65282113888889)
+FLINDERS_BUNINYONG = 54972.271
+
+
+def between(method, p1=FLINDERS_PEAK, p2=BUNINYONG):
+    return geodesic.distances([p1[0]], [p1[1]], [p2[0]], [p2[1]], method)[0]
+
+
+def test_vincenty_reference():
+    assert between('vincenty') == pytest.approx(FLINDERS_BUNINYONG, abs=1e-3)
+    assert between('vincenty', BUNINYONG, FLINDERS_PEAK) == pytest.approx(FLINDERS_BUNINYONG, abs=1e-3)
+    assert between('vincenty', FLINDERS_PEAK, FLINDERS_PEAK) == 0
+
+
+def test_karney_reference():
+    pytest.importorskip('geographiclib')
+    assert between('karney') == pytest.approx(FLINDERS_BUNINYONG, abs=1e-3)
+
+
+def test_haversine_is_close():
+    # The sphere differs from the ellipsoid by less than 0.5 %
+    assert between('haversine') == pytest.approx(FLINDERS_BUNINYONG, rel=5e-3)
+
+
+def test_nearly_antipodal_points_fall_back():
+    pytest.importorskip('geographiclib')
+    s, converged = geodesic.vincenty(*[np.array([x]) for x in (0.0, 0.0, 179.7, 0.5)])
+    assert not converged[0]
+    assert between('vincenty', (0.0, 0.0), (179.7, 0.5)) == pytest.approx(between('karney', (0.0, 0.0), (179.7, 0.5)))
+
+
+@pytest.mark.parametrize('problem_set, name', [(problem_set, name) for problem_set, name, _, _, _ in TOPOLOGIES])
+def test_vincenty_matches_karney_on_topologies(problem_set, name):
+    pytest.importorskip('geographiclib')
+    g = read_network(name, os.path.join(TOPOLOGIES_PATH, problem_set))
+
+    vincenty = geodesic.edge_lengths(g, 'vincenty', name=name)
+    karney = geodesic.edge_lengths(g, 'karney', name=name)
+    assert set(vincenty) == set(karney)
+    assert all(abs(vincenty[arc] - karney[arc]) <= 0.01 for arc in vincenty)
+
@@ -0,0 +1,91 @@
+import networkx as nx
+import pytest
+
+import optimize_ilp
+from benchmark_core import load_topology, load_demands, load_srgs
+from graph_presolve import kept_nodes, contract_chains, expand_path, demand_arcs, infeasible_demands
+from milp_solvers import OPTIMAL
+
+
+def graph(edges, capacity=None):
+    g = nx.Graph()
+    distance_dict = {}
+    for i, j, length in edges:
+        g.add_edge(i, j, weight=length)
+        if capacity is not None:
+            g[i][j]['capacity'] = capacity[i, j]
+        distance_dict[i, j] = distance_dict[j, i] = length
+    return g, distance_dict
+
+
+def test_contract_chains_keeps_lengths_and_capacity():
+    # Square a-b-c-d with the chain b-x-y-c instead of the link b-c
+    g, distance_dict = graph([('a', 'b', 1.0), ('b', 'x', 2.0), ('x', 'y', 3.0), ('y', 'c', 4.0), ('c', 'd', 5.0),
+                              ('d', 'a', 6.0)],
+                             {('a', 'b'): 10, ('b', 'x'): 7, ('x', 'y'): 5, ('y', 'c'): 9, ('c', 'd'): 10,
+                              ('d', 'a'): 10})
+    R = {('a', 'c'): 1, ('b', 'd'): 1}
+
+    h, distance_h, expansion = contract_chains(g, distance_dict, kept_nodes(R), R)
+
+    assert set(h.nodes()) == {'a', 'b', 'c', 'd'}
+    assert distance_h['b', 'c'] == distance_h['c', 'b'] == 9.0
+    assert h['b']['c']['capacity'] == 5
+    assert expand_path([('a', 'b'), ('b', 'c')], expansion) == [('a', 'b'), ('b', 'x'), ('x', 'y'), ('y', 'c')]
+    assert expand_path([('c', 'b')], expansion) == [('c', 'y'), ('y', 'x'), ('x', 'b')]
+
+
+def test_kept_nodes_are_not_contracted():
+    g, distance_dict = graph([('a', 'b', 1.0), ('b', 'x', 1.0), ('x', 'c', 1.0), ('c', 'a', 1.0)])
+
+    h, _, _ = contract_chains(g, distance_dict, kept_nodes({('a', 'c'): 1}, [{1: ['x']}]), {('a', 'c'): 1})
+    assert 'x' in h and 'b' not in h
+
+
+def test_demand_arcs_prune_dead_ends():
+    # Triangle a-b-c with the dead end c-d
+    g, distance_dict = graph([('a', 'b', 1.0), ('b', 'c', 1.0), ('c', 'a', 1.0), ('c', 'd', 1.0)])
+    arcs = sorted(distance_dict)
+
+    allowed = demand_arcs(g, arcs, [(0, ('a', 'b')), (1, ('a', 'd'))])
+    assert ('c', 'd') not in allowed[0] and ('d', 'c') not in allowed[0]
+    assert ('c', 'd') in allowed[1]
+
+
+def test_infeasible_demands_reasons():
+    # Triangle a-b-c with the bridge c-d, the node e is isolated
+    g, _ = graph([('a', 'b', 1.0), ('b', 'c', 1.0), ('c', 'a', 1.0), ('c', 'd', 1.0)])
+    g.add_node('e')
+    R = {('a', 'b'): 1, ('a', 'd'): 1, ('a', 'e'): 1}
+
+    assert dict(infeasible_demands(g, R)) == {('a', 'e'): 'no path'}
+    link = dict(infeasible_demands(g, R, 'link'))
+    assert link[('a', 'd')].startswith('bridge') and ('a', 'b') not in link
+    assert dict(infeasible_demands(g, {('a', 'd'): 1}, 'node')) == {('a', 'd'): 'cut vertex c'}
+    assert infeasible_demands(g, {('a', 'b'): 1}, 'link', srg_links={1: [('a', 'b'), ('b', 'c')]})
+
+
+@pytest.mark.parametrize('problem', ['Unprotected', 'Capacity', 'Node_Disjoint', 'SRG_Links', 'SRG_Nodes'])
+def test_presolve_keeps_the_objective(solver, monkeypatch, problem):
+    g, distance_dict = load_topology('ProblemSetGER', 'nobel_ger', 20)
+    R = load_demands('ProblemSetGER', 'demand_ger', 'small')
+    extra = {'SRG_Links': (load_srgs('ProblemSetGER', 'srg_links_nobel.pkl'),),
+             'SRG_Nodes': (load_srgs('ProblemSetGER', 'srg_nodes_nobel.pkl'),)}.get(problem, ())
+    optimize = {'Unprotected': optimize_ilp.optimize_unprotected_path,
+                'Capacity': optimize_ilp.optimize_link_disjoint_cap,
+                'Node_Disjoint': optimize_ilp.optimize_node_disjoint_cap,
+                'SRG_Links': optimize_ilp.optimize_link_disjoint_cap_srg_links,
+                'SRG_Nodes': optimize_ilp.optimize_node_disjoint_cap_srg_nodes}[problem]
+
+    totals = []
+    for presolve in (True, False):
+        monkeypatch.setattr(optimize_ilp, 'PRESOLVE', presolve)
+        results = optimize(g, distance_dict, R, *extra, solver=solver)
+        assert results.status == OPTIMAL
+        totals.append(sum(sum(distances.values()) for distances in results[:len(results) // 2]))
+
+        # The paths are mapped back to the links of the topology
+        for paths in results[len(results) // 2:]:
+            assert all(g.has_edge(i, j) for path in paths.values() for i, j in path)
+
+    assert totals[0] == pytest.approx(totals[1], rel=1e-9)
@@ -0,0 +1,77 @@
+import pytest
+
+from milp_model import MilpModel
+from milp_solvers import available_solvers, solve, OPTIMAL, INFEASIBLE
+
+
+def knapsack():
+    # Maximize 5 x0 + 4 x1 + 3 x2 subject to 2 x0 + 3 x1 + x2 <= 4 (x0 + x2, objective 8)
+    model = MilpModel('Knapsack')
+    x = model.add_vars(range(3), 'x')
+    model.set_objective([(x[0], -5), (x[1], -4), (x[2], -3)])
+    model.add_constr([(x[0], 2), (x[1], 3), (x[2], 1)], '<', 4, 'Weight')
+    return model, x
+
+
+def test_rows_in_compressed_sparse_row_format():
+    model, x = knapsack()
+    k = model.add_constr([(x[0], 1), (x[1], 1)], '>', 1, 'Cover')
+
+    assert (model.num_vars, model.num_constrs, model.num_nonzeros) == (3, 2, 5)
+    assert model.row_start == [0, 3, 5]
+    assert model.row(k) == [(x[0], 1), (x[1], 1)]
+    assert model.var_name(x[2]) == 'x[2]'
+
+
+def test_add_constr_matrix_matches_add_constr():
+    np = pytest.importorskip('numpy')
+    sp = pytest.importorskip('scipy.sparse')
+
+    rows, matrix = knapsack()[0], knapsack()[0]
+    rows.add_constr([(2, 1), (0, -1)], '=', 0, 'Link')
+    rows.add_constr([(1, 2)], '=', 0, 'Link')
+    matrix.add_constr_matrix(sp.csr_matrix([[-1, 1, 0], [0, 0, 2]]), '=', [0, 0], 'Link', np.array([0, 2, 1]))
+
+    assert [sorted(rows.row(k)) for k in range(3)] == [sorted(matrix.row(k)) for k in range(3)]
+    assert (rows.sense, rows.rhs, rows.row_family) == (matrix.sense, matrix.rhs, matrix.row_family)
+
+
+def test_copy_is_independent_and_truncated():
+    model, x = knapsack()
+    y = model.add_var(obj=1.0, family='y')
+    model.add_constr([(y, 1)], '<', 1, 'Bound y')
+    model.start = {x[0]: 1}
+
+    base = model.copy('Base', num_vars=3, num_constrs=1)
+    assert (base.name, base.num_vars, base.num_constrs, base.start) == ('Base', 3, 1, {})
+    assert base.row(0) == model.row(0)
+
+    base.add_constr([(x[1], 1)], '<', 0, 'Fix')
+    base.rhs[0] = 3
+    assert model.num_constrs == 2 and model.rhs[0] == 4
+
+
+def test_statistics_count_duplicate_rows():
+    model, x = knapsack()
+    model.add_constr([(x[1], 3), (x[0], 2), (x[2], 1)], '<', 4, 'Weight')
+    model.add_constr([(x[0], 2), (x[1], 3), (x[2], 1)], '<', 4, 'Other')
+
+    rows, columns = model.statistics()
+    assert rows['Weight'] == {'rows': 2, 'nonzeros': 6, 'duplicates': 1}
+    assert rows['Other']['duplicates'] == 0
+    assert columns == {'x': 3}
+
+
+@pytest.mark.parametrize('name', ['highs', 'cbc'])
+def test_solvers_agree(name):
+    if name not in available_solvers():
+        pytest.skip('{0} is not installed.'.format(name))
+
+    model, _ = knapsack()
+    solution = solve(model, name)
+    assert solution.status == OPTIMAL
+    assert solution.objective == pytest.approx(-8)
+    assert [round(value) for value in solution.x] == [1, 0, 1]
+
+    model.add_constr([(0, 1), (1, 1), (2, 1)], '>', 3, 'All')
+    assert solve(model, name).status == INFEASIBLE
@@ -0,0 +1,26 @@
+import pytest
+
+import optimize_ilp
+from benchmark_core import load_topology, load_demands, load_srgs
+from optimize_ilp import build_node_disjoint_cap, build_node_disjoint_cap_srg_nodes
+
+
+@pytest.mark.parametrize('matrix_builder', [False, True])
+@pytest.mark.parametrize('capacity_mode', ['arc', 'link'])
+def test_node_disjoint_capacity_rows_are_not_duplicated(monkeypatch, matrix_builder, capacity_mode):
+    if matrix_builder and optimize_ilp.sp is None:
+        pytest.skip('The matrix builder needs scipy.')
+    monkeypatch.setattr(optimize_ilp, 'MATRIX_BUILDER', matrix_builder)
+
+    g, distance_dict = load_topology('ProblemSetGER', 'nobel_ger', 20)
+    R = load_demands('ProblemSetGER', 'demand_ger', 'medium')
+    srg_nodes = load_srgs('ProblemSetGER', 'srg_nodes_nobel.pkl')
+
+    for f in (build_node_disjoint_cap(g, distance_dict, R, capacity_mode=capacity_mode),
+              build_node_disjoint_cap_srg_nodes(g, distance_dict, R, srg_nodes, capacity_mode=capacity_mode)):
+        rows, _ = f.model.statistics()
+        assert all(stats['duplicates'] == 0 for stats in rows.values())
+
+        # One capacity row per arc or per link
+        links = 2 if capacity_mode == 'arc' else 1
+        assert rows['Capacity']['rows'] == links * g.number_of_edges()
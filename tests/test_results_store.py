@@ -0,0 +1,63 @@
+import os
+import pickle
+
+from results_store import ResultsStore
+
+
+def result(scale=1.0):
+    # Two demands with their working and protection paths
+    return {'status': 'optimal',
+            'demands': {('a', 'c'): 2, ('b', 'c'): 1},
+            'working_paths': {('a', 'c'): [('a', 'c')], ('b', 'c'): [('b', 'c')]},
+            'working_distance': {('a', 'c'): 10.0 * scale, ('b', 'c'): 4.0 * scale},
+            'working_hop_lengths': {('a', 'c'): [10.0 * scale], ('b', 'c'): [4.0 * scale]},
+            'protection_path': {('a', 'c'): [('a', 'b'), ('b', 'c')], ('b', 'c'): [('b', 'a'), ('a', 'c')]},
+            'protection_distance': {('a', 'c'): 9.0 * scale, ('b', 'c'): 15.0 * scale}}
+
+
+def test_add_run_writes_the_run_once(tmp_path):
+    store = ResultsStore(str(tmp_path / 'results.sqlite'))
+
+    run_id = store.add_run('nobel_ger', 'demand_ger_small', 'Capacity', 20, result(), result_key='k1')
+    assert store.add_run('nobel_ger', 'demand_ger_small', 'Capacity', 20, result(), result_key='k1') == run_id
+    assert store.runs() == [(run_id, 'nobel_ger', 'demand_ger_small', 'Capacity', 20, 'optimal', 14.0, 24.0)]
+
+    assert store.query('SELECT COUNT(*) FROM demands')[0][0] == 2
+    assert store.query('SELECT COUNT(*) FROM paths')[0][0] == 4
+    assert store.query('SELECT h.origin, h.destination, h.length FROM hops h JOIN paths p USING (path_id) '
+                       'WHERE p.kind = ? ORDER BY path_id, h.position', ('protection',)) == [
+        ('a', 'b', None), ('b', 'c', None), ('b', 'a', None), ('a', 'c', None)]
+    assert store.query('SELECT volume FROM demands ORDER BY source') == [(2,), (1,)]
+
+
+def test_queries_across_runs(tmp_path):
+    store = ResultsStore(str(tmp_path / 'results.sqlite'))
+    store.add_run('nobel_ger', 'demand_ger_small', 'Capacity', 30, result(0.5), result_key='k30')
+    store.add_run('nobel_ger', 'demand_ger_small', 'Capacity', 20, result(), result_key='k20')
+    store.add_run('nobel_ger', 'demand_ger_small', 'Unprotected', 20, {'status': 'optimal'}, result_key='ku')
+    store.add_run('germany50', 'demand_ger_small', 'Capacity', 20, result(), result_key='kg')
+
+    assert [row[3:5] for row in store.runs('nobel_ger', problem='Capacity')] == [('Capacity', 20), ('Capacity', 30)]
+    assert len(store.runs(demand_set='demand_ger_small')) == 4
+
+    lengths = store.path_lengths('nobel_ger', problem='Capacity')
+    assert [(capacity, src, length, hops) for _, _, capacity, src, _, length, hops in lengths] == [
+        (20, 'a', 9.0, 2), (20, 'b', 15.0, 2), (30, 'a', 4.5, 2), (30, 'b', 7.5, 2)]
+    assert [row[5] for row in store.path_lengths('nobel_ger', 'working', problem='Capacity')] == [10.0, 4.0, 5.0, 2.0]
+
+
+def test_import_results_skips_imported_files(tmp_path):
+    folder = tmp_path / 'results'
+    folder.mkdir()
+    for name in ('Link_Disjoint_Capacity_1a2b3c4d5e', 'Node_Disjoint', 'Node_Disjoint_Capacity_Search'):
+        with open(str(folder / 'graph_properties_nobel_ger_demand_ger_small_{0}.pkl'.format(name)), 'wb') as f_out:
+            pickle.dump(result(), f_out, 2)
+
+    store = ResultsStore(str(tmp_path / 'results.sqlite'))
+    run_ids = store.import_results(str(folder), 'nobel_ger', 'demand_ger_small', 20)
+    assert len(run_ids) == 2
+    assert sorted(row[3] for row in store.runs()) == ['Capacity', 'Node_Disjoint']
+
+    assert store.import_results(str(folder), 'nobel_ger', 'demand_ger_small', 20) == run_ids
+    assert len(store.runs()) == 2
+    assert os.path.isfile(str(tmp_path / 'results.sqlite'))